@@ -13,7 +13,10 @@ except ImportError:
     sys.exit(1)
 
 from vault.vault_core import VaultCore
+from vault.sqlite_backend import migrate_json_to_sqlite
 from sync.network_core import NetworkCore
+from sync.peer_state import PeerStateStore
+from sync.hint_store import HintStore
 
 console = Console()
 
@@ -70,10 +73,12 @@ def run_cli(vault: VaultCore, network: NetworkCore):
                 input("\nAppuyez sur <Entrée> pour continuer...")
                 
             elif choix.startswith("3"):
-                query = questionary.text("Recherche (service ou username) :").ask()
+                # L'index aveugle ne couvre que le service et le username ; la recherche approximative y ajoute les notes
+                fields = "service ou username" if vault.blind_index is not None else "service, username ou notes"
+                query = questionary.text(f"Recherche ({fields}) :").ask()
                 if not query: continue
-                secrets = vault.get_all_secrets_decrypted()
-                found = [s for s in secrets if query.lower() in s['service'].lower() or query.lower() in s['username'].lower()]
+                # Index aveugle activé : on évite de déchiffrer tout le vault ; sinon recherche approximative classée
+                found = vault.search_secrets(query) if vault.blind_index is not None else vault.fuzzy_search(query)
                 
                 if not found:
                     console.print("[yellow]Aucun résultat trouvé.[/yellow]")
@@ -85,9 +90,10 @@ def run_cli(vault: VaultCore, network: NetworkCore):
                 table.add_column("Service", style="cyan")
                 table.add_column("Username", style="magenta")
                 table.add_column("Password", style="green")
+                table.add_column("Score", style="dim")
                 
                 for s in found:
-                    table.add_row(s['_uuid'][:8], s['service'], s['username'], s['password'])
+                    table.add_row(s['_uuid'][:8], s['service'], s['username'], s['password'], f"{s['_score']:.2f}" if '_score' in s else "")
                 console.print(table)
                 input("\nAppuyez sur <Entrée> pour continuer...")
                 
@@ -118,6 +124,8 @@ def run_cli(vault: VaultCore, network: NetworkCore):
 def main():
     parser = argparse.ArgumentParser(description="P2P-SafeGuard Node")
     parser.add_argument("--cli", action="store_true", help="Lancer uniquement l'interface CLI sans démarrer le serveur TCP")
+    parser.add_argument("--compact", action="store_true",
+                        help="Purger les tombstones expirés acquittés par tous les pairs, compacter le vault puis quitter")
     args = parser.parse_args()
 
     # 1. Charger la config
@@ -133,8 +141,15 @@ def main():
     port = config.get("port", 5000)
     peers = config.get("peers", [])
     allowed_bssids = config.get("allowed_bssids_hashes", [])
+    storage_backend = config.get("storage_backend", "json")
     
     db_path = "vault.json"
+    if storage_backend == "sqlite":
+        db_path = "vault.db"
+        # Migration one-shot : un vault.json existant est importé au premier lancement en SQLite
+        if not os.path.exists(db_path) and os.path.exists("vault.json"):
+            migrated = migrate_json_to_sqlite("vault.json", db_path)
+            console.print(f"Migration de vault.json vers {db_path} : {migrated} records importés.")
 
     # Vérifier l'état de la base de données
     is_new_vault = not os.path.exists(db_path)
@@ -161,25 +176,75 @@ def main():
         vault = VaultCore(
             master_password=master_password,
             allowed_bssids_hashes=allowed_bssids,
-            db_path=db_path
+            db_path=db_path,
+            durability=config.get("durability", "batched"),
+            write_batch_size=config.get("write_batch_size", 500),
+            write_batch_window=config.get("write_batch_window", 0.05),
+            tombstone_ttl=config.get("tombstone_ttl", 30 * 24 * 3600),
+            decrypted_cache_size=config.get("decrypted_cache_size", 10000),
+            blind_index=config.get("blind_index", False),
+            context_cache_ttl=config.get("context_cache_ttl", 2.0)
         )
     except ValueError:
         print("\n[ERREUR FATALE] Impossible de déverrouiller le Vault : Mot de passe incorrect ou base corrompue.")
         sys.exit(1)
 
+    # Index aveugle : les records créés avant son activation (ou reçus d'un pair sans index) sont indexés une fois
+    indexed = vault.rebuild_blind_index()
+    if indexed:
+        console.print(f"Index de recherche : {indexed} secret(s) indexé(s).")
+
     # 3. Initialisation Network (qui injecte dans le Vault les messages entrants)
+    # sync_state.json et hints.json n'appartiennent qu'au noeud qui fait tourner le serveur : en --cli ou --compact,
+    # un second processus les réécrirait par-dessus ceux du daemon, l'état reste donc en mémoire
+    # (--compact relit sync_state.json sans l'écrire : le GC des tombstones interroge tous les pairs connus)
+    owns_state = not (args.cli or args.compact)
     network = NetworkCore(
         node_id=node_id,
         host=host,
         port=port,
         peers=peers,
         apply_gossip_callback=vault.apply_remote_gossip,
-        get_all_records_callback=vault.get_records_for_sync
+        get_all_records_callback=vault.get_records_for_sync,
+        get_sync_digest_callback=vault.get_sync_digest,
+        get_records_by_uuid_callback=vault.get_records_by_uuid,
+        get_records_since_callback=vault.get_records_since,
+        install_snapshot_callback=vault.install_snapshot,
+        peer_state=PeerStateStore(None if args.cli else "sync_state.json", read_only=args.compact),
+        engine=config.get("network_engine", "threads"),
+        outbound_queue_size=config.get("outbound_queue_size", 10000),
+        outbound_overflow=config.get("outbound_overflow", "drop_oldest"),
+        hint_store=HintStore("hints.json" if owns_state else None),
+        membership=config.get("membership", False),
+        advertise_host=config.get("advertise_host"),
+        probe_interval=config.get("probe_interval", 1.0),
+        fanout=config.get("fanout"),
+        gossip_ttl=config.get("gossip_ttl", 6),
+        plumtree=config.get("plumtree", False),
+        graft_timeout=config.get("graft_timeout", 0.5),
+        seen_cache=config.get("seen_cache", "lru"),
+        seen_cache_size=config.get("seen_cache_size", 100000),
+        wire_format=config.get("wire_format", "binary"),
+        snapshot_bootstrap=config.get("snapshot_bootstrap", True),
+        get_expired_tombstones_callback=vault.get_expired_tombstones,
+        purge_tombstones_callback=vault.purge_tombstones,
+        anti_entropy_interval=config.get("anti_entropy_interval", 60.0)
     )
 
     # Lier le Vault au Network (le Vault prévient le réseau quand y'a une maj LOCALE)
     vault.on_sync_trigger = network.trigger_local_update
 
+    if args.compact:
+        # Commande de maintenance : GC des tombstones puis réécriture du stockage, sans démarrer le serveur
+        purged = network.collect_tombstones()
+        vault.compact()
+        network.stop()
+        if purged is None:
+            console.print("[yellow]Un pair n'a pas répondu : aucun tombstone purgé. Vault compacté.[/yellow]")
+        else:
+            console.print(f"[green]✔ {purged} tombstone(s) purgé(s). Vault compacté.[/green]")
+        return
+
     if not args.cli:
         # 4. Lancer le serveur TCP asynchrone (Ignoré en mode client simple)
         network.start()
@@ -188,20 +253,23 @@ def main():
         network.request_sync()
 
     # 6. Lancer l'UI / CLI ou mode Daemon
-    if sys.stdin.isatty():
-        run_cli(vault, network)
-    else:
-        print("Mode Daemon activé (pas de console interactive).")
-        try:
-            while True:
-                time.sleep(60)
-        except KeyboardInterrupt:
-            pass
-    
-    # 7. Extinction propre
-    if not args.cli:
-        print("Arrêt du daemon...")
-        network.stop()
+    try:
+        if sys.stdin.isatty():
+            run_cli(vault, network)
+        else:
+            print("Mode Daemon activé (pas de console interactive).")
+            try:
+                while True:
+                    time.sleep(60)
+            except KeyboardInterrupt:
+                pass
+    finally:
+        # 7. Extinction propre (aussi quand la CLI quitte via sys.exit)
+        if not args.cli:
+            print("Arrêt du daemon...")
+            network.stop()
+        vault.flush()
+        vault.lock()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,397 @@
+import asyncio
+import concurrent.futures
+import json
+import threading
+import time
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .framing import HEADER, PROTOCOL_VERSION, FrameError, encode_frame, FRAME_BINARY, FRAME_END, FRAME_MESSAGE, MAX_FRAME_SIZE
+from .wire_format import JSON_WIRE, WireFormat, accept_hello_reply, answer_hello, build_hello, check_wire_format, decode_message
+
+# Erreurs réseau "normales" en P2P (pair hors ligne, connexion coupée, délai dépassé)
+NETWORK_ERRORS = (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, FrameError, json.JSONDecodeError)
+
+class EventLoopThread:
+    """
+    Boucle asyncio exécutée dans un thread dédié, partagée par le serveur et le client asyncio.
+    Les callbacks du vault (I/O disque) sont déportés dans un pool de threads borné pour ne pas bloquer la boucle.
+    """
+
+    def __init__(self, max_workers: int = 8):
+        self.loop = asyncio.new_event_loop()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vault-io")
+        self.loop.set_default_executor(self.executor)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None or self._stopped:
+                return
+            self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+            self._thread.start()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Planifie une coroutine sur la boucle depuis n'importe quel thread."""
+        if self._stopped:
+            coro.close()
+            raise RuntimeError("Boucle asyncio arrêtée")
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Exécute une coroutine sur la boucle et attend son résultat (à ne pas appeler depuis la boucle)."""
+        return self.submit(coro).result(timeout)
+
+    async def _shutdown(self):
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self):
+        """Annule les tâches en cours, arrête la boucle et le pool de threads."""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            thread = self._thread
+        if thread is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result(2.0)
+            except (concurrent.futures.TimeoutError, RuntimeError):
+                pass
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            thread.join(2.0)
+        if not self.loop.is_running():
+            self.loop.close()
+        self.executor.shutdown(wait=False)
+
+async def read_frame_async(reader: asyncio.StreamReader, max_frame_size: int = MAX_FRAME_SIZE,
+                           prefix: bytes = b"") -> Optional[Tuple[int, bytes]]:
+    """
+    Équivalent asyncio de FrameReader.read_frame : retourne (type, payload),
+    ou None si la connexion est fermée proprement entre deux trames.
+    `prefix` contient les octets d'en-tête déjà lus (détection de l'ancien format).
+    """
+    try:
+        header = prefix + await reader.readexactly(HEADER.size - len(prefix))
+    except asyncio.IncompleteReadError as e:
+        if not prefix and not e.partial:
+            return None
+        raise FrameError("Connexion coupée au milieu d'un en-tête de trame")
+    version, kind, length = HEADER.unpack(header)
+    if version != PROTOCOL_VERSION:
+        raise FrameError(f"Version de protocole non supportée : {version}")
+    if length > max_frame_size:
+        raise FrameError(f"Trame trop grande : {length} octets (max {max_frame_size})")
+    try:
+        return kind, await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        raise FrameError("Connexion coupée au milieu d'une trame")
+
+class AsyncSocketServer:
+    """
+    Serveur TCP P2P asyncio : une seule boucle gère toutes les connexions entrantes (pas de thread par connexion).
+    Même protocole que SocketServer (trames de framing.py, ancien format JSON brut accepté).
+    Le callback est exécuté dans le pool de threads de la boucle.
+    """
+    def __init__(self, host: str, port: int, on_message_received: Callable[[dict], Optional[Union[dict, Iterable[dict]]]],
+                 loop_thread: EventLoopThread, client_timeout: float = 60.0, max_frame_size: int = MAX_FRAME_SIZE):
+        self.host = host
+        self.port = port
+        self.on_message_received = on_message_received
+        self.loop_thread = loop_thread
+        self.client_timeout = client_timeout
+        self.max_frame_size = max_frame_size
+        self.server_socket = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers = set()
+        self.is_running = False
+
+    def start(self):
+        self._server = self.loop_thread.run(self._start())
+        self.server_socket = self._server.sockets[0]
+        self.is_running = True
+        print(f"Serveur TCP (asyncio) en écoute sur {self.host}:{self.port}")
+
+    async def _start(self) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self._handle_client, self.host, self.port,
+                                          reuse_address=True, backlog=1024, limit=self.max_frame_size)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Traite les trames d'une connexion persistante (voir SocketServer._handle_client)."""
+        self._writers.add(writer)
+        loop = asyncio.get_running_loop()
+        try:
+            first_byte = await asyncio.wait_for(reader.read(1), self.client_timeout)
+            if not first_byte:
+                return
+            if first_byte == b"{":
+                # Ancien format : un seul message JSON, sans réponse
+                data = bytearray(first_byte)
+                while True:
+                    chunk = await asyncio.wait_for(reader.read(65536), self.client_timeout)
+                    if not chunk:
+                        break
+                    data += chunk
+                    if len(data) > self.max_frame_size:
+                        raise FrameError(f"Message trop grand (max {self.max_frame_size} octets)")
+                message = await loop.run_in_executor(None, self._decode, FRAME_MESSAGE, bytes(data))
+                responses = await loop.run_in_executor(None, self._process, message)
+                await loop.run_in_executor(None, list, responses)
+                return
+
+            wire = JSON_WIRE
+            prefix = first_byte
+            while True:
+                frame = await asyncio.wait_for(read_frame_async(reader, self.max_frame_size, prefix), self.client_timeout)
+                prefix = b""
+                if frame is None:
+                    break
+                kind, payload = frame
+                if kind not in (FRAME_MESSAGE, FRAME_BINARY):
+                    continue
+                # Décodage (JSON ou binaire, décompression) dans le pool : ne bloque pas la boucle
+                message = await loop.run_in_executor(None, self._decode, kind, payload)
+                if isinstance(message, dict) and message.get("type") == "WIRE_HELLO":
+                    # Négociation du format de la connexion : la réponse part toujours en JSON
+                    wire, reply = answer_hello(message)
+                    writer.write(JSON_WIRE.encode(reply) + encode_frame(b"", FRAME_END))
+                    await writer.drain()
+                    continue
+                async for response in self._responses(message):
+                    writer.write(wire.encode(response))
+                    await writer.drain()
+                writer.write(encode_frame(b"", FRAME_END))
+                await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError, asyncio.CancelledError):
+            pass
+        except FrameError as e:
+            print(f"Erreur : Trame reçue invalide ({e})")
+        except Exception as e:
+            print(f"Erreur de gestion client : {e}")
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _responses(self, message: Optional[dict]) -> AsyncIterator[dict]:
+        """Réponses du callback ; un flux de pages (générateur) est consommé page par page dans le pool."""
+        loop = asyncio.get_running_loop()
+        responses = await loop.run_in_executor(None, self._process, message)
+        if isinstance(responses, list):
+            for response in responses:
+                yield response
+            return
+        iterator = iter(responses)
+        done = object()
+        while True:
+            response = await loop.run_in_executor(None, next, iterator, done)
+            if response is done:
+                return
+            yield response
+
+    def _decode(self, kind: int, data: bytes) -> Optional[dict]:
+        """Décode un message JSON ou binaire ; None (et un avertissement) s'il est invalide."""
+        try:
+            return decode_message(kind, data, self.max_frame_size)
+        except (json.JSONDecodeError, UnicodeDecodeError, FrameError):
+            print("Erreur : Message reçu invalide (ni JSON ni binaire valide)")
+            return None
+
+    def _process(self, message: Optional[dict]) -> Iterable[dict]:
+        """Transmet un message décodé au callback et retourne ses réponses éventuelles."""
+        if message is None:
+            return []
+        response = self.on_message_received(message)
+        if response is None:
+            return []
+        return [response] if isinstance(response, dict) else response
+
+    async def _stop(self):
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+
+    def stop(self):
+        self.is_running = False
+        if self._server is None:
+            return
+        try:
+            self.loop_thread.run(self._stop(), timeout=2.0)
+        except (RuntimeError, concurrent.futures.TimeoutError):
+            pass
+
+class AsyncSocketClient:
+    """
+    Client TCP P2P asyncio, même interface que SocketClient (appels bloquants depuis les autres threads)
+    plus send_message_nowait, qui planifie un envoi sur la boucle sans créer de thread.
+    Connexions persistantes en petit pool par pair ; le nombre de connexions simultanées par pair est borné,
+    les envois en excès attendent leur tour sous forme de coroutines.
+    Le format de chaque connexion est négocié comme pour SocketClient (voir wire_format.WIRE_FORMATS).
+    """
+    def __init__(self, loop_thread: EventLoopThread, timeout: float = 2.0, pool_size: int = 2, idle_timeout: float = 30.0,
+                 max_connections_per_peer: int = 4, max_frame_size: int = MAX_FRAME_SIZE, wire_format: str = "binary"):
+        self.loop_thread = loop_thread
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.max_connections_per_peer = max_connections_per_peer
+        self.max_frame_size = max_frame_size
+        check_wire_format(wire_format)
+        self.wire_format = wire_format
+        # Manipulés uniquement depuis la boucle : pas de verrou
+        self._pools: Dict[Tuple[str, int], List[Tuple[asyncio.StreamReader, asyncio.StreamWriter, WireFormat, float]]] = {}
+        self._limits: Dict[Tuple[str, int], asyncio.Semaphore] = {}
+
+    async def _acquire(self, target_ip: str, target_port: int) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, WireFormat, bool]:
+        """
+        Retourne (lecteur, écrivain, format, réutilisée) : une connexion saine du pool,
+        sinon une nouvelle connexion dont le format est négocié.
+        """
+        now = time.monotonic()
+        idle = self._pools.get((target_ip, target_port), [])
+        while idle:
+            reader, writer, wire, released_at = idle.pop()
+            # Une connexion inactive ayant reçu EOF ou des données a été fermée par le pair ou est désynchronisée
+            if now - released_at < self.idle_timeout and not writer.is_closing() and not reader.at_eof():
+                return reader, writer, wire, True
+            writer.close()
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(target_ip, target_port, limit=self.max_frame_size), self.timeout)
+        try:
+            wire = await asyncio.wait_for(self._negotiate(reader, writer), self.timeout)
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer, wire, False
+
+    async def _negotiate(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> WireFormat:
+        """Propose l'encodage binaire au pair ; sans réponse WIRE_HELLO_REPLY, la connexion reste en JSON."""
+        if self.wire_format == "json":
+            return JSON_WIRE
+        writer.write(JSON_WIRE.encode(build_hello(self.wire_format)))
+        await writer.drain()
+        reply = None
+        while True:
+            frame = await read_frame_async(reader, self.max_frame_size)
+            if frame is None:
+                raise FrameError("Connexion fermée par le pair pendant la négociation")
+            kind, payload = frame
+            if kind == FRAME_END:
+                return accept_hello_reply(reply)
+            reply = decode_message(kind, payload, self.max_frame_size)
+
+    def _release(self, target_ip: str, target_port: int, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 wire: WireFormat):
+        idle = self._pools.setdefault((target_ip, target_port), [])
+        if len(idle) < self.pool_size:
+            idle.append((reader, writer, wire, time.monotonic()))
+        else:
+            writer.close()
+
+    async def _exchange(self, target_ip: str, target_port: int, message: dict, timeout: Optional[float]) -> AsyncIterator[dict]:
+        """Envoie un message et produit les réponses jusqu'à la trame FRAME_END (voir SocketClient._exchange)."""
+        encoded: Dict[WireFormat, bytes] = {}
+        timeout = timeout if timeout is not None else self.timeout
+        limit = self._limits.setdefault((target_ip, target_port), asyncio.Semaphore(self.max_connections_per_peer))
+        async with limit:
+            for attempt in range(2):
+                reader, writer, wire, reused = await self._acquire(target_ip, target_port)
+                released = False
+                produced = False
+                try:
+                    if wire not in encoded:
+                        encoded[wire] = wire.encode(message)
+                    writer.write(encoded[wire])
+                    await asyncio.wait_for(writer.drain(), timeout)
+                    while True:
+                        frame = await asyncio.wait_for(read_frame_async(reader, self.max_frame_size), timeout)
+                        if frame is None:
+                            break
+                        kind, payload = frame
+                        if kind == FRAME_END:
+                            self._release(target_ip, target_port, reader, writer, wire)
+                            released = True
+                            return
+                        produced = True
+                        yield decode_message(kind, payload, self.max_frame_size)
+                    if reused and not produced:
+                        continue # Connexion du pool fermée par le pair entre-temps : on reconnecte
+                    raise FrameError("Connexion fermée par le pair avant la fin de la réponse")
+                except (OSError, asyncio.TimeoutError):
+                    if reused and not produced and attempt == 0:
+                        continue
+                    raise
+                finally:
+                    if not released:
+                        writer.close()
+
+    async def send_message_async(self, target_ip: str, target_port: int, message: dict) -> bool:
+        """Coroutine d'envoi (à attendre depuis la boucle) : retourne True si l'envoi a réussi."""
+        try:
+            async for _ in self._exchange(target_ip, target_port, message, None):
+                pass
+            return True
+        except NETWORK_ERRORS:
+            return False
+
+    def send_message_nowait(self, target_ip: str, target_port: int, message: dict) -> Optional[concurrent.futures.Future]:
+        """Planifie l'envoi d'un message sur la boucle sans attendre (ni créer de thread)."""
+        try:
+            return self.loop_thread.submit(self.send_message_async(target_ip, target_port, message))
+        except RuntimeError:
+            return None
+
+    def send_message(self, target_ip: str, target_port: int, message: dict) -> bool:
+        """Envoie un message JSON à un pair cible et attend la fin de l'échange. Retourne True si l'envoi a réussi."""
+        future = self.send_message_nowait(target_ip, target_port, message)
+        return future.result() if future is not None else False
+
+    def request(self, target_ip: str, target_port: int, message: dict, timeout: Optional[float] = None) -> Optional[dict]:
+        """Envoie une requête JSON et attend la réponse du pair. Retourne None si le pair est injoignable."""
+        responses = list(self.request_stream(target_ip, target_port, message, timeout))
+        return responses[0] if responses else None
+
+    def request_stream(self, target_ip: str, target_port: int, message: dict, timeout: Optional[float] = None) -> Iterator[dict]:
+        """
+        Envoie une requête JSON et produit les réponses du pair au fil de l'eau.
+        S'arrête silencieusement si le pair est injoignable ou si la connexion est coupée.
+        """
+        responses = self._exchange(target_ip, target_port, message, timeout)
+        try:
+            while True:
+                try:
+                    response = self.loop_thread.run(self._next(responses))
+                except (RuntimeError, *NETWORK_ERRORS):
+                    return
+                if response is None:
+                    return
+                yield response
+        finally:
+            try:
+                self.loop_thread.run(responses.aclose())
+            except RuntimeError:
+                pass
+
+    @staticmethod
+    async def _next(responses: AsyncIterator[dict]) -> Optional[dict]:
+        """Réponse suivante d'un échange, ou None à la fin de la réponse."""
+        try:
+            return await responses.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    async def _close_all(self):
+        pools, self._pools = self._pools, {}
+        for idle in pools.values():
+            for _, writer, _, _ in idle:
+                writer.close()
+
+    def close(self):
+        """Ferme toutes les connexions du pool."""
+        try:
+            self.loop_thread.run(self._close_all(), timeout=2.0)
+        except (RuntimeError, concurrent.futures.TimeoutError):
+            pass
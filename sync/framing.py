@@ -0,0 +1,98 @@
+import socket
+import struct
+from typing import Optional, Tuple
+
+# En-tête d'une trame : version du protocole (1 octet), type de trame (1 octet), longueur du payload (4 octets)
+PROTOCOL_VERSION = 1
+HEADER = struct.Struct(">BBI")
+
+# Types de trame
+FRAME_MESSAGE = 0   # payload = un message JSON
+FRAME_END = 1       # fin de la réponse à un message (payload vide)
+FRAME_BINARY = 2    # payload = un message en encodage binaire (voir wire_format.py)
+
+# Taille max d'un payload : au-delà, la connexion est considérée invalide
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+class FrameError(ValueError):
+    """Trame invalide (version inconnue, taille excessive, connexion coupée au milieu d'une trame)."""
+
+def encode_frame(payload: bytes, kind: int = FRAME_MESSAGE) -> bytes:
+    """Préfixe le payload de l'en-tête (version, type, longueur)."""
+    return HEADER.pack(PROTOCOL_VERSION, kind, len(payload)) + payload
+
+class FrameReader:
+    """
+    Lecture de trames sur une socket via un buffer réutilisable (recv_into + memoryview) :
+    pas de concaténation de bytes à chaque lecture, plusieurs trames par connexion.
+    """
+
+    def __init__(self, sock: socket.socket, max_frame_size: int = MAX_FRAME_SIZE, buffer_size: int = 65536):
+        self.sock = sock
+        self.max_frame_size = max_frame_size
+        self._buffer = bytearray(buffer_size)
+        self._start = 0 # Début des octets non consommés
+        self._end = 0   # Fin des octets reçus
+
+    def _fill(self, size: int) -> bool:
+        """Garantit `size` octets disponibles dans le buffer. Retourne False si EOF avant."""
+        while self._end - self._start < size:
+            if self._start + size > len(self._buffer):
+                # Place insuffisante : on ramène les octets en attente au début (et on agrandit si besoin)
+                pending = self._end - self._start
+                if size > len(self._buffer):
+                    new_buffer = bytearray(max(size, 2 * len(self._buffer)))
+                    new_buffer[:pending] = self._buffer[self._start:self._end]
+                    self._buffer = new_buffer
+                else:
+                    self._buffer[:pending] = self._buffer[self._start:self._end]
+                self._start, self._end = 0, pending
+            with memoryview(self._buffer) as view:
+                received = self.sock.recv_into(view[self._end:])
+            if not received:
+                return False
+            self._end += received
+        return True
+
+    def has_buffered_data(self) -> bool:
+        return self._end > self._start
+
+    def peek_byte(self) -> Optional[int]:
+        """Premier octet non consommé (sans le consommer), ou None si la connexion est fermée."""
+        if not self._fill(1):
+            return None
+        return self._buffer[self._start]
+
+    def read_frame(self) -> Optional[Tuple[int, bytes]]:
+        """
+        Lit la trame suivante et retourne (type, payload).
+        Retourne None si la connexion est fermée proprement entre deux trames.
+        """
+        if not self._fill(HEADER.size):
+            if self.has_buffered_data():
+                raise FrameError("Connexion coupée au milieu d'un en-tête de trame")
+            return None
+        version, kind, length = HEADER.unpack_from(self._buffer, self._start)
+        if version != PROTOCOL_VERSION:
+            raise FrameError(f"Version de protocole non supportée : {version}")
+        if length > self.max_frame_size:
+            raise FrameError(f"Trame trop grande : {length} octets (max {self.max_frame_size})")
+        if not self._fill(HEADER.size + length):
+            raise FrameError("Connexion coupée au milieu d'une trame")
+        payload_start = self._start + HEADER.size
+        with memoryview(self._buffer) as view:
+            payload = bytes(view[payload_start:payload_start + length])
+        self._start = payload_start + length
+        if self._start == self._end:
+            self._start = self._end = 0
+        return kind, payload
+
+    def read_until_eof(self, max_size: Optional[int] = None) -> bytes:
+        """Lit tout jusqu'à la fermeture de la connexion (messages JSON bruts des anciennes versions)."""
+        max_size = max_size or self.max_frame_size
+        while self._fill(self._end - self._start + 1):
+            if self._end - self._start > max_size:
+                raise FrameError(f"Message trop grand (max {max_size} octets)")
+        data = bytes(self._buffer[self._start:self._end])
+        self._start = self._end = 0
+        return data
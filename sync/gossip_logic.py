@@ -1,38 +1,304 @@
-from typing import List, Dict, Tuple
+import json
+import random
+from typing import Callable, List, Dict, Optional, Tuple, Union
+
+from .seen_cache import SeenCache, BloomSeenFilter
+
+# Taille max (octets JSON) des records d'un même GOSSIP_BATCH (borne la taille d'une trame)
+MAX_BATCH_BYTES = 60000
 
 class GossipLogic:
-    """Implémente la logique métier du protocole Gossip (Path Vector)."""
+    """
+    Implémente la logique métier du protocole Gossip (Path Vector).
+    Deux modes de diffusion :
+      - flood (fanout=None) : chaque record accepté est renvoyé à tous les pairs,
+      - épidémique (fanout=k) : il est renvoyé à k pairs tirés au hasard, au plus `ttl` sauts.
+        Un noeud ne relaie qu'une fois chaque version (LWW) : le vecteur de chemin se réduit à l'émetteur.
+    En mode arbre (plumtree=True, voir plumtree.py), les messages portent aussi l'adresse de l'émetteur
+    (`reply_to`) pour les PRUNE/GRAFT, et le vecteur de chemin se réduit de même à l'émetteur.
+    """
     
-    def __init__(self, my_node_id: str):
+    def __init__(self, my_node_id: str, fanout: Optional[int] = None, ttl: int = 6, plumtree: bool = False,
+                 seen_cache: Optional[Union[SeenCache, BloomSeenFilter]] = None,
+                 local_versions: Optional[Callable[[List[str]], Dict[str, float]]] = None):
         self.my_node_id = my_node_id
+        # Mises à jour (uuid, updated_at) déjà vues : les doublons sont écartés avant tout accès au vault
+        self.seen_cache = seen_cache
+        # uuids -> updated_at locaux : confirme les "déjà vu" d'un cache probabiliste (faux positifs du filtre de Bloom)
+        self.local_versions = local_versions
+        self.fanout = fanout if not plumtree else None
+        self.ttl = ttl
+        self.plumtree = plumtree
+        # Adresse annoncée dans `reply_to` (mode arbre), fixée au démarrage du serveur
+        self.address: Optional[Dict[str, int]] = None
 
-    def build_gossip_message(self, record: dict, current_path_vector: List[str] = None) -> dict:
+    @property
+    def is_epidemic(self) -> bool:
+        return self.fanout is not None
+
+    def build_gossip_message(self, record: dict, current_path_vector: List[str] = None, ttl: Optional[int] = None) -> dict:
         """
         Construit un paquet réseau pour propager un record.
         Ajoute cet appareil (node_id) au vecteur de chemin pour éviter les boucles.
+        En mode épidémique, `ttl` est le nombre de sauts restants (self.ttl pour une mise à jour locale).
         """
-        if current_path_vector is None:
-            path_vector = [self.my_node_id]
-        else:
-            path_vector = list(current_path_vector)
-            if self.my_node_id not in path_vector:
-                path_vector.append(self.my_node_id)
-                
-        return {
+        message = {
             "type": "GOSSIP_UPDATE",
             "sender_id": self.my_node_id,
-            "path_vector": path_vector,
+            "path_vector": self._extend_path_vector(current_path_vector),
             "payload": record
         }
+        return self._decorate(message, ttl)
 
-    def build_sync_request(self) -> dict:
+    def build_gossip_batch(self, records: List[dict], current_path_vector: List[str] = None, ttl: Optional[int] = None) -> dict:
         """
-        Construit un message pour demander à tous les pairs de nous pousser leur base de données.
+        Construit un paquet réseau propageant plusieurs records en une seule trame.
+        Même règle de path vector (et de TTL) que pour GOSSIP_UPDATE.
         """
-        return {
+        message = {
+            "type": "GOSSIP_BATCH",
+            "sender_id": self.my_node_id,
+            "path_vector": self._extend_path_vector(current_path_vector),
+            "payload": list(records)
+        }
+        return self._decorate(message, ttl)
+
+    def _decorate(self, message: dict, ttl: Optional[int]) -> dict:
+        """Ajoute le TTL (mode épidémique) ou l'adresse de réponse (mode arbre) à un message de diffusion."""
+        if self.is_epidemic:
+            message["ttl"] = self.ttl if ttl is None else ttl
+        if self.plumtree and self.address is not None:
+            message["reply_to"] = dict(self.address)
+        return message
+
+    def build_ihave(self, update_ids: List[Tuple[str, float]]) -> dict:
+        """Annonce lazy (mode arbre) : identifiants (uuid, updated_at) des mises à jour que l'on possède."""
+        return self._decorate({
+            "type": "IHAVE",
+            "sender_id": self.my_node_id,
+            "ids": [list(update_id) for update_id in update_ids]
+        }, None)
+
+    def build_graft(self, uuids: List[str]) -> dict:
+        """Réclame des mises à jour annoncées mais pas reçues, et rend le lien eager (mode arbre)."""
+        return self._decorate({
+            "type": "GRAFT",
+            "sender_id": self.my_node_id,
+            "uuids": list(uuids)
+        }, None)
+
+    def build_prune(self) -> dict:
+        """Doublon reçu : le lien devient lazy (mode arbre)."""
+        return self._decorate({
+            "type": "PRUNE",
+            "sender_id": self.my_node_id
+        }, None)
+
+    @staticmethod
+    def reply_address(message: dict) -> Optional[Tuple[str, int]]:
+        """Adresse (ip, port) de l'émetteur d'un message du mode arbre, ou None."""
+        reply_to = message.get("reply_to")
+        if not isinstance(reply_to, dict):
+            return None
+        try:
+            return str(reply_to["ip"]), int(reply_to["port"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def next_ttl(self, message: dict) -> Optional[int]:
+        """
+        TTL d'un message relayé (None en mode flood). À 0, le message n'est plus relayé.
+        Un message sans TTL (pair en mode flood) repart avec le TTL complet.
+        """
+        if not self.is_epidemic:
+            return None
+        try:
+            return max(0, int(message.get("ttl", self.ttl + 1)) - 1)
+        except (TypeError, ValueError):
+            return 0
+
+    def select_targets(self, peers: List[Dict[str, int]]) -> List[Dict[str, int]]:
+        """Pairs destinataires d'une diffusion : tous (flood) ou `fanout` tirés au hasard (épidémique)."""
+        if not self.is_epidemic or len(peers) <= self.fanout:
+            return list(peers)
+        return random.sample(peers, self.fanout)
+
+    def _extend_path_vector(self, current_path_vector: List[str] = None) -> List[str]:
+        """Retourne le vecteur de chemin complété par cet appareil (réduit à l'émetteur en mode épidémique ou arbre)."""
+        if current_path_vector is None or self.is_epidemic or self.plumtree:
+            return [self.my_node_id]
+        path_vector = list(current_path_vector)
+        if self.my_node_id not in path_vector:
+            path_vector.append(self.my_node_id)
+        return path_vector
+
+    @staticmethod
+    def chunk_records(records: List[dict], max_bytes: int = MAX_BATCH_BYTES) -> List[List[dict]]:
+        """Découpe une liste de records en lots dont la taille JSON reste sous `max_bytes`."""
+        chunks, current, current_size = [], [], 0
+        for record in records:
+            size = len(json.dumps(record)) + 2
+            if current and current_size + size > max_bytes:
+                chunks.append(current)
+                current, current_size = [], 0
+            current.append(record)
+            current_size += size
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def build_sync_request(self, cursor: Optional[str] = None, page_size: Optional[int] = None) -> dict:
+        """
+        Construit un message pour demander à un pair de nous envoyer sa base de données.
+        Avec `page_size`, la réponse est dirigée vers nous seuls, paginée sur la même connexion
+        et reprend après `cursor` (dernier uuid reçu). Sans, c'est le SYNC_REQUEST historique.
+        """
+        message = {
             "type": "SYNC_REQUEST",
             "sender_id": self.my_node_id
         }
+        if page_size is not None:
+            message["page_size"] = page_size
+            message["cursor"] = cursor
+        return message
+
+    def build_sync_page(self, records: List[dict], cursor: Optional[str], done: bool) -> dict:
+        """Une page de réponse à un SYNC_REQUEST paginé ; `cursor` permet de reprendre après une coupure."""
+        return {
+            "type": "SYNC_PAGE",
+            "sender_id": self.my_node_id,
+            "cursor": cursor,
+            "done": done,
+            "payload": list(records)
+        }
+
+    def build_snapshot_request(self) -> dict:
+        """Bootstrap d'un nouveau noeud : demande à un pair un snapshot complet et cohérent de son vault."""
+        return {
+            "type": "SNAPSHOT_REQUEST",
+            "sender_id": self.my_node_id
+        }
+
+    def build_snapshot_page(self, records: List[dict], seq: int, total: int, high_water: Optional[float], done: bool) -> dict:
+        """
+        Une page du snapshot, toutes issues de la même lecture du vault : `seq` numérote les pages,
+        `total` (nombre de records) et `high_water` (plus grand updated_at) décrivent le snapshot entier.
+        """
+        return {
+            "type": "SNAPSHOT_PAGE",
+            "sender_id": self.my_node_id,
+            "seq": seq,
+            "total": total,
+            "high_water": high_water,
+            "done": done,
+            "payload": list(records)
+        }
+
+    def build_merkle_query(self, prefixes: List[str]) -> dict:
+        """
+        Construit une requête d'anti-entropie : demande au pair les hash des noeuds `prefixes`
+        de son arbre de Merkle (et de leurs enfants), ou le contenu des feuilles.
+        """
+        return {
+            "type": "MERKLE_QUERY",
+            "sender_id": self.my_node_id,
+            "prefixes": list(prefixes)
+        }
+
+    def build_merkle_reply(self, depth: int, hashes: Dict[str, str], buckets: Dict[str, list],
+                           high_water: Optional[float] = None) -> dict:
+        return {
+            "type": "MERKLE_REPLY",
+            "sender_id": self.my_node_id,
+            "depth": depth,
+            "hashes": hashes,
+            "buckets": buckets,
+            "high_water": high_water
+        }
+
+    def build_fetch_request(self, uuids: List[str]) -> dict:
+        """Demande à un pair les records complets correspondant à `uuids`."""
+        return {
+            "type": "SYNC_FETCH",
+            "sender_id": self.my_node_id,
+            "uuids": list(uuids)
+        }
+
+    def build_fetch_reply(self, records: List[dict]) -> dict:
+        return {
+            "type": "SYNC_FETCH_REPLY",
+            "sender_id": self.my_node_id,
+            "payload": list(records)
+        }
+
+    def build_sync_since_request(self, since: float, page_size: Optional[int] = None) -> dict:
+        """
+        Demande à un pair tous les records dont updated_at est strictement supérieur à `since`.
+        Avec `page_size`, la réponse arrive en pages bornées sur la même connexion (sans : une seule réponse).
+        """
+        message = {
+            "type": "SYNC_SINCE",
+            "sender_id": self.my_node_id,
+            "since": since
+        }
+        if page_size is not None:
+            message["page_size"] = page_size
+        return message
+
+    def build_sync_since_reply(self, records: List[dict], high_water: float, done: Optional[bool] = None) -> dict:
+        """Réponse à un SYNC_SINCE ; `done` marque la dernière page d'une réponse paginée."""
+        message = {
+            "type": "SYNC_SINCE_REPLY",
+            "sender_id": self.my_node_id,
+            "high_water": high_water,
+            "payload": list(records)
+        }
+        if done is not None:
+            message["done"] = done
+        return message
+
+    def build_tombstone_query(self, entries: List[Tuple[str, float]]) -> dict:
+        """GC des tombstones : demande au pair s'il a bien vu les suppressions (uuid, updated_at) avant de les purger."""
+        return {
+            "type": "TOMBSTONE_QUERY",
+            "sender_id": self.my_node_id,
+            "entries": [[record_uuid, updated_at] for record_uuid, updated_at in entries]
+        }
+
+    def build_tombstone_ack(self, uuids: List[str]) -> dict:
+        return {
+            "type": "TOMBSTONE_ACK",
+            "sender_id": self.my_node_id,
+            "uuids": list(uuids)
+        }
+
+    def build_ping(self, member: dict, updates: List[dict]) -> dict:
+        """Sonde de membership (SWIM) ; `member` décrit l'émetteur, `updates` propage des changements d'état."""
+        return {
+            "type": "PING",
+            "sender_id": self.my_node_id,
+            "member": member,
+            "updates": list(updates)
+        }
+
+    def build_ping_req(self, target_ip: str, target_port: int, member: dict, updates: List[dict]) -> dict:
+        """Demande à un pair de sonder `target` à notre place (sonde indirecte)."""
+        return {
+            "type": "PING_REQ",
+            "sender_id": self.my_node_id,
+            "target": {"ip": target_ip, "port": target_port},
+            "member": member,
+            "updates": list(updates)
+        }
+
+    def build_ack(self, ok: bool, member: dict, updates: List[dict]) -> dict:
+        return {
+            "type": "ACK",
+            "sender_id": self.my_node_id,
+            "ok": ok,
+            "member": member,
+            "updates": list(updates)
+        }
 
     def should_process_message(self, message: dict) -> Tuple[bool, dict]:
         """
@@ -48,5 +314,57 @@ class GossipLogic:
         if self.my_node_id in path_vector:
             # print(f"GossipLogic : Message droppé, je suis déjà dans la boucle {path_vector}")
             return False, {}
+
+        payload = message.get("payload", {})
+        if not self._unseen([payload]):
+            return False, {} # Doublon arrivé par une autre route
             
-        return True, message.get("payload", {})
+        return True, payload
+
+    def should_process_batch(self, message: dict) -> Tuple[bool, List[dict]]:
+        """
+        Équivalent de should_process_message pour un GOSSIP_BATCH.
+        Retourne (is_valid, records) ; les entrées qui ne sont pas des records sont écartées.
+        """
+        if not isinstance(message, dict) or message.get("type") != "GOSSIP_BATCH":
+            return False, []
+            
+        if self.my_node_id in message.get("path_vector", []):
+            return False, []
+            
+        payload = message.get("payload", [])
+        if not isinstance(payload, list):
+            return False, []
+        records = self._unseen([r for r in payload if isinstance(r, dict) and "uuid" in r and "updated_at" in r])
+        return bool(records), records
+
+    def _unseen(self, records: List[dict]) -> List[dict]:
+        """
+        Records dont la version n'a pas encore été vue (ordre conservé). Avec un cache probabiliste,
+        un "déjà vu" n'écarte le record qu'une fois confirmé par le vault (version locale au moins aussi récente),
+        en une seule lecture pour tout le lot.
+        """
+        seen = [r for r in records if self.is_seen(r)]
+        if not seen:
+            return records
+        if getattr(self.seen_cache, "probabilistic", False) and self.local_versions is not None:
+            local = self.local_versions([str(r["uuid"]) for r in seen])
+            seen = [r for r in seen if local.get(str(r["uuid"]), float("-inf")) >= r.get("updated_at", 0)]
+        seen_ids = {id(r) for r in seen}
+        return [r for r in records if id(r) not in seen_ids]
+
+    def mark_seen(self, record: dict):
+        """Marque une version comme vue (mise à jour locale : ses échos seront écartés)."""
+        self.is_seen(record)
+
+    def is_seen(self, record: dict) -> bool:
+        """
+        Vrai si la version (uuid, updated_at) de ce record a déjà été vue ; sinon elle est marquée comme vue.
+        Toujours faux sans cache.
+        """
+        if self.seen_cache is None or not isinstance(record, dict) or "uuid" not in record:
+            return False
+        try:
+            return self.seen_cache.check_and_add((str(record["uuid"]), float(record.get("updated_at", 0))))
+        except (TypeError, ValueError):
+            return False
@@ -0,0 +1,122 @@
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+class HintStore:
+    """
+    Hinted handoff persistant (hints.json) : mises à jour non délivrées à un pair hors ligne.
+    Seuls les couples uuid -> updated_at sont conservés (dédupliqués par uuid) ;
+    au rejeu, la version courante des records est relue dans le vault.
+    Les écritures sont regroupées : le fichier est réécrit au plus une fois par `flush_interval` secondes,
+    et à la fermeture (close). Un crash perd au pire les derniers hints, rattrapés par l'anti-entropie.
+    """
+
+    def __init__(self, path: Optional[str] = "hints.json", flush_interval: float = 1.0):
+        # path=None : hints gardés en mémoire uniquement (tests, mode --cli)
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._hints: Dict[str, Dict[str, float]] = self._load()
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+
+    @staticmethod
+    def peer_key(ip: str, port: int) -> str:
+        return f"{ip}:{port}"
+
+    def _load(self) -> Dict[str, Dict[str, float]]:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            print(f"Erreur: {self.path} est corrompu. Les pairs seront rattrapés par la synchronisation au démarrage.")
+            return {}
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._hints, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def _mark_dirty(self):
+        """Planifie l'écriture des hints modifiés (verrou tenu)."""
+        if not self.path:
+            return
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Écrit hints.json si des hints ont changé depuis la dernière écriture."""
+        with self._lock:
+            self._timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+            self._save()
+
+    def close(self):
+        """Annule l'écriture planifiée et écrit immédiatement les hints en attente."""
+        with self._lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        self.flush()
+
+    def add(self, ip: str, port: int, records: Iterable[dict]):
+        """Mémorise des records non délivrés à ce pair (une entrée par uuid, la plus récente)."""
+        with self._lock:
+            hints = self._hints.setdefault(self.peer_key(ip, port), {})
+            changed = False
+            for record in records:
+                updated_at = record.get("updated_at", 0)
+                if hints.get(record["uuid"], float("-inf")) < updated_at:
+                    hints[record["uuid"]] = updated_at
+                    changed = True
+            if not hints:
+                del self._hints[self.peer_key(ip, port)]
+            if changed:
+                self._mark_dirty()
+
+    def get(self, ip: str, port: int) -> Dict[str, float]:
+        """Hints en attente pour ce pair (uuid -> updated_at)."""
+        with self._lock:
+            return dict(self._hints.get(self.peer_key(ip, port), {}))
+
+    def count(self, ip: str, port: int) -> int:
+        with self._lock:
+            return len(self._hints.get(self.peer_key(ip, port), {}))
+
+    def discard(self, ip: str, port: int, delivered: Dict[str, float]):
+        """Retire les hints délivrés, sauf ceux remplacés entre-temps par une version plus récente."""
+        with self._lock:
+            key = self.peer_key(ip, port)
+            hints = self._hints.get(key)
+            if not hints:
+                return
+            changed = False
+            for record_uuid, updated_at in delivered.items():
+                if record_uuid in hints and hints[record_uuid] <= updated_at:
+                    del hints[record_uuid]
+                    changed = True
+            if not hints:
+                del self._hints[key]
+            if changed:
+                self._mark_dirty()
+
+    def peers(self) -> List[Tuple[str, int]]:
+        """Pairs ayant des hints en attente."""
+        with self._lock:
+            keys = list(self._hints)
+        peers = []
+        for key in keys:
+            ip, _, port = key.rpartition(":")
+            peers.append((ip, int(port)))
+        return peers
@@ -0,0 +1,249 @@
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .gossip_logic import GossipLogic
+
+# États d'un membre
+ALIVE = "alive"
+SUSPECT = "suspect"
+DEAD = "dead"
+STATES = (ALIVE, SUSPECT, DEAD)
+
+class Membership:
+    """
+    Membership et détection de pannes façon SWIM.
+    À chaque période, un membre est sondé (PING) ; sans réponse, `indirect_probes` autres membres le sondent
+    à notre place (PING_REQ). Toujours sans réponse, il devient suspect, puis mort après `suspect_timeout` s.
+    Les changements d'état sont propagés en piggyback des PING/ACK, chacun retransmis
+    ~retransmit_mult * log2(N) fois : ils atteignent tous les noeuds en O(log N) périodes.
+    L'incarnation d'un noeud est l'instant de son démarrage (croissante d'une exécution à l'autre) ;
+    un noeud suspecté à tort la relève pour réfuter la suspicion.
+    Les membres sont indexés par l'adresse que retourne `resolve` (ex: nom d'hôte résolu en IP) : un point d'entrée
+    configuré par son nom et le même noeud annoncé par son IP ne font qu'un membre.
+    """
+
+    def __init__(self, node_id: str, ip: str, port: int, seeds: List[Dict[str, int]], gossip_logic: GossipLogic,
+                 request: Callable[..., Optional[dict]], probe_interval: float = 1.0, probe_timeout: float = 0.5,
+                 indirect_probes: int = 3, suspect_timeout: float = 5.0, retransmit_mult: int = 3,
+                 max_piggyback: int = 8, dead_probe_every: int = 10,
+                 on_change: Optional[Callable[[str, int, str], None]] = None,
+                 resolve: Optional[Callable[[str, int], Tuple[str, int]]] = None):
+        self.node_id = node_id
+        self.ip = ip
+        self.port = port
+        self.gossip_logic = gossip_logic
+        self.request = request
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.indirect_probes = indirect_probes
+        self.suspect_timeout = suspect_timeout
+        self.retransmit_mult = retransmit_mult
+        self.max_piggyback = max_piggyback
+        # Toutes les `dead_probe_every` périodes, un membre mort est sondé (fin de partition réseau)
+        self.dead_probe_every = dead_probe_every
+        self.on_change = on_change
+        self.resolve = resolve if resolve is not None else (lambda ip, port: (ip, port))
+        self.incarnation = time.time()
+
+        self._lock = threading.Lock()
+        # (ip, port) -> {"ip", "port", "node_id", "state", "incarnation", "changed_at"}
+        self._members: Dict[Tuple[str, int], dict] = {}
+        # Changements d'état à propager : (ip, port) -> [update, retransmissions restantes]
+        self._updates: Dict[Tuple[str, int], list] = {}
+        self._probe_order: List[Tuple[str, int]] = []
+        self._rounds = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(max_workers=max(1, indirect_probes), thread_name_prefix="swim")
+        now = time.monotonic()
+        for seed in seeds:
+            key = self.resolve(seed["ip"], seed["port"])
+            if key != self.resolve(ip, port):
+                self._members[key] = {"ip": key[0], "port": key[1], "node_id": None, "state": ALIVE,
+                                      "incarnation": 0.0, "changed_at": now}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False)
+
+    def _run(self):
+        while not self._stop.wait(self.probe_interval):
+            try:
+                self.probe_round()
+            except Exception as e:
+                print(f"Erreur de membership : {e}")
+
+    def self_member(self) -> dict:
+        return {"ip": self.ip, "port": self.port, "node_id": self.node_id, "state": ALIVE, "incarnation": self.incarnation}
+
+    def peers(self, states: Iterable[str] = (ALIVE, SUSPECT)) -> List[Dict[str, int]]:
+        """Membres dans l'un des états demandés (par défaut : ceux à qui l'on envoie le gossip)."""
+        with self._lock:
+            return [{"ip": m["ip"], "port": m["port"]} for m in self._members.values() if m["state"] in states]
+
+    def state_of(self, ip: str, port: int) -> Optional[str]:
+        with self._lock:
+            member = self._members.get(self.resolve(ip, port))
+            return member["state"] if member else None
+
+    def apply_update(self, update: dict) -> bool:
+        """
+        Applique un changement d'état reçu (règles de précédence SWIM). Retourne True s'il a été retenu.
+          - alive(i) remplace un état d'incarnation < i,
+          - suspect(i) remplace alive(j) si i >= j, suspect(j) ou dead(j) si i > j,
+          - dead(i) remplace alive(j) ou suspect(j) si i >= j.
+        """
+        try:
+            key = self.resolve(str(update["ip"]), int(update["port"]))
+            state = update["state"]
+            incarnation = float(update["incarnation"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        if state not in STATES:
+            return False
+
+        if key == self.resolve(self.ip, self.port) or (update.get("node_id") is not None and update.get("node_id") == self.node_id):
+            if state != ALIVE and incarnation >= self.incarnation:
+                # Suspicion à notre sujet : on la réfute avec une incarnation plus récente
+                with self._lock:
+                    self.incarnation = max(time.time(), incarnation + 1.0)
+                    self._queue_update(key, self.self_member())
+            return False
+
+        with self._lock:
+            current = self._members.get(key)
+            if current is None:
+                accepted = True
+            elif state == ALIVE:
+                accepted = incarnation > current["incarnation"]
+            elif state == SUSPECT:
+                accepted = incarnation > current["incarnation"] or (incarnation == current["incarnation"] and current["state"] == ALIVE)
+            else:
+                accepted = incarnation >= current["incarnation"] and current["state"] != DEAD
+            if not accepted:
+                return False
+            previous_state = current["state"] if current else None
+            node_id = update.get("node_id") or (current["node_id"] if current else None)
+            member = {"ip": key[0], "port": key[1], "node_id": node_id, "state": state,
+                      "incarnation": incarnation, "changed_at": time.monotonic()}
+            self._members[key] = member
+            self._queue_update(key, member)
+
+        if state != previous_state and self.on_change is not None:
+            self.on_change(key[0], key[1], state)
+        return True
+
+    def _queue_update(self, key: Tuple[str, int], member: dict):
+        """Met un changement d'état en file de propagation (verrou tenu)."""
+        update = {k: member[k] for k in ("ip", "port", "node_id", "state", "incarnation")}
+        retransmissions = self.retransmit_mult * max(1, math.ceil(math.log2(len(self._members) + 2)))
+        self._updates[key] = [update, retransmissions]
+
+    def _piggyback(self) -> List[dict]:
+        """Changements d'état à joindre au prochain message (les moins propagés d'abord)."""
+        with self._lock:
+            chosen = sorted(self._updates.items(), key=lambda item: -item[1][1])[:self.max_piggyback]
+            updates = []
+            for key, entry in chosen:
+                updates.append(entry[0])
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del self._updates[key]
+            return updates
+
+    def _absorb(self, message: dict):
+        """Applique l'émetteur (preuve de vie) puis les changements d'état d'un PING/PING_REQ/ACK."""
+        updates = message.get("updates", [])
+        for update in updates if isinstance(updates, list) else []:
+            if isinstance(update, dict):
+                self.apply_update(update)
+        member = message.get("member")
+        if isinstance(member, dict) and member:
+            self.apply_update(dict(member, state=ALIVE))
+
+    def handle_ping(self, message: dict) -> dict:
+        self._absorb(message)
+        return self.gossip_logic.build_ack(True, self.self_member(), self._piggyback())
+
+    def handle_ping_req(self, message: dict) -> dict:
+        self._absorb(message)
+        target = message.get("target", {})
+        try:
+            ok = self.ping(*self.resolve(str(target["ip"]), int(target["port"])))
+        except (KeyError, TypeError, ValueError):
+            ok = False
+        return self.gossip_logic.build_ack(ok, self.self_member(), self._piggyback())
+
+    def ping(self, ip: str, port: int) -> bool:
+        """Sonde directe. Un membre que l'on croit suspect ou mort reçoit son état pour pouvoir le réfuter."""
+        updates = self._piggyback()
+        with self._lock:
+            member = self._members.get((ip, port))
+            if member is not None and member["state"] != ALIVE:
+                updates.append({k: member[k] for k in ("ip", "port", "node_id", "state", "incarnation")})
+        reply = self.request(ip, port, self.gossip_logic.build_ping(self.self_member(), updates), timeout=self.probe_timeout)
+        if not reply or reply.get("type") != "ACK":
+            return False
+        self._absorb(reply)
+        return bool(reply.get("ok"))
+
+    def _ping_req(self, helper: Tuple[str, int], target: Tuple[str, int]) -> bool:
+        message = self.gossip_logic.build_ping_req(target[0], target[1], self.self_member(), self._piggyback())
+        # Le relais sonde la cible avec son propre délai : on lui laisse le temps de répondre
+        reply = self.request(helper[0], helper[1], message, timeout=2 * self.probe_timeout)
+        if not reply or reply.get("type") != "ACK":
+            return False
+        self._absorb(reply)
+        return bool(reply.get("ok"))
+
+    def _next_target(self) -> Optional[Tuple[str, int]]:
+        """Cible de la période : tour de rôle (ordre aléatoire) sur les membres vivants ou suspects."""
+        with self._lock:
+            self._rounds += 1
+            dead = [k for k, m in self._members.items() if m["state"] == DEAD]
+            if dead and self._rounds % self.dead_probe_every == 0:
+                return random.choice(dead)
+            while self._probe_order:
+                key = self._probe_order.pop()
+                if key in self._members and self._members[key]["state"] != DEAD:
+                    return key
+            self._probe_order = [k for k, m in self._members.items() if m["state"] != DEAD]
+            random.shuffle(self._probe_order)
+            return self._probe_order.pop() if self._probe_order else None
+
+    def _expire_suspects(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [dict(m) for m in self._members.values()
+                       if m["state"] == SUSPECT and now - m["changed_at"] >= self.suspect_timeout]
+        for member in expired:
+            self.apply_update(dict(member, state=DEAD))
+
+    def _mark(self, key: Tuple[str, int], state: str):
+        with self._lock:
+            member = self._members.get(key)
+            if member is None or member["state"] in (state, DEAD):
+                return
+            update = dict(member, state=state)
+        self.apply_update(update)
+
+    def probe_round(self):
+        """Une période du protocole : expiration des suspects, sonde directe puis indirecte d'un membre."""
+        self._expire_suspects()
+        target = self._next_target()
+        if target is None or self.ping(*target):
+            return
+        with self._lock:
+            helpers = [k for k, m in self._members.items() if m["state"] == ALIVE and k != target]
+        helpers = random.sample(helpers, min(self.indirect_probes, len(helpers)))
+        if helpers and any(self._executor.map(lambda helper: self._ping_req(helper, target), helpers)):
+            return
+        self._mark(target, SUSPECT)
@@ -0,0 +1,86 @@
+import hashlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+HEX_DIGITS = "0123456789abcdef"
+
+class MerkleTree:
+    """
+    Arbre de Merkle (branchement 16) sur les couples (uuid, updated_at) du vault.
+    Chaque record est rangé dans la feuille désignée par les `depth` premiers caractères hexadécimaux
+    de SHA-256(uuid). Un noeud est identifié par ce préfixe ("" pour la racine).
+    Deux noeuds convergés ont la même racine ; sinon on ne descend que dans les sous-arbres différents.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, float]], depth: int = 3):
+        self.depth = depth
+        self._buckets: Dict[str, List[Tuple[str, float]]] = defaultdict(list)
+        # Plus grand updated_at de l'arbre (high-water mark transmis aux pairs)
+        self.high_water: Optional[float] = None
+        for record_uuid, updated_at in entries:
+            self._buckets[self.bucket_of(record_uuid)].append((record_uuid, updated_at))
+            if self.high_water is None or updated_at > self.high_water:
+                self.high_water = updated_at
+        # Hash de chaque noeud non vide, par préfixe (les sous-arbres vides n'ont pas d'entrée)
+        self._hashes: Dict[str, str] = {}
+        self._build()
+
+    def bucket_of(self, record_uuid: str) -> str:
+        """Retourne le préfixe de la feuille contenant cet uuid."""
+        return hashlib.sha256(record_uuid.encode("utf-8")).hexdigest()[:self.depth]
+
+    def _build(self):
+        level: Dict[str, str] = {}
+        for prefix, entries in self._buckets.items():
+            entries.sort()
+            digest = hashlib.sha256()
+            for record_uuid, updated_at in entries:
+                digest.update(f"{record_uuid}:{updated_at!r};".encode("utf-8"))
+            level[prefix] = digest.hexdigest()
+        self._hashes.update(level)
+
+        # Remontée niveau par niveau : un parent hache la liste (chiffre, hash) de ses enfants non vides
+        for _ in range(self.depth):
+            parents: Dict[str, List[str]] = defaultdict(list)
+            for prefix in sorted(level):
+                parents[prefix[:-1]].append(f"{prefix[-1]}{level[prefix]}")
+            level = {p: hashlib.sha256("".join(children).encode("utf-8")).hexdigest() for p, children in parents.items()}
+            self._hashes.update(level)
+
+    @property
+    def root(self) -> str:
+        return self.node_hash("")
+
+    def node_hash(self, prefix: str) -> str:
+        """Hash du noeud `prefix`, ou "" si le sous-arbre est vide."""
+        return self._hashes.get(prefix, "")
+
+    def is_leaf(self, prefix: str) -> bool:
+        return len(prefix) == self.depth
+
+    def children(self, prefix: str) -> List[str]:
+        """Préfixes des 16 enfants d'un noeud interne."""
+        return [prefix + digit for digit in HEX_DIGITS]
+
+    def bucket_entries(self, prefix: str) -> List[Tuple[str, float]]:
+        """Couples (uuid, updated_at) d'une feuille."""
+        return list(self._buckets.get(prefix, []))
+
+    def describe(self, prefixes: List[str]) -> Tuple[Dict[str, str], Dict[str, List[Tuple[str, float]]]]:
+        """
+        Réponse à une requête MERKLE_QUERY : hash des noeuds demandés et de leurs enfants non vides,
+        plus le contenu des feuilles demandées.
+        """
+        hashes: Dict[str, str] = {}
+        buckets: Dict[str, List[Tuple[str, float]]] = {}
+        for prefix in prefixes:
+            if len(prefix) > self.depth or any(c not in HEX_DIGITS for c in prefix):
+                continue
+            hashes[prefix] = self.node_hash(prefix)
+            if self.is_leaf(prefix):
+                buckets[prefix] = self.bucket_entries(prefix)
+            else:
+                for child in self.children(prefix):
+                    if child in self._hashes:
+                        hashes[child] = self._hashes[child]
+        return hashes, buckets
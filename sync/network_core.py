@@ -1,9 +1,33 @@
+import bisect
+import random
+import socket
 import threading
-from typing import List, Dict, Callable
+import time
+from typing import List, Dict, Callable, Iterator, Optional, Tuple
 
 from .socket_server import SocketServer
 from .socket_client import SocketClient
+from .async_engine import EventLoopThread, AsyncSocketServer, AsyncSocketClient
 from .gossip_logic import GossipLogic
+from .merkle_tree import MerkleTree
+from .peer_state import PeerStateStore
+from .outbound_queue import PeerOutbox
+from .hint_store import HintStore
+from .membership import Membership, ALIVE, SUSPECT, DEAD
+from .plumtree import BroadcastTree
+from .seen_cache import SeenCache, BloomSeenFilter
+from .wire_format import SUPPORTED_COMPRESSIONS
+
+# Nombre max de records par page de réponse à un SYNC_REQUEST paginé
+SYNC_PAGE_SIZE = 500
+# Délai max d'attente entre deux pages (s)
+SYNC_PAGE_TIMEOUT = 10.0
+# Taille max (octets JSON) des records d'une page de snapshot : grandes trames, peu d'allers-retours
+SNAPSHOT_PAGE_BYTES = 4 * 1024 * 1024
+# Nombre max de tombstones par TOMBSTONE_QUERY
+TOMBSTONE_QUERY_SIZE = 5000
+# Nombre max d'uuids par SYNC_FETCH de l'anti-entropie (la réponse doit tenir dans une trame)
+FETCH_QUERY_SIZE = SYNC_PAGE_SIZE
 
 class NetworkCore:
     """
@@ -12,35 +36,209 @@ class NetworkCore:
     """
     def __init__(self, node_id: str, host: str, port: int, peers: List[Dict[str, int]], 
                  apply_gossip_callback: Callable[[dict], bool],
-                 get_all_records_callback: Callable[[], List[dict]]):
+                 get_all_records_callback: Callable[[], List[dict]],
+                 get_sync_digest_callback: Optional[Callable[[], List[Tuple[str, float]]]] = None,
+                 get_records_by_uuid_callback: Optional[Callable[[List[str]], List[dict]]] = None,
+                 merkle_depth: int = 3,
+                 get_records_since_callback: Optional[Callable[[float], List[dict]]] = None,
+                 peer_state: Optional[PeerStateStore] = None,
+                 engine: str = "threads",
+                 outbound_queue_size: int = 10000,
+                 outbound_overflow: str = "drop_oldest",
+                 hint_store: Optional[HintStore] = None,
+                 membership: bool = False,
+                 advertise_host: Optional[str] = None,
+                 probe_interval: float = 1.0,
+                 fanout: Optional[int] = None,
+                 gossip_ttl: int = 6,
+                 plumtree: bool = False,
+                 graft_timeout: float = 0.5,
+                 seen_cache: Optional[str] = "lru",
+                 seen_cache_size: int = 100000,
+                 wire_format: str = "binary",
+                 install_snapshot_callback: Optional[Callable[[List[dict]], int]] = None,
+                 snapshot_bootstrap: bool = True,
+                 get_expired_tombstones_callback: Optional[Callable[[], List[Tuple[str, float]]]] = None,
+                 purge_tombstones_callback: Optional[Callable[[List[Tuple[str, float]]], int]] = None,
+                 anti_entropy_interval: Optional[float] = None):
         self.node_id = node_id
         self.peers = peers # Liste de dictionnaires ex: [{'ip': '127.0.0.1', 'port': 5001}]
         self.apply_gossip_callback = apply_gossip_callback
         self.get_all_records_callback = get_all_records_callback
+        # Callbacks optionnels (anti-entropie) : à défaut, dérivés de get_all_records_callback
+        self.get_sync_digest_callback = get_sync_digest_callback
+        self.get_records_by_uuid_callback = get_records_by_uuid_callback
+        self.get_records_since_callback = get_records_since_callback
+        # Bootstrap d'un vault vide : snapshot complet d'un pair installé d'un bloc (à défaut, record par record)
+        self.install_snapshot_callback = install_snapshot_callback
+        self.snapshot_bootstrap = snapshot_bootstrap
+        # GC des tombstones (collect_tombstones) : candidats expirés côté vault, purgés une fois acquittés par les pairs
+        self.get_expired_tombstones_callback = get_expired_tombstones_callback
+        self.purge_tombstones_callback = purge_tombstones_callback
+        # High-water marks par pair (synchronisation incrémentale "since")
+        self.peer_state = peer_state if peer_state is not None else PeerStateStore(None)
+        self.merkle_depth = merkle_depth
+        # Arbre de Merkle mis en cache quelques secondes (reconstruit si le vault change)
+        self._merkle_cache: Optional[Tuple[float, MerkleTree]] = None
+        self.merkle_cache_ttl = 2.0
+        # Anti-entropie périodique avec un pair tiré au hasard (None : seulement au démarrage). Rattrape ce que
+        # la synchro incrémentale ne voit pas (records d'auteur antérieurs au high-water mark) et les gossips perdus
+        self.anti_entropy_interval = anti_entropy_interval
+        self._anti_entropy_stop = threading.Event()
         
-        self.gossip_logic = GossipLogic(node_id)
-        self.server = SocketServer(host, port, self._on_message_received)
-        self.client = SocketClient()
+        # Cache des mises à jour déjà vues : "lru" (LRU/TTL), "bloom" (filtre de Bloom compact) ou None.
+        # En mode arbre, l'ensemble des mises à jour reçues de BroadcastTree joue déjà ce rôle.
+        cache = None
+        if seen_cache == "lru" and not plumtree:
+            cache = SeenCache(max_entries=seen_cache_size)
+        elif seen_cache == "bloom" and not plumtree:
+            cache = BloomSeenFilter(capacity=seen_cache_size)
+        elif seen_cache not in ("lru", "bloom", None):
+            raise ValueError(f"Cache de déduplication inconnu : {seen_cache}")
+        # Diffusion : flood (fanout=None), épidémique vers `fanout` pairs au hasard (au plus `gossip_ttl` sauts)
+        # ou en arbre Plumtree (push eager le long d'un arbre couvrant, IHAVE lazy sur les autres liens)
+        self.gossip_logic = GossipLogic(node_id, fanout=fanout, ttl=gossip_ttl, plumtree=plumtree, seen_cache=cache,
+                                        local_versions=self._local_versions)
+        self.tree: Optional[BroadcastTree] = BroadcastTree(graft_timeout) if plumtree else None
+        self._tree_stop = threading.Event()
+        # Noms d'hôte des pairs résolus en IP : les liens de l'arbre sont indexés par l'adresse annoncée (reply_to)
+        self._resolved_hosts: Dict[str, str] = {}
+        # Moteur réseau : "threads" (un thread par connexion, un worker d'envoi par pair) ou "asyncio" (une boucle d'événements).
+        # Format des envois : "binary", "binary+zlib", "binary+zstd" (négociés par connexion, repli JSON
+        # pour les anciens pairs) ou "json"
+        self.engine = engine
+        self._loop_thread: Optional[EventLoopThread] = None
+        if engine == "asyncio":
+            self._loop_thread = EventLoopThread()
+            self.server = AsyncSocketServer(host, port, self._on_message_received, self._loop_thread)
+            self.client = AsyncSocketClient(self._loop_thread, wire_format=wire_format)
+        elif engine == "threads":
+            self.server = SocketServer(host, port, self._on_message_received)
+            self.client = SocketClient(wire_format=wire_format)
+        else:
+            raise ValueError(f"Moteur réseau inconnu : {engine}")
+
+        # Une file d'envoi bornée (et un worker) par pair, créée au premier message
+        self.outbound_queue_size = outbound_queue_size
+        self.outbound_overflow = outbound_overflow
+        self._outboxes: Dict[Tuple[str, int], PeerOutbox] = {}
+        self._outboxes_lock = threading.Lock()
+        # Hinted handoff : mises à jour non délivrées aux pairs hors ligne, rejouées à leur retour
+        self.hint_store = hint_store if hint_store is not None else HintStore(None)
+        # Membership SWIM (optionnel) : les pairs de la config servent de points d'entrée,
+        # les autres sont découverts par gossip et les pairs morts sont écartés de la diffusion
+        if advertise_host is None and (membership or plumtree):
+            advertise_host = host if host not in ("0.0.0.0", "") else socket.gethostbyname(socket.gethostname())
+        self.advertise_host = advertise_host
+        self.membership: Optional[Membership] = None
+        if membership:
+            self.membership = Membership(node_id, advertise_host, port, peers, self.gossip_logic, self.client.request,
+                                         probe_interval=probe_interval, on_change=self._on_member_change,
+                                         resolve=self._canonical_address)
 
     def start(self):
-        """Démarre le serveur réseau."""
+        """Démarre le serveur réseau et le rejeu des hints laissés par une exécution précédente."""
         self.server.start()
+        # Port effectif (port 0 : choisi par le système) annoncé aux autres noeuds
+        bound_port = self.server.server_socket.getsockname()[1]
+        if self.membership is not None:
+            self.membership.port = bound_port
+            self.membership.start()
+        if self.tree is not None:
+            self.gossip_logic.address = {"ip": self.advertise_host, "port": bound_port}
+            threading.Thread(target=self._graft_loop, daemon=True).start()
+        if self.anti_entropy_interval:
+            threading.Thread(target=self._anti_entropy_loop, daemon=True).start()
+        # Pairs connus mémorisés pour le GC des tombstones (relu par --compact)
+        for peer in self.peers:
+            self.peer_state.add_known(peer["ip"], peer["port"])
+        for ip, port in self.hint_store.peers():
+            self._get_outbox(ip, port).wake()
 
     def stop(self):
-        """Arrête le serveur réseau."""
+        """Arrête le serveur réseau, les files d'envoi et ferme les connexions persistantes vers les pairs."""
         self.server.stop()
+        self._tree_stop.set()
+        self._anti_entropy_stop.set()
+        if self.membership is not None:
+            self.membership.stop()
+        with self._outboxes_lock:
+            outboxes, self._outboxes = list(self._outboxes.values()), {}
+        for outbox in outboxes:
+            outbox.close()
+        # Après la fermeture des files : les records qui y restaient sont dans les hints
+        self.hint_store.close()
+        self.client.close()
+        if self._loop_thread is not None:
+            self._loop_thread.stop()
 
-    def _on_message_received(self, message: dict):
+    def _on_message_received(self, message: dict) -> Optional[dict]:
         """
         Appelé quand le serveur TCP reçoit un message.
         Logique de réception et vérification Gossip.
+        Retourne la réponse à renvoyer au pair pour les requêtes d'anti-entropie.
         """
+        if message.get("type") == "MERKLE_QUERY":
+            prefixes = message.get("prefixes", [])
+            tree = self._get_merkle_tree()
+            hashes, buckets = tree.describe(prefixes if isinstance(prefixes, list) else [])
+            return self.gossip_logic.build_merkle_reply(tree.depth, hashes, buckets, tree.high_water)
+
+        if self.tree is not None and message.get("type") in ("GOSSIP_UPDATE", "GOSSIP_BATCH", "IHAVE", "GRAFT", "PRUNE"):
+            self._on_tree_message(message)
+            return None
+
+        if message.get("type") == "PING":
+            if self.membership is None:
+                # Membership désactivé : on répond quand même pour ne pas être considéré comme mort
+                return self.gossip_logic.build_ack(True, {}, [])
+            return self.membership.handle_ping(message)
+
+        if message.get("type") == "PING_REQ":
+            if self.membership is None:
+                return self.gossip_logic.build_ack(False, {}, [])
+            return self.membership.handle_ping_req(message)
+
+        if message.get("type") == "SYNC_SINCE":
+            try:
+                since = float(message.get("since", 0.0))
+            except (TypeError, ValueError):
+                return None
+            if "page_size" in message:
+                return self._iter_since_pages(since, message.get("page_size"))
+            # SYNC_SINCE d'un pair d'une ancienne version : une seule réponse
+            records = self._get_records_since(since)
+            high_water = records[-1]["updated_at"] if records else since
+            return self.gossip_logic.build_sync_since_reply(records, high_water)
+
+        if message.get("type") == "SNAPSHOT_REQUEST":
+            return self._iter_snapshot_pages()
+
+        if message.get("type") == "SYNC_FETCH":
+            uuids = message.get("uuids", [])
+            records = self._get_records_by_uuid(uuids) if isinstance(uuids, list) else []
+            # Réponse bornée : un pair d'une ancienne version qui demande tout d'un coup en reçoit une partie,
+            # et ses anti-entropies suivantes récupèrent le reste
+            return self.gossip_logic.build_fetch_reply(next(iter(self.gossip_logic.chunk_records(records, SNAPSHOT_PAGE_BYTES)), []))
+
+        if message.get("type") == "TOMBSTONE_QUERY":
+            entries = message.get("entries", [])
+            return self.gossip_logic.build_tombstone_ack(self._acknowledged_tombstones(entries) if isinstance(entries, list) else [])
+
         if message.get("type") == "SYNC_REQUEST":
             sender_id = message.get("sender_id")
-            # Un pair nous demande tout notre catalogue, on lui broadcast toutes nos entrées en individuel
-            if sender_id and sender_id != self.node_id:
-                for record in self.get_all_records_callback():
-                    self.trigger_local_update(record)
+            if not sender_id or sender_id == self.node_id:
+                return None
+            if "page_size" in message:
+                # Réponse dirigée vers le seul demandeur, paginée sur la connexion ouverte
+                return self._iter_sync_pages(message.get("cursor"), message.get("page_size"))
+            # SYNC_REQUEST historique (pair d'une ancienne version) : broadcast de nos entrées par lots
+            for chunk in self.gossip_logic.chunk_records(self.get_all_records_callback()):
+                self._propagate_to_peers(self.gossip_logic.build_gossip_batch(chunk))
+            return None
+
+        if message.get("type") == "GOSSIP_BATCH":
+            self._on_batch_received(message)
             return
 
         should_process, record_payload = self.gossip_logic.should_process_message(message)
@@ -50,38 +248,502 @@ class NetworkCore:
 
         # Transmettre le record au Vault pour appliquer le LWW (Time check)
         # Si le record est plus récent que le local (ou nouveau), on l'applique et on le propage aux autres pairs
-        is_applied = self.apply_gossip_callback(record_payload)
+        is_applied = self._apply(record_payload)
         
         if is_applied:
             # Si le Vault l'a accepté (plus récent), on doit le propager avec notre ID ajouté au path_vector
+            # En mode épidémique, le relais s'arrête quand le TTL est épuisé
+            ttl = self.gossip_logic.next_ttl(message)
+            if ttl != 0:
+                path_vector = message.get("path_vector", [])
+                new_message = self.gossip_logic.build_gossip_message(record_payload, path_vector, ttl)
+                self._propagate_to_peers(new_message)
+
+    def _on_batch_received(self, message: dict):
+        """
+        Applique chaque record d'un GOSSIP_BATCH (LWW record par record)
+        et ne propage que le sous-ensemble accepté par le Vault local.
+        """
+        should_process, records = self.gossip_logic.should_process_batch(message)
+        if not should_process:
+            return
+
+        accepted = [record for record in records if self._apply(record)]
+        ttl = self.gossip_logic.next_ttl(message)
+        if accepted and ttl != 0:
             path_vector = message.get("path_vector", [])
-            new_message = self.gossip_logic.build_gossip_message(record_payload, path_vector)
-            self._propagate_to_peers(new_message)
+            self._propagate_to_peers(self.gossip_logic.build_gossip_batch(accepted, path_vector, ttl))
+
+    def _apply(self, record: dict) -> bool:
+        """Transmet un record distant au Vault (LWW) et invalide l'arbre de Merkle s'il est appliqué."""
+        is_applied = self.apply_gossip_callback(record)
+        if is_applied:
+            self._merkle_cache = None
+        return is_applied
 
     def trigger_local_update(self, new_record: dict):
         """
         Appelé depuis le Vault (Interface A -> B).
         L'utilisateur local a fait une mise à jour, on l'envoie en broadcast à tous les pairs.
         """
+        self._merkle_cache = None
+        self.gossip_logic.mark_seen(new_record)
         message = self.gossip_logic.build_gossip_message(new_record)
         self._propagate_to_peers(message)
 
     def request_sync(self):
         """
-        Appelé au démarrage : broadcast un SYNC_REQUEST pour récupérer l'historique des pairs.
+        Appelé au démarrage : anti-entropie (arbre de Merkle) avec chaque pair, en arrière-plan.
+        Un vault vide est d'abord amorcé par le snapshot d'un pair (bootstrap).
         """
-        message = self.gossip_logic.build_sync_request()
-        self._propagate_to_peers(message)
+        if self.snapshot_bootstrap and self.peers and not self._get_sync_digest():
+            threading.Thread(target=self._bootstrap_then_sync, daemon=True).start()
+            return
+        for peer in self.peers:
+            threading.Thread(target=self._sync_with_peer, args=(peer,), daemon=True).start()
 
-    def _propagate_to_peers(self, message: dict):
-        """Envoie le message P2P à tous les pairs de la configuration."""
+    def _bootstrap_then_sync(self):
+        """Snapshot du premier pair qui répond, puis synchronisation habituelle avec les autres."""
+        others = list(self.peers)
         for peer in self.peers:
-            # Lancement asynchrone pour ne pas bloquer si un pair est lent
-            threading.Thread(
-                target=self._send_to_peer,
-                args=(peer["ip"], peer["port"], message),
-                daemon=True
-            ).start()
+            others.remove(peer)
+            if self.bootstrap(peer["ip"], peer["port"]) is not None:
+                break
+            others.append(peer) # Pas de snapshot (pair injoignable ou ancienne version) : synchro habituelle
+        for peer in others:
+            threading.Thread(target=self._sync_with_peer, args=(peer,), daemon=True).start()
+
+    def _iter_snapshot_pages(self) -> Iterator[dict]:
+        """
+        Produit le snapshot du vault local en grandes pages.
+        Une seule lecture du vault : toutes les pages décrivent le même état, quel que soit le gossip
+        reçu pendant le transfert (le demandeur le rattrapera par le gossip et le high-water mark).
+        """
+        records = list(self.get_all_records_callback())
+        high_water = max((r["updated_at"] for r in records), default=None)
+        pages = self.gossip_logic.chunk_records(records, SNAPSHOT_PAGE_BYTES) or [[]]
+        for seq, page in enumerate(pages):
+            yield self.gossip_logic.build_snapshot_page(page, seq, len(records), high_water, done=(seq == len(pages) - 1))
+
+    def bootstrap(self, ip: str, port: int) -> Optional[int]:
+        """
+        Amorce un nouveau noeud avec le snapshot complet d'un pair, reçu sur une seule connexion
+        (dédiée, au format binaire compressé) puis installé d'un bloc : un transfert interrompu n'installe rien.
+        Le high-water mark du snapshot est mémorisé : la synchro suivante avec ce pair est incrémentale.
+        Retourne le nombre de records installés, ou None si le pair n'a pas fourni de snapshot complet.
+        """
+        wire_format = "binary+" + SUPPORTED_COMPRESSIONS[0]
+        client = SocketClient(timeout=SYNC_PAGE_TIMEOUT, pool_size=0, wire_format=wire_format)
+        records: List[dict] = []
+        try:
+            for seq, page in enumerate(client.request_stream(ip, port, self.gossip_logic.build_snapshot_request(),
+                                                             timeout=SYNC_PAGE_TIMEOUT)):
+                if page.get("type") != "SNAPSHOT_PAGE" or page.get("seq") != seq:
+                    return None
+                payload = page.get("payload")
+                if isinstance(payload, list):
+                    records.extend(r for r in payload if isinstance(r, dict) and "uuid" in r and "updated_at" in r)
+                if page.get("done"):
+                    break
+            else:
+                return None # Connexion coupée avant la dernière page
+        finally:
+            client.close()
+        if page.get("total") != len(records):
+            return None
+
+        if self.install_snapshot_callback is not None:
+            installed = self.install_snapshot_callback(records)
+        else:
+            installed = sum(1 for record in records if self.apply_gossip_callback(record))
+        self._merkle_cache = None
+        if page.get("high_water") is not None:
+            self.peer_state.set_high_water(ip, port, page["high_water"])
+        return installed
+
+    def _iter_sync_pages(self, cursor: Optional[str], page_size) -> Iterator[dict]:
+        """
+        Produit le catalogue local trié par uuid, en pages bornées (nombre de records et octets),
+        à partir du record qui suit `cursor`.
+        """
+        if not isinstance(page_size, int) or page_size <= 0:
+            page_size = SYNC_PAGE_SIZE
+        page_size = min(page_size, SYNC_PAGE_SIZE)
+
+        records = sorted(self.get_all_records_callback(), key=lambda r: r["uuid"])
+        if isinstance(cursor, str):
+            records = records[bisect.bisect_right([r["uuid"] for r in records], cursor):]
+
+        pages = self._paginate(records, page_size)
+        if not pages:
+            yield self.gossip_logic.build_sync_page([], cursor, done=True)
+        for i, page in enumerate(pages):
+            yield self.gossip_logic.build_sync_page(page, page[-1]["uuid"], done=(i == len(pages) - 1))
+
+    def _iter_since_pages(self, since: float, page_size) -> Iterator[dict]:
+        """
+        Produit les records modifiés après `since` en pages bornées (nombre de records et octets).
+        Chaque page porte le high-water mark de la réponse entière : le demandeur ne le retient qu'à la dernière.
+        """
+        if not isinstance(page_size, int) or page_size <= 0:
+            page_size = SYNC_PAGE_SIZE
+        records = self._get_records_since(since)
+        high_water = records[-1]["updated_at"] if records else since
+        pages = self._paginate(records, min(page_size, SYNC_PAGE_SIZE)) or [[]]
+        for i, page in enumerate(pages):
+            yield self.gossip_logic.build_sync_since_reply(page, high_water, done=(i == len(pages) - 1))
+
+    def _paginate(self, records: List[dict], page_size: int) -> List[List[dict]]:
+        """Découpe des records en pages d'au plus `page_size` records, chacune sous MAX_BATCH_BYTES."""
+        return [chunk[i:i + page_size] for chunk in self.gossip_logic.chunk_records(records)
+                for i in range(0, len(chunk), page_size)]
+
+    def full_sync(self, ip: str, port: int, page_size: int = SYNC_PAGE_SIZE, max_resumes: int = 3) -> Optional[int]:
+        """
+        Récupère tout le catalogue d'un pair via un SYNC_REQUEST paginé qui ne s'adresse qu'à lui.
+        Si la connexion est coupée, la demande reprend au dernier curseur reçu.
+        Retourne le nombre de records appliqués, ou None si le transfert n'a pas pu aboutir.
+        """
+        cursor = None
+        applied = 0
+        for _ in range(max_resumes + 1):
+            request = self.gossip_logic.build_sync_request(cursor, page_size)
+            for page in self.client.request_stream(ip, port, request, timeout=SYNC_PAGE_TIMEOUT):
+                if page.get("type") != "SYNC_PAGE":
+                    return None
+                applied += sum(1 for record in page.get("payload", []) if self._apply(record))
+                cursor = page.get("cursor", cursor)
+                if page.get("done"):
+                    return applied
+        return None
+
+    def _sync_with_peer(self, peer: Dict[str, int]):
+        """
+        Synchronisation de démarrage avec un pair :
+          1. incrémentale (SYNC_SINCE) si on connaît déjà son high-water mark : l'essentiel du retard en un aller-retour,
+          2. puis anti-entropie (arbre de Merkle) pour les records que SYNC_SINCE ne voit pas ; une fois
+             l'incrémental appliqué, les arbres sont en général identiques et un seul MERKLE_QUERY suffit,
+          3. repli sur un SYNC_REQUEST paginé (un pair d'une ancienne version y répond par broadcast).
+        """
+        ip, port = peer["ip"], peer["port"]
+        synced = self.peer_state.get_high_water(ip, port) is not None and self.sync_since(ip, port) is not None
+        if self.anti_entropy(ip, port) is None and not synced:
+            self.full_sync(ip, port)
+
+    def _anti_entropy_loop(self):
+        """Anti-entropie avec un pair connu tiré au hasard toutes les `anti_entropy_interval` secondes."""
+        while not self._anti_entropy_stop.wait(self.anti_entropy_interval):
+            peers = {(peer["ip"], peer["port"]) for peer in self.peers + self._gossip_targets()}
+            if peers:
+                self.anti_entropy(*random.choice(sorted(peers)))
+
+    def sync_since(self, ip: str, port: int) -> Optional[int]:
+        """
+        Récupère uniquement les records modifiés chez le pair depuis son dernier high-water mark connu.
+        Le coût est proportionnel aux changements manqués, pas à la taille du vault. La réponse arrive en pages
+        sur la même connexion ; le high-water mark n'est retenu qu'une fois la dernière page reçue.
+        Limite : un record dont le updated_at (horloge de l'auteur) est antérieur au high-water mark
+        mais arrivé chez le pair plus tard n'est pas renvoyé : _sync_with_peer enchaîne donc une anti-entropie,
+        et l'anti-entropie périodique (anti_entropy_interval) le rattrape en cours d'exécution.
+        Retourne le nombre de records appliqués, ou None si le pair n'a pas répondu.
+        """
+        since = self.peer_state.get_high_water(ip, port)
+        request = self.gossip_logic.build_sync_since_request(since or 0.0, SYNC_PAGE_SIZE)
+        applied = 0
+        for page in self.client.request_stream(ip, port, request, timeout=SYNC_PAGE_TIMEOUT):
+            if page.get("type") != "SYNC_SINCE_REPLY":
+                return None
+            applied += sum(1 for record in page.get("payload", []) if self._apply(record))
+            # Sans "done" : pair d'une ancienne version, réponse en une seule trame
+            if page.get("done", True):
+                if page.get("high_water") is not None:
+                    self.peer_state.set_high_water(ip, port, page["high_water"])
+                return applied
+        return None # Pair injoignable ou connexion coupée avant la dernière page
+
+    def _get_records_since(self, since: float) -> List[dict]:
+        if self.get_records_since_callback:
+            return self.get_records_since_callback(since)
+        records = [r for r in self.get_all_records_callback() if r["updated_at"] > since]
+        return sorted(records, key=lambda r: r["updated_at"])
+
+    def _get_sync_digest(self) -> List[Tuple[str, float]]:
+        if self.get_sync_digest_callback:
+            return self.get_sync_digest_callback()
+        return [(r["uuid"], r["updated_at"]) for r in self.get_all_records_callback()]
+
+    def _get_records_by_uuid(self, uuids: List[str]) -> List[dict]:
+        if self.get_records_by_uuid_callback:
+            return self.get_records_by_uuid_callback(uuids)
+        wanted = set(uuids)
+        return [r for r in self.get_all_records_callback() if r["uuid"] in wanted]
+
+    def _local_versions(self, uuids: List[str]) -> Dict[str, float]:
+        """updated_at locaux des uuids demandés (confirmation des "déjà vu" du filtre de Bloom)."""
+        return {r["uuid"]: r["updated_at"] for r in self._get_records_by_uuid(uuids)}
+
+    def _get_merkle_tree(self) -> MerkleTree:
+        """Retourne l'arbre de Merkle du vault local (en cache pendant merkle_cache_ttl secondes)."""
+        now = time.monotonic()
+        if self._merkle_cache is None or now - self._merkle_cache[0] > self.merkle_cache_ttl:
+            self._merkle_cache = (now, MerkleTree(self._get_sync_digest(), self.merkle_depth))
+        return self._merkle_cache[1]
+
+    def anti_entropy(self, ip: str, port: int) -> Optional[Tuple[int, int]]:
+        """
+        Compare l'arbre de Merkle local à celui du pair en ne descendant que dans les sous-arbres
+        différents, puis échange uniquement les records divergents :
+          - récupère (SYNC_FETCH) ceux qui sont plus récents chez le pair,
+          - pousse (GOSSIP_BATCH) ceux qui sont plus récents localement.
+        Retourne (records récupérés, records poussés), ou None si le pair n'a pas répondu.
+        """
+        tree = self._get_merkle_tree()
+        remote_entries: Dict[str, float] = {}
+        local_entries: Dict[str, float] = {}
+        remote_high_water = None
+        frontier = [""]
+
+        while frontier:
+            reply = self.client.request(ip, port, self.gossip_logic.build_merkle_query(frontier))
+            if not reply or reply.get("type") != "MERKLE_REPLY":
+                return None
+            if reply.get("depth") != tree.depth:
+                print(f"Anti-entropie impossible avec {ip}:{port} : profondeur de Merkle différente.")
+                return None
+            if remote_high_water is None:
+                remote_high_water = reply.get("high_water")
+
+            remote_hashes = reply.get("hashes", {})
+            remote_buckets = reply.get("buckets", {})
+            next_frontier = []
+            for prefix in frontier:
+                if remote_hashes.get(prefix, "") == tree.node_hash(prefix):
+                    continue # Sous-arbre identique : rien à échanger
+                if tree.is_leaf(prefix):
+                    remote_entries.update({u: ts for u, ts in remote_buckets.get(prefix, [])})
+                    local_entries.update(dict(tree.bucket_entries(prefix)))
+                else:
+                    next_frontier.extend(child for child in tree.children(prefix)
+                                         if remote_hashes.get(child, "") != tree.node_hash(child))
+            frontier = next_frontier
+
+        to_pull = [u for u, ts in remote_entries.items() if ts > local_entries.get(u, float("-inf"))]
+        to_push = [u for u, ts in local_entries.items() if ts > remote_entries.get(u, float("-inf"))]
+
+        pulled = 0
+        # Par lots d'uuids : une seule réponse pour tout un vault divergent dépasserait la taille max d'une trame
+        for start in range(0, len(to_pull), FETCH_QUERY_SIZE):
+            reply = self.client.request(ip, port, self.gossip_logic.build_fetch_request(to_pull[start:start + FETCH_QUERY_SIZE]))
+            if not reply or reply.get("type") != "SYNC_FETCH_REPLY":
+                return None
+            pulled += sum(1 for record in reply.get("payload", []) if self._apply(record))
+
+        # Convergé avec ce pair : les prochaines synchronisations pourront être incrémentales
+        if remote_high_water is not None:
+            self.peer_state.set_high_water(ip, port, remote_high_water)
+
+        if to_push:
+            for chunk in self.gossip_logic.chunk_records(self._get_records_by_uuid(to_push)):
+                self._send_to_peer(ip, port, self.gossip_logic.build_gossip_batch(chunk))
+
+        return pulled, len(to_push)
+
+    def _acknowledged_tombstones(self, entries: list) -> List[str]:
+        """
+        Uuids des tombstones (uuid, updated_at) qu'un pair peut purger sans risque de notre point de vue :
+        on a ce tombstone ou une version plus récente, ou plus aucun record pour ce uuid (rien à ressusciter).
+        """
+        wanted: Dict[str, float] = {}
+        for entry in entries:
+            try:
+                wanted[str(entry[0])] = float(entry[1])
+            except (TypeError, ValueError, IndexError):
+                continue
+        local = {r["uuid"]: r["updated_at"] for r in self._get_records_by_uuid(list(wanted))}
+        return [record_uuid for record_uuid, updated_at in wanted.items() if local.get(record_uuid, updated_at) >= updated_at]
+
+    def collect_tombstones(self) -> Optional[int]:
+        """
+        GC des tombstones : un tombstone expiré (plus vieux que le TTL du vault) n'est purgé que si chaque pair
+        connu l'a acquitté : configuration, membres vivants, suspects et morts, et tous les pairs mémorisés
+        dans l'état persistant (le processus --compact n'a pas de membership démarré). Sinon un pair qui n'a pas vu
+        la suppression ressusciterait le secret à la prochaine synchronisation.
+        Un noeud resté hors ligne plus longtemps que le TTL doit donc repartir d'un vault vide (bootstrap),
+        et un noeud retiré définitivement doit être retiré de sync_state.json pour que le GC reprenne.
+        Retourne le nombre de tombstones purgés, ou None si un pair n'a pas répondu (rien n'est purgé).
+        """
+        if not self.get_expired_tombstones_callback or not self.purge_tombstones_callback:
+            return 0
+        candidates = dict(self.get_expired_tombstones_callback())
+        known = [(peer["ip"], peer["port"]) for peer in self.peers] + self.peer_state.known_peers()
+        if self.membership is not None:
+            known += [(peer["ip"], peer["port"]) for peer in self.membership.peers((ALIVE, SUSPECT, DEAD))]
+        peers = {self._canonical_address(ip, port) for ip, port in known}
+        for ip, port in sorted(peers):
+            if not candidates:
+                return 0
+            entries = list(candidates.items())
+            acknowledged = set()
+            for start in range(0, len(entries), TOMBSTONE_QUERY_SIZE):
+                query = self.gossip_logic.build_tombstone_query(entries[start:start + TOMBSTONE_QUERY_SIZE])
+                reply = self.client.request(ip, port, query)
+                if not reply or reply.get("type") != "TOMBSTONE_ACK":
+                    print(f"GC des tombstones reporté : le pair {ip}:{port} n'a pas répondu.")
+                    return None
+                acknowledged.update(reply.get("uuids", []))
+            candidates = {u: ts for u, ts in candidates.items() if u in acknowledged}
+        if not candidates:
+            return 0
+        return self.purge_tombstones_callback(list(candidates.items()))
+
+    def _get_outbox(self, ip: str, port: int) -> PeerOutbox:
+        with self._outboxes_lock:
+            outbox = self._outboxes.get((ip, port))
+            if outbox is None:
+                # Moteur asyncio : la file est vidée par une coroutine sur la boucle (pas de thread par pair)
+                send_async = self.client.send_message_async if self._loop_thread is not None else None
+                outbox = PeerOutbox(ip, port, self.client.send_message, self.gossip_logic,
+                                    max_pending=self.outbound_queue_size, overflow=self.outbound_overflow,
+                                    hints=self.hint_store, fetch_records=self._get_records_by_uuid,
+                                    loop_thread=self._loop_thread, send_async=send_async)
+                self._outboxes[(ip, port)] = outbox
+            return outbox
+
+    def _gossip_targets(self) -> List[Dict[str, int]]:
+        """Pairs destinataires de la diffusion : membres vivants ou suspects, à défaut ceux de la configuration."""
+        return self.membership.peers() if self.membership is not None else self.peers
+
+    def _canonical_address(self, ip: str, port: int) -> Tuple[str, int]:
+        """
+        Adresse d'un pair avec le nom d'hôte résolu en IP (résolution mise en cache), pour que les pairs
+        de la configuration et les adresses annoncées dans reply_to désignent le même lien et la même file d'envoi.
+        Si la résolution échoue (DNS pas encore prêt), le nom est gardé et la résolution retentée au prochain message.
+        """
+        resolved = self._resolved_hosts.get(ip)
+        if resolved is None:
+            try:
+                resolved = socket.gethostbyname(ip)
+            except OSError:
+                return ip, port
+            self._resolved_hosts[ip] = resolved
+        return resolved, port
+
+    def _tree_broadcast(self, message: dict, exclude: Optional[Tuple[str, int]] = None):
+        """Mode arbre : message complet sur les liens eager, simple IHAVE sur les liens lazy."""
+        records = [message["payload"]] if message["type"] == "GOSSIP_UPDATE" else message["payload"]
+        update_ids = [(r["uuid"], r["updated_at"]) for r in records]
+        self.tree.mark_received(update_ids)
+        ihave = None
+        for peer in self._gossip_targets():
+            key = self._canonical_address(peer["ip"], peer["port"])
+            if key == exclude:
+                continue
+            if self.tree.is_lazy(key):
+                ihave = ihave or self.gossip_logic.build_ihave(update_ids)
+                self._get_outbox(*key).enqueue(ihave)
+            else:
+                self._get_outbox(*key).enqueue(message)
+
+    def _on_tree_message(self, message: dict):
+        """Réception en mode arbre : GOSSIP (eager), IHAVE (lazy), GRAFT et PRUNE."""
+        sender = self.gossip_logic.reply_address(message)
+        if sender:
+            sender = self._canonical_address(*sender)
+        message_type = message.get("type")
+
+        if message_type == "PRUNE":
+            if sender:
+                self.tree.prune(sender)
+            return
+
+        if message_type == "GRAFT":
+            uuids = message.get("uuids", [])
+            if sender and isinstance(uuids, list):
+                self.tree.graft(sender)
+                for chunk in self.gossip_logic.chunk_records(self._get_records_by_uuid(uuids)):
+                    self._get_outbox(*sender).enqueue(self.gossip_logic.build_gossip_batch(chunk))
+            return
+
+        if message_type == "IHAVE":
+            ids = message.get("ids", [])
+            if not sender or not isinstance(ids, list):
+                return
+            announced = {}
+            for entry in ids:
+                if isinstance(entry, list) and len(entry) == 2 and not self.tree.has_received((entry[0], entry[1])):
+                    announced[entry[0]] = entry[1]
+            if not announced:
+                return
+            # Déjà dans le vault (reçu avant un redémarrage, ou par la synchronisation) : rien à réclamer
+            local = {r["uuid"]: r["updated_at"] for r in self._get_records_by_uuid(list(announced))}
+            for record_uuid, updated_at in announced.items():
+                if local.get(record_uuid, float("-inf")) >= updated_at:
+                    self.tree.mark_received([(record_uuid, updated_at)])
+                else:
+                    self.tree.announce((record_uuid, updated_at), sender)
+            return
+
+        if message_type == "GOSSIP_UPDATE":
+            should_process, record = self.gossip_logic.should_process_message(message)
+            records = [record] if should_process and isinstance(record, dict) and "uuid" in record and "updated_at" in record else []
+        else:
+            should_process, records = self.gossip_logic.should_process_batch(message)
+        if not records:
+            return
+
+        new_ids = set(self.tree.mark_received([(r["uuid"], r["updated_at"]) for r in records]))
+        if not new_ids:
+            # Uniquement des doublons : ce lien ne fait pas partie de l'arbre
+            if sender:
+                self.tree.prune(sender)
+                self._get_outbox(*sender).enqueue(self.gossip_logic.build_prune())
+            return
+        if sender:
+            self.tree.graft(sender)
+
+        accepted = [r for r in records if (r["uuid"], r["updated_at"]) in new_ids and self._apply(r)]
+        if not accepted:
+            return
+        path_vector = message.get("path_vector", [])
+        if len(accepted) == 1:
+            forwarded = self.gossip_logic.build_gossip_message(accepted[0], path_vector)
+        else:
+            forwarded = self.gossip_logic.build_gossip_batch(accepted, path_vector)
+        self._tree_broadcast(forwarded, exclude=sender)
+
+    def _graft_loop(self):
+        """Réclame (GRAFT) les mises à jour annoncées par IHAVE qui ne sont pas arrivées à temps."""
+        while not self._tree_stop.wait(self.tree.graft_timeout / 2):
+            for peer, update_ids in self.tree.expired().items():
+                self.tree.graft(peer)
+                self._get_outbox(*peer).enqueue(self.gossip_logic.build_graft([u for u, _ in update_ids]))
+
+    def _on_member_change(self, ip: str, port: int, state: str):
+        """
+        Un membre découvert est mémorisé (GC des tombstones) ; un membre redevenu vivant
+        reçoit immédiatement les mises à jour manquées (hints).
+        """
+        self.peer_state.add_known(ip, port)
+        if state == ALIVE and self.hint_store.count(ip, port):
+            self._get_outbox(ip, port).wake()
+
+    def _propagate_to_peers(self, message: dict):
+        """
+        Met le message P2P en file pour les pairs (ceux de la configuration, ou les membres vivants
+        et suspects si le membership est actif) : tous en mode flood, `fanout` tirés au hasard en mode épidémique,
+        message complet ou IHAVE selon le lien en mode arbre. Un pair lent ou hors ligne ne coûte qu'une file bornée et un worker, quel que soit son retard.
+        Un pair mort n'est pas contacté : en mode flood ses mises à jour vont en hints,
+        en mode épidémique il les rattrape à son retour par la synchronisation au démarrage.
+        """
+        if self.tree is not None and message.get("type") in ("GOSSIP_UPDATE", "GOSSIP_BATCH"):
+            self._tree_broadcast(message)
+        else:
+            for peer in self.gossip_logic.select_targets(self._gossip_targets()):
+                self._get_outbox(peer["ip"], peer["port"]).enqueue(message)
+        if self.membership is None or self.gossip_logic.is_epidemic:
+            return
+        for peer in self.membership.peers((DEAD,)):
+            self._get_outbox(peer["ip"], peer["port"]).defer(message)
 
     def _send_to_peer(self, ip: str, port: int, message: dict):
         success = self.client.send_message(ip, port, message)
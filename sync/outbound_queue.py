@@ -0,0 +1,343 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from .async_engine import EventLoopThread
+from .gossip_logic import GossipLogic
+from .hint_store import HintStore
+
+# Politiques quand la file d'un pair est pleine
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+class PeerOutbox:
+    """
+    File d'envoi bornée vers un pair, vidée par un unique thread worker.
+    Les records en attente sont fusionnés par uuid (seul le plus récent updated_at part) et envoyés par lots ;
+    un échec d'envoi remet le lot en file et le worker réessaie avec un backoff exponentiel.
+    Quand la file est pleine :
+      - "drop_oldest" : l'entrée la plus ancienne est abandonnée (l'anti-entropie la rattrapera),
+      - "drop_newest" : la nouvelle entrée est refusée,
+      - "block" : l'appelant attend de la place au plus `block_timeout` secondes, puis la refuse.
+    Avec un HintStore, les records non délivrés sont sortis de la mémoire vers les hints persistants
+    et rejoués en bloc (version courante relue via `fetch_records`) dès que le pair répond de nouveau.
+    Avec une boucle asyncio (`loop_thread` et `send_async`), la file est vidée par une coroutine planifiée
+    sur la boucle à la place du thread worker : pas de thread par pair, les I/O disque passent par le pool de la boucle.
+    """
+
+    def __init__(self, ip: str, port: int, send: Callable[[str, int, dict], bool], gossip_logic: GossipLogic,
+                 max_pending: int = 10000, overflow: str = "drop_oldest", block_timeout: float = 1.0,
+                 max_batch: int = 500, base_backoff: float = 0.5, max_backoff: float = 30.0,
+                 hints: Optional[HintStore] = None, fetch_records: Optional[Callable[[List[str]], List[dict]]] = None,
+                 loop_thread: Optional[EventLoopThread] = None,
+                 send_async: Optional[Callable[[str, int, dict], Awaitable[bool]]] = None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Politique de file pleine inconnue : {overflow}")
+        self.ip = ip
+        self.port = port
+        self.send = send
+        self.gossip_logic = gossip_logic
+        self.max_pending = max_pending
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.max_batch = max_batch
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        # Hinted handoff (optionnel) : nécessite de pouvoir relire les records dans le vault
+        self.hints = hints if fetch_records is not None else None
+        self.fetch_records = fetch_records
+        # Moteur asyncio (optionnel) : vidage de la file par une coroutine sur la boucle
+        self.loop_thread = loop_thread if send_async is not None else None
+        self.send_async = send_async
+        # Clé -> (record ou None, route, message) : uuid pour un record, compteur pour un autre message
+        self._pending: "OrderedDict[Hashable, Tuple[Optional[dict], tuple, Optional[dict]]]" = OrderedDict()
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._failures = 0
+        self._thread: Optional[threading.Thread] = None
+        # Coroutine de vidage en cours (moteur asyncio) et événement qui interrompt son backoff
+        self._task = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.stats = {"sent": 0, "coalesced": 0, "dropped": 0, "retries": 0, "hinted": 0, "replayed": 0}
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def enqueue(self, message: dict) -> bool:
+        """Ajoute un message en file. Retourne False s'il a été refusé (file pleine)."""
+        if message.get("type") == "GOSSIP_UPDATE":
+            entries = [message.get("payload")]
+        elif message.get("type") == "GOSSIP_BATCH":
+            entries = message.get("payload", [])
+        else:
+            entries = None
+        # Route d'un record : path vector et TTL (diffusion épidémique) du message qui l'a apporté
+        route = (tuple(message.get("path_vector", [])), message.get("ttl"))
+
+        with self._cond:
+            if self._closed:
+                return False
+            if entries is None:
+                return self._put(("message", next(self._sequence)), (None, route, message))
+            accepted = True
+            for record in entries:
+                if isinstance(record, dict) and "uuid" in record:
+                    accepted = self._put(record["uuid"], (record, route, None)) and accepted
+            return accepted
+
+    def _put(self, key: Hashable, entry: Tuple[Optional[dict], tuple, Optional[dict]]) -> bool:
+        """Insère une entrée (verrou tenu) en appliquant la fusion par uuid et la politique de file pleine."""
+        current = self._pending.get(key)
+        if current is not None:
+            self.stats["coalesced"] += 1
+            if entry[0].get("updated_at", 0) > current[0].get("updated_at", 0):
+                self._pending[key] = entry
+            return True
+        if len(self._pending) >= self.max_pending:
+            if self.overflow == "block":
+                deadline = time.monotonic() + self.block_timeout
+                while len(self._pending) >= self.max_pending and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            if len(self._pending) >= self.max_pending:
+                if self.overflow != "drop_oldest":
+                    self.stats["dropped"] += 1
+                    return False
+                self._pending.popitem(last=False)
+                self.stats["dropped"] += 1
+        self._pending[key] = entry
+        self._ensure_worker()
+        self._cond.notify_all()
+        return True
+
+    def defer(self, message: dict):
+        """
+        Pair connu comme mort : les records du message vont directement dans les hints, sans tentative réseau.
+        Ils seront rejoués au prochain wake() (retour du pair). Sans HintStore, le message est abandonné.
+        """
+        if self.hints is None or message.get("type") not in ("GOSSIP_UPDATE", "GOSSIP_BATCH"):
+            return
+        payload = message.get("payload")
+        records = [payload] if message.get("type") == "GOSSIP_UPDATE" else (payload if isinstance(payload, list) else [])
+        records = [r for r in records if isinstance(r, dict) and "uuid" in r]
+        self.hints.add(self.ip, self.port, records)
+        self.stats["hinted"] += len(records)
+
+    def _ensure_worker(self):
+        """Démarre le worker (verrou tenu) : thread dédié, ou coroutine sur la boucle asyncio."""
+        if self._closed:
+            return
+        if self.loop_thread is not None:
+            if self._task is None:
+                try:
+                    self._task = self.loop_thread.submit(self._drain())
+                except RuntimeError:
+                    pass # Boucle arrêtée
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _take(self) -> List[Tuple[Hashable, tuple]]:
+        """Retire jusqu'à max_batch entrées de la tête de file (verrou tenu)."""
+        taken = []
+        while self._pending and len(taken) < self.max_batch:
+            taken.append(self._pending.popitem(last=False))
+        self._cond.notify_all()
+        return taken
+
+    def _requeue(self, entries: List[Tuple[Hashable, tuple]]):
+        """Remet en tête de file un lot non envoyé, sauf les records remplacés entre-temps par plus récent."""
+        with self._cond:
+            for key, entry in reversed(entries):
+                current = self._pending.get(key)
+                if current is not None and entry[0] is not None and current[0].get("updated_at", 0) >= entry[0].get("updated_at", 0):
+                    continue
+                self._pending[key] = entry
+                self._pending.move_to_end(key, last=False)
+            while len(self._pending) > self.max_pending:
+                self._pending.popitem(last=self.overflow != "drop_oldest")
+                self.stats["dropped"] += 1
+
+    def _build_messages(self, entries: List[Tuple[Hashable, tuple]]) -> List[Tuple[dict, List[Tuple[Hashable, tuple]]]]:
+        """Regroupe les records par route (path vector, TTL) en GOSSIP_BATCH (GOSSIP_UPDATE pour un record seul)."""
+        messages = []
+        groups: Dict[tuple, List[Tuple[Hashable, tuple]]] = OrderedDict()
+        for key, entry in entries:
+            record, route, message = entry
+            if message is not None:
+                messages.append((message, [(key, entry)]))
+            else:
+                groups.setdefault(route, []).append((key, entry))
+        for (path_vector, ttl), group in groups.items():
+            by_uuid = {entry[0]["uuid"]: (key, entry) for key, entry in group}
+            for chunk in self.gossip_logic.chunk_records([entry[0] for _, entry in group]):
+                chunk_entries = [by_uuid[record["uuid"]] for record in chunk]
+                if len(chunk) == 1:
+                    message = self.gossip_logic.build_gossip_message(chunk[0], list(path_vector), ttl)
+                else:
+                    message = self.gossip_logic.build_gossip_batch(chunk, list(path_vector), ttl)
+                messages.append((message, chunk_entries))
+        return messages
+
+    def _has_hints(self) -> bool:
+        return self.hints is not None and self.hints.count(self.ip, self.port) > 0
+
+    def _replay_hints(self) -> bool:
+        """Rejoue en bloc les hints du pair. Retourne False si le pair est toujours injoignable."""
+        hinted = self.hints.get(self.ip, self.port)
+        uuids = list(hinted)
+        for start in range(0, len(uuids), self.max_batch):
+            part = uuids[start:start + self.max_batch]
+            for chunk in self.gossip_logic.chunk_records(self.fetch_records(part)):
+                if not self.send(self.ip, self.port, self.gossip_logic.build_gossip_batch(chunk)):
+                    return False
+                self.stats["replayed"] += len(chunk)
+            # Les uuids absents du vault sont aussi retirés : il n'y a plus rien à délivrer
+            self.hints.discard(self.ip, self.port, {u: hinted[u] for u in part})
+        return True
+
+    def _park(self, unsent: List[Tuple[Hashable, tuple]]):
+        """
+        Pair injoignable : sans HintStore, le lot attend en file ; avec, les records non délivrés
+        et ceux encore en file passent dans les hints persistants (seuls les autres messages restent en mémoire).
+        """
+        if self.hints is None:
+            self._requeue(unsent)
+            return
+        with self._cond:
+            queued = list(self._pending.items())
+            self._pending.clear()
+            self._cond.notify_all()
+        records = [entry[0] for _, entry in unsent + queued if entry[0] is not None]
+        self.hints.add(self.ip, self.port, records)
+        self.stats["hinted"] += len(records)
+        self._requeue([(key, entry) for key, entry in unsent + queued if entry[0] is None])
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed and not self._has_hints():
+                    self._cond.wait()
+                if self._closed:
+                    return
+                entries = self._take()
+
+            unsent: List[Tuple[Hashable, tuple]] = []
+            if self._has_hints() and not self._replay_hints():
+                unsent = entries
+            else:
+                for message, message_entries in self._build_messages(entries):
+                    if unsent or not self.send(self.ip, self.port, message):
+                        unsent.extend(message_entries)
+                    else:
+                        self.stats["sent"] += len(message_entries)
+
+            if not unsent and not self._has_hints():
+                self._failures = 0
+                continue
+            # Pair injoignable : le lot attend (en file ou en hints), nouvelle tentative après un backoff exponentiel
+            self._park(unsent)
+            self._failures += 1
+            self.stats["retries"] += 1
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (self._failures - 1))
+            with self._cond:
+                deadline = time.monotonic() + delay
+                while not self._closed and self._failures:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+    async def _replay_hints_async(self) -> bool:
+        """Équivalent de _replay_hints sur la boucle : lectures du vault et écritures des hints dans le pool."""
+        loop = asyncio.get_running_loop()
+        hinted = self.hints.get(self.ip, self.port)
+        uuids = list(hinted)
+        for start in range(0, len(uuids), self.max_batch):
+            part = uuids[start:start + self.max_batch]
+            records = await loop.run_in_executor(None, self.fetch_records, part)
+            for chunk in self.gossip_logic.chunk_records(records):
+                if not await self.send_async(self.ip, self.port, self.gossip_logic.build_gossip_batch(chunk)):
+                    return False
+                self.stats["replayed"] += len(chunk)
+            await loop.run_in_executor(None, self.hints.discard, self.ip, self.port, {u: hinted[u] for u in part})
+        return True
+
+    async def _drain(self):
+        """
+        Équivalent de _run pour le moteur asyncio : envoie sans bloquer la boucle puis se termine
+        quand la file est vide (le prochain enqueue ou wake() la replanifie).
+        """
+        loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            with self._cond:
+                if self._closed or (not self._pending and not self._has_hints()):
+                    self._task = None
+                    return
+                entries = self._take()
+
+            unsent: List[Tuple[Hashable, tuple]] = []
+            if self._has_hints() and not await self._replay_hints_async():
+                unsent = entries
+            else:
+                for message, message_entries in self._build_messages(entries):
+                    if unsent or not await self.send_async(self.ip, self.port, message):
+                        unsent.extend(message_entries)
+                    else:
+                        self.stats["sent"] += len(message_entries)
+
+            if not unsent and not self._has_hints():
+                self._failures = 0
+                continue
+            await loop.run_in_executor(None, self._park, unsent)
+            self._failures += 1
+            self.stats["retries"] += 1
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (self._failures - 1))
+            self._wakeup.clear()
+            if self._failures:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _interrupt_backoff(self):
+        """Réveille la coroutine de vidage en backoff (moteur asyncio)."""
+        wakeup = self._wakeup
+        if self.loop_thread is not None and wakeup is not None:
+            try:
+                self.loop_thread.loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                pass # Boucle fermée
+
+    def wake(self):
+        """Interrompt le backoff en cours (ex: le pair est de nouveau joignable)."""
+        with self._cond:
+            self._failures = 0
+            self._ensure_worker()
+            self._cond.notify_all()
+        self._interrupt_backoff()
+
+    def close(self):
+        """
+        Arrête le worker. Avec un HintStore, les records encore en file passent dans les hints
+        (rejoués au prochain démarrage) ; les autres messages, et tout sans HintStore, sont abandonnés.
+        """
+        with self._cond:
+            self._closed = True
+            queued = list(self._pending.values())
+            if self.hints is not None:
+                self._pending.clear()
+            self._cond.notify_all()
+        self._interrupt_backoff()
+        records = [entry[0] for entry in queued if entry[0] is not None]
+        if self.hints is not None and records:
+            self.hints.add(self.ip, self.port, records)
+            self.stats["hinted"] += len(records)
@@ -0,0 +1,74 @@
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+class PeerStateStore:
+    """
+    État de synchronisation persistant par pair (sync_state.json).
+    Conserve le high-water mark (plus grand updated_at reçu) de chaque pair, indexé par "ip:port",
+    ainsi que la liste de tous les pairs connus (configuration et membership), relue par le GC des tombstones.
+    """
+
+    def __init__(self, path: Optional[str] = "sync_state.json", read_only: bool = False):
+        # path=None : état gardé en mémoire uniquement (tests, mode --cli)
+        # read_only : état relu sans jamais réécrire le fichier du daemon (mode --compact)
+        self.path = path
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        self._state: Dict[str, dict] = self._load()
+
+    @staticmethod
+    def peer_key(ip: str, port: int) -> str:
+        return f"{ip}:{port}"
+
+    def _load(self) -> Dict[str, dict]:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            print(f"Erreur: {self.path} est corrompu. Les pairs seront resynchronisés entièrement.")
+            return {}
+
+    def _save(self):
+        if not self.path or self.read_only:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._state, f)
+        os.replace(tmp_path, self.path)
+
+    def get_high_water(self, ip: str, port: int) -> Optional[float]:
+        """Dernier high-water mark reçu de ce pair, ou None s'il n'a jamais été synchronisé."""
+        with self._lock:
+            return self._state.get(self.peer_key(ip, port), {}).get("high_water")
+
+    def set_high_water(self, ip: str, port: int, high_water: float):
+        """Enregistre le high-water mark d'un pair (ne recule jamais)."""
+        with self._lock:
+            entry = self._state.setdefault(self.peer_key(ip, port), {})
+            if entry.get("high_water") is not None and high_water <= entry["high_water"]:
+                return
+            entry["high_water"] = high_water
+            self._save()
+
+    def add_known(self, ip: str, port: int):
+        """Mémorise un pair connu : le GC des tombstones attend son acquittement, même s'il est mort depuis."""
+        with self._lock:
+            entry = self._state.setdefault(self.peer_key(ip, port), {})
+            if entry.get("known"):
+                return
+            entry["known"] = True
+            self._save()
+
+    def known_peers(self) -> List[Tuple[str, int]]:
+        """Tous les pairs connus : mémorisés par add_known ou déjà synchronisés."""
+        with self._lock:
+            keys = list(self._state)
+        peers = []
+        for key in keys:
+            ip, _, port = key.rpartition(":")
+            peers.append((ip, int(port)))
+        return peers
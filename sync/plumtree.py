@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+# Identifiant d'une mise à jour diffusée : (uuid, updated_at)
+UpdateId = Tuple[str, float]
+Peer = Tuple[str, int]
+
+class BroadcastTree:
+    """
+    État d'un noeud pour la diffusion en arbre façon Plumtree.
+    Chaque lien vers un pair est "eager" (la mise à jour complète y est poussée) ou "lazy"
+    (seul un IHAVE avec les identifiants y est annoncé). Par défaut, tous les liens sont eager :
+      - un doublon reçu d'un pair rend son lien lazy (PRUNE) : l'arbre se forme tout seul,
+      - une mise à jour annoncée (IHAVE) mais jamais reçue après `graft_timeout` secondes est réclamée
+        à l'annonceur (GRAFT), dont le lien redevient eager : l'arbre se répare quand un lien eager tombe.
+    """
+
+    def __init__(self, graft_timeout: float = 0.5, max_received: int = 100000, max_graft_attempts: int = 3):
+        self.graft_timeout = graft_timeout
+        self.max_received = max_received
+        self.max_graft_attempts = max_graft_attempts
+        self._lock = threading.Lock()
+        self._lazy = set()
+        # Mises à jour déjà reçues (LRU borné) : détection des doublons
+        self._received: "OrderedDict[UpdateId, None]" = OrderedDict()
+        # Mises à jour annoncées mais pas reçues : id -> [annonceurs, échéance, tentatives]
+        self._missing: Dict[UpdateId, list] = {}
+
+    def is_lazy(self, peer: Peer) -> bool:
+        with self._lock:
+            return peer in self._lazy
+
+    def prune(self, peer: Peer):
+        """Lien rendu lazy (doublon reçu, ou PRUNE du pair)."""
+        with self._lock:
+            self._lazy.add(peer)
+
+    def graft(self, peer: Peer):
+        """Lien rendu eager (nouvelle mise à jour reçue, ou GRAFT du pair)."""
+        with self._lock:
+            self._lazy.discard(peer)
+
+    def has_received(self, update_id: UpdateId) -> bool:
+        with self._lock:
+            return update_id in self._received
+
+    def mark_received(self, update_ids: Iterable[UpdateId]) -> List[UpdateId]:
+        """Enregistre des mises à jour reçues et retourne celles qui sont nouvelles (les autres sont des doublons)."""
+        new_ids = []
+        with self._lock:
+            for update_id in update_ids:
+                self._missing.pop(update_id, None)
+                if update_id in self._received:
+                    self._received.move_to_end(update_id)
+                    continue
+                self._received[update_id] = None
+                new_ids.append(update_id)
+            while len(self._received) > self.max_received:
+                self._received.popitem(last=False)
+        return new_ids
+
+    def announce(self, update_id: UpdateId, peer: Peer):
+        """IHAVE reçu pour une mise à jour absente : elle sera réclamée si elle n'arrive pas à temps."""
+        with self._lock:
+            if update_id in self._received:
+                return
+            missing = self._missing.get(update_id)
+            if missing is None:
+                self._missing[update_id] = [[peer], time.monotonic() + self.graft_timeout, 0]
+            elif peer not in missing[0]:
+                missing[0].append(peer)
+
+    def expired(self) -> Dict[Peer, List[UpdateId]]:
+        """
+        Mises à jour annoncées dont le délai est dépassé, regroupées par annonceur à qui envoyer un GRAFT.
+        Chaque nouvelle tentative s'adresse à l'annonceur suivant ; abandon après max_graft_attempts
+        (l'anti-entropie rattrapera la mise à jour).
+        """
+        now = time.monotonic()
+        grafts: Dict[Peer, List[UpdateId]] = {}
+        with self._lock:
+            for update_id, missing in list(self._missing.items()):
+                announcers, deadline, attempts = missing
+                if deadline > now:
+                    continue
+                if attempts >= self.max_graft_attempts:
+                    del self._missing[update_id]
+                    continue
+                peer = announcers[attempts % len(announcers)]
+                grafts.setdefault(peer, []).append(update_id)
+                missing[1] = now + self.graft_timeout
+                missing[2] = attempts + 1
+        return grafts
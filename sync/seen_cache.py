@@ -0,0 +1,100 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+# Identifiant d'une mise à jour : (uuid, updated_at)
+UpdateId = Tuple[str, float]
+
+class SeenCache:
+    """
+    Cache LRU/TTL des mises à jour (uuid, updated_at) déjà vues par ce noeud.
+    Un doublon arrivant par une autre route est écarté sans toucher au vault.
+    """
+    probabilistic = False
+
+    def __init__(self, max_entries: int = 100000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[UpdateId, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def check_and_add(self, update_id: UpdateId) -> bool:
+        """Retourne True si la mise à jour a déjà été vue ; sinon l'enregistre et retourne False."""
+        now = time.monotonic()
+        with self._lock:
+            seen_at = self._entries.get(update_id)
+            if seen_at is not None and now - seen_at < self.ttl:
+                self._entries.move_to_end(update_id)
+                self.hits += 1
+                return True
+            self._entries[update_id] = now
+            self._entries.move_to_end(update_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.misses += 1
+            return False
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+class BloomSeenFilter:
+    """
+    Variante compacte de SeenCache pour les gros vaults : filtre de Bloom à deux générations.
+    Quand la génération courante atteint `capacity` entrées, elle devient l'ancienne et une nouvelle est créée,
+    ce qui borne le taux de faux positifs. Un faux positif ne doit pas écarter une mise à jour nouvelle :
+    les "déjà vu" sont donc confirmés par la version locale du record (voir GossipLogic.local_versions).
+    """
+
+    # Un "déjà vu" peut être un faux positif : GossipLogic le confirme dans le vault avant d'écarter la mise à jour
+    probabilistic = True
+
+    def __init__(self, capacity: int = 1000000, error_rate: float = 0.001):
+        self.capacity = capacity
+        # Dimensionnement standard : m = -n ln(p) / ln(2)^2 bits, k = m/n ln(2) fonctions de hachage
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._current = bytearray((self.num_bits + 7) // 8)
+        self._previous = bytearray(len(self._current))
+        self._count = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _positions(self, update_id: UpdateId):
+        """Double hachage (Kirsch-Mitzenmacher) à partir d'un seul condensat."""
+        digest = hashlib.blake2b(f"{update_id[0]}:{update_id[1]!r}".encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    @staticmethod
+    def _contains(bits: bytearray, positions) -> bool:
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def check_and_add(self, update_id: UpdateId) -> bool:
+        """Retourne True si la mise à jour a (probablement) déjà été vue ; sinon l'enregistre et retourne False."""
+        positions = self._positions(update_id)
+        with self._lock:
+            if self._contains(self._current, positions) or self._contains(self._previous, positions):
+                self.hits += 1
+                return True
+            if self._count >= self.capacity:
+                self._previous, self._current = self._current, bytearray(len(self._current))
+                self._count = 0
+            for p in positions:
+                self._current[p >> 3] |= 1 << (p & 7)
+            self._count += 1
+            self.misses += 1
+            return False
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": self._count}
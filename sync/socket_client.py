@@ -1,12 +1,138 @@
 import socket
+import select
 import json
-import logging
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .framing import FrameReader, FrameError, FRAME_END, MAX_FRAME_SIZE
+from .wire_format import JSON_WIRE, WireFormat, accept_hello_reply, build_hello, check_wire_format, decode_message
 
 class SocketClient:
-    """Client TCP P2P pour envoyer les mises à jour de Gossip aux pairs distants."""
-    def __init__(self, timeout: float = 2.0):
+    """
+    Client TCP P2P pour envoyer les mises à jour de Gossip aux pairs distants.
+    Les connexions sont persistantes et réutilisées (petit pool par pair) : un message est une trame,
+    le pair répond par zéro ou plusieurs trames suivies d'une trame FRAME_END (voir framing.py).
+    Avec wire_format="binary" (ou "binary+zlib", "binary+zstd"), chaque nouvelle connexion négocie d'abord
+    l'encodage binaire compact (et la compression) par un WIRE_HELLO ; un pair d'une ancienne version
+    reste en JSON (voir wire_format.py).
+    """
+    def __init__(self, timeout: float = 2.0, pool_size: int = 2, idle_timeout: float = 30.0,
+                 max_frame_size: int = MAX_FRAME_SIZE, wire_format: str = "binary"):
         # Timeout court pour ne pas bloquer si un pair est hors ligne
         self.timeout = timeout
+        # Connexions inactives gardées par pair, et durée max d'inactivité avant fermeture
+        # (inférieure au timeout d'inactivité du serveur pour ne pas réutiliser une connexion qu'il a fermée)
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.max_frame_size = max_frame_size
+        check_wire_format(wire_format)
+        self.wire_format = wire_format
+        # Par pair : connexions inactives (socket, lecteur de trames avec son buffer, format négocié, date de libération)
+        self._pools: Dict[Tuple[str, int], List[Tuple[socket.socket, FrameReader, WireFormat, float]]] = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, target_ip: str, target_port: int) -> Tuple[socket.socket, FrameReader, WireFormat, bool]:
+        """
+        Retourne (socket, lecteur, format, réutilisée) : une connexion saine du pool,
+        sinon une nouvelle connexion dont le format est négocié.
+        """
+        now = time.monotonic()
+        with self._lock:
+            idle = self._pools.get((target_ip, target_port), [])
+            while idle:
+                sock, reader, wire, released_at = idle.pop()
+                if now - released_at < self.idle_timeout and self._is_healthy(sock):
+                    return sock, reader, wire, True
+                sock.close()
+        sock = socket.create_connection((target_ip, target_port), timeout=self.timeout)
+        reader = FrameReader(sock, self.max_frame_size)
+        try:
+            wire = self._negotiate(sock, reader)
+        except BaseException:
+            sock.close()
+            raise
+        return sock, reader, wire, False
+
+    def _negotiate(self, sock: socket.socket, reader: FrameReader) -> WireFormat:
+        """Propose l'encodage binaire au pair ; sans réponse WIRE_HELLO_REPLY, la connexion reste en JSON."""
+        if self.wire_format == "json":
+            return JSON_WIRE
+        sock.sendall(JSON_WIRE.encode(build_hello(self.wire_format)))
+        reply = None
+        while True:
+            frame = reader.read_frame()
+            if frame is None:
+                raise FrameError("Connexion fermée par le pair pendant la négociation")
+            kind, payload = frame
+            if kind == FRAME_END:
+                return accept_hello_reply(reply)
+            reply = decode_message(kind, payload, self.max_frame_size)
+
+    @staticmethod
+    def _is_healthy(sock: socket.socket) -> bool:
+        """Une connexion inactive lisible a été fermée par le pair (EOF) ou est désynchronisée."""
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def _release(self, target_ip: str, target_port: int, sock: socket.socket, reader: FrameReader, wire: WireFormat):
+        with self._lock:
+            idle = self._pools.setdefault((target_ip, target_port), [])
+            if len(idle) < self.pool_size:
+                idle.append((sock, reader, wire, time.monotonic()))
+                return
+        sock.close()
+
+    def close(self):
+        """Ferme toutes les connexions du pool."""
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for idle in pools.values():
+            for sock, _, _, _ in idle:
+                sock.close()
+
+    def _exchange(self, target_ip: str, target_port: int, message: dict, timeout: Optional[float]) -> Iterator[dict]:
+        """
+        Envoie un message sur une connexion du pool et produit les réponses jusqu'à la trame FRAME_END.
+        Une connexion réutilisée qui s'avère coupée est remplacée de façon transparente
+        (une seule nouvelle tentative, tant qu'aucune réponse n'a été produite).
+        """
+        encoded: Dict[WireFormat, bytes] = {}
+        for attempt in range(2):
+            sock, reader, wire, reused = self._acquire(target_ip, target_port)
+            released = False
+            produced = False
+            try:
+                if wire not in encoded:
+                    encoded[wire] = wire.encode(message)
+                sock.settimeout(timeout if timeout is not None else self.timeout)
+                sock.sendall(encoded[wire])
+                while True:
+                    frame = reader.read_frame()
+                    if frame is None:
+                        break
+                    kind, payload = frame
+                    if kind == FRAME_END:
+                        # Fin de réponse : la connexion retourne dans le pool
+                        self._release(target_ip, target_port, sock, reader, wire)
+                        released = True
+                        return
+                    produced = True
+                    yield decode_message(kind, payload, self.max_frame_size)
+                if reused and not produced:
+                    continue # Connexion du pool fermée par le pair entre-temps : on reconnecte
+                raise FrameError("Connexion fermée par le pair avant la fin de la réponse")
+            except (socket.timeout, socket.error):
+                if reused and not produced and attempt == 0:
+                    continue
+                raise
+            finally:
+                # Réponse interrompue (erreur, consommateur qui s'arrête avant la fin) : connexion inutilisable
+                if not released:
+                    sock.close()
 
     def send_message(self, target_ip: str, target_port: int, message: dict) -> bool:
         """
@@ -14,11 +140,29 @@ class SocketClient:
         Retourne True si l'envoi a réussi, False sinon.
         """
         try:
-            with socket.create_connection((target_ip, target_port), timeout=self.timeout) as sock:
-                # Conversion du dict en JSON puis en bytes UTF-8
-                data = json.dumps(message).encode('utf-8')
-                sock.sendall(data)
-                return True
-        except (socket.timeout, socket.error):
+            for _ in self._exchange(target_ip, target_port, message, None):
+                pass
+            return True
+        except (socket.timeout, socket.error, FrameError, json.JSONDecodeError):
             # C'est normal dans un système P2P qu'un pair soit off, on l'ignore silencieusement.
             return False
+
+    def request(self, target_ip: str, target_port: int, message: dict, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        Envoie une requête JSON et attend la réponse du pair sur la même connexion.
+        Retourne la réponse décodée, ou None si le pair est injoignable ou n'a pas répondu.
+        """
+        responses = list(self.request_stream(target_ip, target_port, message, timeout))
+        return responses[0] if responses else None
+
+    def request_stream(self, target_ip: str, target_port: int, message: dict, timeout: Optional[float] = None) -> Iterator[dict]:
+        """
+        Envoie une requête et produit les réponses du pair au fil de l'eau : une trame préfixée par sa longueur
+        par réponse (JSON ou format binaire négocié), sur la même connexion, jusqu'à la trame FRAME_END.
+        S'arrête silencieusement si le pair est injoignable ou si la connexion est coupée :
+        l'appelant détecte l'interruption via le contenu des réponses (ex: curseur de reprise).
+        """
+        try:
+            yield from self._exchange(target_ip, target_port, message, timeout)
+        except (socket.timeout, socket.error, FrameError, json.JSONDecodeError):
+            return
@@ -1,17 +1,32 @@
 import socket
 import threading
 import json
-from typing import Callable
+from typing import Callable, Iterable, Optional, Union
+
+from .framing import FrameReader, FrameError, encode_frame, FRAME_BINARY, FRAME_END, FRAME_MESSAGE, MAX_FRAME_SIZE
+from .wire_format import JSON_WIRE, answer_hello, decode_message
 
 class SocketServer:
-    """Serveur TCP P2P écoutant les mises à jour Gossip entrantes dans des threads."""
-    def __init__(self, host: str, port: int, on_message_received: Callable[[dict], None]):
+    """
+    Serveur TCP P2P écoutant les mises à jour Gossip entrantes dans des threads (un par connexion).
+    Les connexions sont persistantes : un pair peut y envoyer plusieurs messages à la suite.
+    Si le callback retourne un dict (ou un itérable de dicts), il est renvoyé au pair comme réponse
+    sur la même connexion, à raison d'une trame par objet JSON (voir framing.py).
+    Un client peut négocier un format binaire compact en ouvrant la connexion par un WIRE_HELLO (voir wire_format.py).
+    """
+    def __init__(self, host: str, port: int, on_message_received: Callable[[dict], Optional[Union[dict, Iterable[dict]]]],
+                 client_timeout: float = 60.0, max_frame_size: int = MAX_FRAME_SIZE):
         self.host = host
         self.port = port
         self.on_message_received = on_message_received
+        self.client_timeout = client_timeout
+        self.max_frame_size = max_frame_size
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.is_running = False
+        # Connexions persistantes ouvertes, fermées à l'arrêt du serveur
+        self._clients = set()
+        self._clients_lock = threading.Lock()
 
     def start(self):
         self.server_socket.bind((self.host, self.port))
@@ -34,23 +49,90 @@ class SocketServer:
                     print(f"Erreur d'acceptation connexion : {e}")
 
     def _handle_client(self, client_sock: socket.socket):
+        """
+        Traite les trames d'une connexion persistante : chaque message est une trame (version, type,
+        longueur, JSON ou binaire) et sa réponse se termine par une trame FRAME_END. Un message JSON brut suivi de
+        la fermeture de la connexion (pair d'une ancienne version) est aussi accepté.
+        Les réponses utilisent le format négocié par le WIRE_HELLO de la connexion (JSON par défaut).
+        """
+        with self._clients_lock:
+            self._clients.add(client_sock)
         try:
-            # Réception du payload JSON
-            data = client_sock.recv(65535)
-            if data:
-                message = json.loads(data.decode('utf-8'))
-                # Transmission au callback du protocole Gossip
-                self.on_message_received(message)
-        except json.JSONDecodeError:
-            print("Erreur : Message reçu invalide (pas au format JSON)")
+            # Connexion inactive fermée après client_timeout secondes
+            client_sock.settimeout(self.client_timeout)
+            reader = FrameReader(client_sock, self.max_frame_size)
+            first_byte = reader.peek_byte()
+            if first_byte is None:
+                return
+            if first_byte == ord("{"):
+                # Ancien format : un seul message JSON, sans réponse
+                self._process(self._decode(FRAME_MESSAGE, reader.read_until_eof()))
+                return
+
+            wire = JSON_WIRE
+            while True:
+                frame = reader.read_frame()
+                if frame is None:
+                    break
+                kind, payload = frame
+                if kind not in (FRAME_MESSAGE, FRAME_BINARY):
+                    continue
+                message = self._decode(kind, payload)
+                if isinstance(message, dict) and message.get("type") == "WIRE_HELLO":
+                    # Négociation du format de la connexion : la réponse part toujours en JSON
+                    wire, reply = answer_hello(message)
+                    client_sock.sendall(JSON_WIRE.encode(reply) + encode_frame(b"", FRAME_END))
+                    continue
+                for response in self._process(message):
+                    client_sock.sendall(wire.encode(response))
+                client_sock.sendall(encode_frame(b"", FRAME_END))
+        except socket.timeout:
+            pass
+        except FrameError as e:
+            print(f"Erreur : Trame reçue invalide ({e})")
         except Exception as e:
-            print(f"Erreur de gestion client : {e}")
+            # Connexions coupées par stop() : pas d'erreur à afficher
+            if self.is_running:
+                print(f"Erreur de gestion client : {e}")
         finally:
+            with self._clients_lock:
+                self._clients.discard(client_sock)
             client_sock.close()
 
+    def _decode(self, kind: int, data: bytes) -> Optional[dict]:
+        """Décode un message JSON ou binaire ; None (et un avertissement) s'il est invalide."""
+        try:
+            return decode_message(kind, data, self.max_frame_size)
+        except (json.JSONDecodeError, UnicodeDecodeError, FrameError):
+            print("Erreur : Message reçu invalide (ni JSON ni binaire valide)")
+            return None
+
+    def _process(self, message: Optional[dict]) -> Iterable[dict]:
+        """Transmet un message décodé au callback et retourne ses réponses éventuelles."""
+        if message is None:
+            return []
+        # Transmission au callback du protocole Gossip
+        response = self.on_message_received(message)
+        if response is None:
+            return []
+        # Réponse unique ou flux de pages (générateur), envoyé au fil de l'eau
+        return [response] if isinstance(response, dict) else response
+
     def stop(self):
         self.is_running = False
+        try:
+            # shutdown() débloque le thread en attente dans accept() (close() seul ne suffit pas sous Linux)
+            self.server_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
         try:
             self.server_socket.close()
         except:
             pass
+        with self._clients_lock:
+            clients, self._clients = list(self._clients), set()
+        for client_sock in clients:
+            try:
+                client_sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
@@ -0,0 +1,290 @@
+import binascii
+import json
+import re
+import struct
+import zlib
+from typing import List, Optional, Tuple
+
+from .framing import FrameError, encode_frame, FRAME_BINARY
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Version de l'encodage binaire (1er octet du payload d'une trame FRAME_BINARY)
+BINARY_VERSION = 1
+
+# Compression du corps d'une trame binaire (2e octet du payload)
+COMPRESSION_IDS = {None: 0, "zlib": 1, "zstd": 2}
+COMPRESSION_NAMES = {v: k for k, v in COMPRESSION_IDS.items()}
+# Compressions supportées par ce noeud, par ordre de préférence (zstd si le module `zstandard` est installé)
+SUPPORTED_COMPRESSIONS = (["zstd"] if zstandard is not None else []) + ["zlib"]
+
+# En dessous de cette taille (octets), un corps n'est pas compressé (message isolé : gain nul, coût CPU)
+COMPRESS_MIN_SIZE = 1024
+
+# Formats proposés par un client. Les ciphertexts sont aléatoires donc peu compressibles :
+# la compression n'est utile que pour les trames riches en métadonnées, et reste optionnelle.
+WIRE_FORMATS = ("json", "binary", "binary+zlib", "binary+zstd")
+
+# Records au format standard du vault, encodés en colonnes (les autres records passent en JSON)
+_RECORD_FIELDS = frozenset(("uuid", "updated_at", "is_deleted", "nonce", "ciphertext"))
+_UUIDS_PATTERN = re.compile(r"(?:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})*")
+# Position dans un uuid textuel (36 caractères) de chacun de ses 32 chiffres hexadécimaux
+_HEX_POSITIONS = [i for i in range(36) if i not in (8, 13, 18, 23)]
+
+# Position des records dans le message : aucun, un record (payload dict), une liste (payload list)
+_NO_RECORDS, _ONE_RECORD, _RECORD_LIST = 0, 1, 2
+
+_PREFIX = struct.Struct(">BB")
+_COUNTS = struct.Struct(">BII")
+_LENGTH = struct.Struct(">I")
+
+def _pack_uuids(uuids: List[str]) -> Optional[bytes]:
+    """uuids textuels canoniques -> 16 octets chacun ; None si l'un d'eux ne se relirait pas à l'identique."""
+    joined = "".join(uuids)
+    if len(joined) != 36 * len(uuids) or not _UUIDS_PATTERN.fullmatch(joined):
+        return None
+    text = joined.encode("ascii")
+    hex_digits = bytearray(32 * len(uuids))
+    # Retrait des tirets colonne par colonne (tranches étendues : boucle en C plutôt qu'une boucle par record)
+    for digit, position in enumerate(_HEX_POSITIONS):
+        hex_digits[digit::32] = text[position::36]
+    return bytes.fromhex(hex_digits.decode("ascii"))
+
+def _unpack_uuids(raw: memoryview, count: int) -> List[str]:
+    """Inverse de _pack_uuids."""
+    hex_digits = raw.hex().encode("ascii")
+    text = bytearray(b"-" * (36 * count))
+    for digit, position in enumerate(_HEX_POSITIONS):
+        text[position::36] = hex_digits[digit::32]
+    text = text.decode("ascii")
+    return [text[i:i + 36] for i in range(0, 36 * count, 36)]
+
+def _pack_base64(values: List[str]) -> Optional[Tuple[bytes, List[int]]]:
+    """
+    Chaînes base64 -> (octets bruts concaténés, longueurs réelles). Chaque élément est complété au multiple
+    de 3 octets (au plus 2 octets) : le base64 de la colonne entière se découpe alors en celui de chaque élément,
+    et tout se décode ou s'encode en un seul appel. None si une chaîne ne se relirait pas à l'identique.
+    """
+    pads = [2 if v.endswith("==") else 1 if v.endswith("=") else 0 for v in values]
+    if any(len(v) & 3 for v in values):
+        return None
+    joined = "".join(values)
+    if joined.count("=") != sum(pads):
+        return None # "=" ailleurs qu'en fin de chaîne
+    # "A" vaut 6 bits à zéro : "xx==" devient "xxAA", soit l'élément complété par des zéros
+    normalized = joined.replace("=", "A")
+    raw = binascii.a2b_base64(normalized)
+    if binascii.b2a_base64(raw, newline=False) != normalized.encode("ascii"):
+        return None # Caractères hors alphabet
+    return raw, [len(v) // 4 * 3 - pad for v, pad in zip(values, pads)]
+
+def _unpack_base64(raw: memoryview, lengths) -> List[str]:
+    """Inverse de _pack_base64."""
+    text = binascii.b2a_base64(raw, newline=False).decode("ascii")
+    values, end = [], 0
+    for length in lengths:
+        start, end = end, end + (length + 2) // 3 * 4
+        pad = -length % 3
+        values.append(text[start:end - pad] + "=" * pad if pad else text[start:end])
+    return values
+
+def _padded_size(lengths) -> int:
+    return sum((length + 2) // 3 * 3 for length in lengths)
+
+def _encode_records(records: List[dict]) -> List[bytes]:
+    """
+    Encode les records en colonnes : uuids sur 16 octets, updated_at en float64, is_deleted sur 1 octet,
+    longueurs puis octets bruts des nonces et ciphertexts. Chaque colonne est convertie d'un bloc
+    (tranches étendues, struct, base64 de la colonne entière) : peu de travail Python par record,
+    à l'encodage comme au décodage. Les records non standard sont ajoutés en JSON avec leur position.
+    """
+    standard, others = [], []
+    for index, record in enumerate(records):
+        if (record.keys() == _RECORD_FIELDS and type(record["updated_at"]) is float and type(record["is_deleted"]) is bool
+                and type(record["uuid"]) is str and type(record["nonce"]) is str and type(record["ciphertext"]) is str):
+            standard.append(record)
+        else:
+            others.append([index, record])
+
+    uuids = _pack_uuids([r["uuid"] for r in standard])
+    nonces = _pack_base64([r["nonce"] for r in standard])
+    ciphertexts = _pack_base64([r["ciphertext"] for r in standard])
+    if uuids is None or nonces is None or ciphertexts is None or any(n > 255 for n in nonces[1]):
+        # Colonne non reproductible à l'identique : tous les records passent en JSON
+        standard, others = [], [[index, record] for index, record in enumerate(records)]
+        uuids, nonces, ciphertexts = b"", (b"", []), (b"", [])
+
+    count = len(standard)
+    others_bytes = json.dumps(others).encode("utf-8") if others else b""
+    return [
+        uuids,
+        struct.pack(f">{count}d", *[r["updated_at"] for r in standard]),
+        bytes([r["is_deleted"] for r in standard]),
+        bytes(nonces[1]),
+        struct.pack(f">{count}I", *ciphertexts[1]),
+        nonces[0],
+        ciphertexts[0],
+        _LENGTH.pack(len(others_bytes)),
+        others_bytes
+    ]
+
+def _decode_records(view: memoryview, offset: int, total: int, count: int) -> List[dict]:
+    """Décode le bloc écrit par _encode_records (`count` records en colonnes sur `total`)."""
+    def take(size: int) -> memoryview:
+        nonlocal offset
+        chunk = view[offset:offset + size]
+        if len(chunk) != size:
+            raise FrameError("Bloc de records tronqué")
+        offset += size
+        return chunk
+
+    uuids = _unpack_uuids(take(16 * count), count)
+    timestamps = struct.unpack(f">{count}d", take(8 * count))
+    deleted = bytes(take(count))
+    nonce_lengths = bytes(take(count))
+    ciphertext_lengths = struct.unpack(f">{count}I", take(4 * count))
+    nonces = _unpack_base64(take(_padded_size(nonce_lengths)), nonce_lengths)
+    ciphertexts = _unpack_base64(take(_padded_size(ciphertext_lengths)), ciphertext_lengths)
+
+    records = [{"uuid": u, "updated_at": t, "is_deleted": d == 1, "nonce": n, "ciphertext": c}
+               for u, t, d, n, c in zip(uuids, timestamps, deleted, nonces, ciphertexts)]
+    (others_length,) = _LENGTH.unpack(take(_LENGTH.size))
+    if others_length:
+        for index, record in json.loads(bytes(take(others_length))):
+            records.insert(index, record)
+    if len(records) != total:
+        raise FrameError("Nombre de records incohérent")
+    return records
+
+def encode_binary(message: dict, compression: Optional[str] = None, compress_min: int = COMPRESS_MIN_SIZE) -> bytes:
+    """
+    Encode un message en binaire : enveloppe JSON (type, sender_id, path_vector...) sans les records,
+    puis les records du `payload` en colonnes. Le corps est compressé au-delà de `compress_min` octets.
+    """
+    payload = message.get("payload")
+    if isinstance(payload, dict):
+        mode, records = _ONE_RECORD, [payload]
+    elif isinstance(payload, list) and all(isinstance(r, dict) for r in payload):
+        mode, records = _RECORD_LIST, payload
+    else:
+        mode, records = _NO_RECORDS, []
+    envelope = {k: v for k, v in message.items() if k != "payload"} if mode != _NO_RECORDS else message
+    envelope_bytes = json.dumps(envelope).encode("utf-8")
+
+    record_parts = _encode_records(records) if mode != _NO_RECORDS else []
+    standard = len(record_parts[0]) // 16 if record_parts else 0 # Records encodés en colonnes
+    body = b"".join([_LENGTH.pack(len(envelope_bytes)), envelope_bytes,
+                     _COUNTS.pack(mode, len(records), standard)] + record_parts)
+
+    if compression is None or len(body) < compress_min:
+        compression = None
+    elif compression == "zlib":
+        body = zlib.compress(body, 6)
+    elif compression == "zstd" and zstandard is not None:
+        body = zstandard.ZstdCompressor(level=3).compress(body)
+    else:
+        raise ValueError(f"Compression non supportée : {compression}")
+    return _PREFIX.pack(BINARY_VERSION, COMPRESSION_IDS[compression]) + body
+
+def decode_binary(data: bytes, max_size: Optional[int] = None) -> dict:
+    """Décode un message encodé par encode_binary. Lève FrameError si le payload est invalide."""
+    try:
+        version, compression_id = _PREFIX.unpack_from(data, 0)
+        if version != BINARY_VERSION:
+            raise FrameError(f"Version d'encodage binaire non supportée : {version}")
+        compression = COMPRESSION_NAMES.get(compression_id, "?")
+        body = memoryview(data)[_PREFIX.size:]
+        if compression == "zlib":
+            decompressor = zlib.decompressobj()
+            body = decompressor.decompress(body, max_size or 0)
+            if decompressor.unconsumed_tail:
+                raise FrameError(f"Message décompressé trop grand (max {max_size} octets)")
+        elif compression == "zstd" and zstandard is not None:
+            body = zstandard.ZstdDecompressor().decompress(body, max_output_size=max_size or 0)
+        elif compression is not None:
+            raise FrameError(f"Compression non supportée : {compression}")
+
+        view = memoryview(body)
+        (envelope_length,) = _LENGTH.unpack_from(view, 0)
+        offset = _LENGTH.size
+        message = json.loads(bytes(view[offset:offset + envelope_length]))
+        offset += envelope_length
+        mode, total, standard = _COUNTS.unpack_from(view, offset)
+        offset += _COUNTS.size
+        if mode == _NO_RECORDS:
+            return message
+        records = _decode_records(view, offset, total, standard)
+        message["payload"] = records[0] if mode == _ONE_RECORD else records
+        return message
+    except FrameError:
+        raise
+    except Exception as e:
+        # struct.error, JSON invalide, erreurs de décompression zlib/zstd...
+        raise FrameError(f"Message binaire invalide : {e}")
+
+class WireFormat:
+    """
+    Format des messages sur une connexion : JSON (historique) ou binaire, éventuellement compressé.
+    Négocié à l'ouverture de chaque connexion (voir build_hello / answer_hello / accept_hello_reply) :
+    un pair d'une ancienne version ne répond pas au WIRE_HELLO, et la connexion reste en JSON.
+    """
+
+    def __init__(self, binary: bool = False, compression: Optional[str] = None, compress_min: int = COMPRESS_MIN_SIZE):
+        self.binary = binary
+        self.compression = compression if binary else None
+        self.compress_min = compress_min
+
+    def encode(self, message: dict) -> bytes:
+        """Trame complète (en-tête compris) portant `message`."""
+        if self.binary:
+            return encode_frame(encode_binary(message, self.compression, self.compress_min), FRAME_BINARY)
+        return encode_frame(json.dumps(message).encode("utf-8"))
+
+    def __repr__(self) -> str:
+        if not self.binary:
+            return "WireFormat(json)"
+        return f"WireFormat(binary, {self.compression or 'sans compression'})"
+
+JSON_WIRE = WireFormat()
+
+def decode_message(kind: int, payload: bytes, max_size: Optional[int] = None) -> dict:
+    """Décode le payload d'une trame FRAME_MESSAGE (JSON) ou FRAME_BINARY."""
+    if kind == FRAME_BINARY:
+        return decode_binary(payload, max_size)
+    return json.loads(payload)
+
+def check_wire_format(wire_format: str):
+    """Lève ValueError si `wire_format` n'est pas utilisable par ce noeud."""
+    if wire_format not in WIRE_FORMATS:
+        raise ValueError(f"Format réseau inconnu : {wire_format}")
+    compression = wire_format.partition("+")[2]
+    if compression and compression not in SUPPORTED_COMPRESSIONS:
+        raise ValueError(f"Compression {compression} indisponible (module zstandard non installé)")
+
+def build_hello(wire_format: str = "binary") -> dict:
+    """Premier message d'une connexion (côté client) : format binaire, avec la compression souhaitée."""
+    compression = wire_format.partition("+")[2]
+    return {"type": "WIRE_HELLO", "formats": ["binary"], "compression": [compression] if compression else []}
+
+def answer_hello(message: dict) -> Tuple[WireFormat, dict]:
+    """Côté serveur : choisit le format de la connexion et construit la réponse (envoyée en JSON)."""
+    formats = message.get("formats")
+    offered = message.get("compression")
+    if not isinstance(formats, list) or "binary" not in formats:
+        return JSON_WIRE, {"type": "WIRE_HELLO_REPLY", "format": "json", "compression": None}
+    offered = offered if isinstance(offered, list) else []
+    # Préférence du client, restreinte à ce que l'on supporte
+    compression = next((c for c in offered if c in SUPPORTED_COMPRESSIONS), None)
+    return WireFormat(True, compression), {"type": "WIRE_HELLO_REPLY", "format": "binary", "compression": compression}
+
+def accept_hello_reply(reply: Optional[dict]) -> WireFormat:
+    """Côté client : format retenu par le serveur ; JSON si le pair n'a pas répondu (ancienne version)."""
+    if not isinstance(reply, dict) or reply.get("type") != "WIRE_HELLO_REPLY" or reply.get("format") != "binary":
+        return JSON_WIRE
+    compression = reply.get("compression")
+    if compression not in SUPPORTED_COMPRESSIONS:
+        compression = None
+    return WireFormat(True, compression)
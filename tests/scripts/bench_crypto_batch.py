@@ -0,0 +1,29 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from vault.crypto_service import CryptoService
+
+def timed(function) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    crypto = CryptoService("bench", workers=1)
+    secrets = [f'{{"service": "service-{i}", "username": "user-{i}", "password": "p@ssw0rd-{i}", "notes": ""}}'
+               for i in range(count)]
+    items = crypto.encrypt_many(secrets)
+
+    print(f"{count} secrets, {os.cpu_count()} coeur(s)")
+    print(f"{'decrypt unitaire':>22} : {timed(lambda: [crypto.decrypt(c, n) for c, n in items]):.2f}s")
+    for workers in sorted({1, 2, os.cpu_count() or 1}):
+        batch = CryptoService("bench", workers=workers)
+        batch.key = crypto.key
+        batch.decrypt_many(items[:batch.parallel_min_items]) # Démarrage du pool hors mesure
+        print(f"{f'decrypt_many ({workers} proc.)':>22} : {timed(lambda: batch.decrypt_many(items)):.2f}s")
+        print(f"{f'encrypt_many ({workers} proc.)':>22} : {timed(lambda: batch.encrypt_many(secrets)):.2f}s")
+        batch.close()
@@ -0,0 +1,56 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sync.gossip_logic import GossipLogic
+
+def simulate(n_nodes: int, fanout=None, ttl: int = 6, seed: int = 0):
+    """
+    Simule la diffusion d'une mise à jour dans un maillage complet de `n_nodes` noeuds,
+    en suivant les règles de NetworkCore (LWW : un noeud ne relaie qu'une version nouvelle).
+    Un tour = un saut réseau. Retourne (tours jusqu'au dernier noeud atteint, messages, couverture).
+    """
+    random.seed(seed)
+    logics = [GossipLogic(f"Node_{i}", fanout=fanout, ttl=ttl) for i in range(n_nodes)]
+    peers = [{"ip": "127.0.0.1", "port": i} for i in range(n_nodes)]
+    record = {"uuid": "bench", "updated_at": 1.0}
+
+    has_record = {0}
+    first_message = logics[0].build_gossip_message(record)
+    in_flight = [(p["port"], first_message) for p in logics[0].select_targets(peers[1:])]
+    messages = len(in_flight)
+    rounds = 0
+    last_infection = 0
+    while in_flight:
+        rounds += 1
+        next_round = []
+        for node, message in in_flight:
+            should_process, payload = logics[node].should_process_message(message)
+            if not should_process or node in has_record:
+                continue
+            has_record.add(node)
+            last_infection = rounds
+            ttl_left = logics[node].next_ttl(message)
+            if ttl_left == 0:
+                continue
+            forwarded = logics[node].build_gossip_message(payload, message["path_vector"], ttl_left)
+            others = [p for p in peers if p["port"] != node]
+            next_round.extend((p["port"], forwarded) for p in logics[node].select_targets(others))
+        messages += len(next_round)
+        in_flight = next_round
+    return last_infection, messages, len(has_record) / n_nodes
+
+if __name__ == "__main__":
+    trials = 20
+    print(f"{'noeuds':>6} {'mode':>20} {'tours':>6} {'messages':>9} {'couv. moy.':>10} {'couv. min':>10}")
+    for n_nodes in (20, 100, 500):
+        for fanout, ttl in ((None, 6), (3, 6), (4, 8), (6, 8), (8, 10)):
+            results = [simulate(n_nodes, fanout, ttl, seed) for seed in range(trials)]
+            rounds = sum(r[0] for r in results) / trials
+            messages = sum(r[1] for r in results) / trials
+            coverage = sum(r[2] for r in results) / trials
+            worst = min(r[2] for r in results)
+            mode = "flood" if fanout is None else f"epidemic k={fanout} ttl={ttl}"
+            print(f"{n_nodes:>6} {mode:>20} {rounds:>6.1f} {messages:>9.0f} {coverage:>10.1%} {worst:>10.1%}")
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from vault.fuzzy_index import FuzzyIndex
+
+SERVICES = ["github", "gitlab", "google", "amazon", "netflix", "proton", "slack", "notion", "dropbox", "paypal"]
+SYLLABLES = ["ba", "ko", "ri", "tel", "mon", "sta", "vi", "qua", "zen", "dor", "lu", "pex", "fin", "ga", "tro"]
+USERNAMES = ["alice@example.com", "alice.martin@gmail.com", "amartin", "admin"]
+NOTES = ["", "", "", "compte perso", "compte prod, 2FA active", "banque en ligne"]
+QUERIES = ["netflx", "gihtub", "user4242", "kotelmon", "banque", "gmail", "xyzzy"]
+
+def random_service(rng: random.Random, i: int) -> str:
+    """Services majoritairement distincts, comme dans un vrai vault ; quelques-uns très courants reviennent."""
+    if i < len(SERVICES):
+        return SERVICES[i]
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) + rng.choice(["", ".com", ".fr", " pro"])
+
+def random_secrets(count: int):
+    rng = random.Random(0)
+    for i in range(count):
+        yield {
+            "service": random_service(rng, i),
+            "username": rng.choice(USERNAMES) if rng.random() < 0.7 else f"user{i}",
+            "password": "x",
+            "notes": rng.choice(NOTES)
+        }
+
+def timed(search, query: str, runs: int = 20):
+    start = time.perf_counter()
+    for _ in range(runs):
+        results = search(query)
+    return (time.perf_counter() - start) / runs, results
+
+def bench_index(count: int):
+    """Index seul (FuzzyIndex.search)."""
+    index = FuzzyIndex()
+    index.build()
+    start = time.perf_counter()
+    for i, secret in enumerate(random_secrets(count)):
+        index.add(f"uuid-{i}", 1.0, secret)
+    print(f"{count} entrées indexées en {time.perf_counter() - start:.2f}s")
+    for query in QUERIES:
+        elapsed, results = timed(index.search, query)
+        top = results[0]["service"] if results else "-"
+        print(f"{query:>14} : {elapsed * 1000:7.2f} ms, {len(results)} résultat(s), premier : {top}")
+
+def bench_vault(count: int, backend: str):
+    """Chemin complet de la CLI (VaultCore.fuzzy_search), vérification du stockage comprise."""
+    from vault.vault_core import VaultCore
+    from vault.db_manager import DBManager
+
+    os.environ["P2P_MOCK_BSSID"] = "BENCH_BSSID"
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "vault.db" if backend == "sqlite" else "vault.json")
+        vault = VaultCore("bench", allowed_bssids_hashes=[hashlib.sha256(b"BENCH_BSSID").hexdigest()], db_path=db_path)
+        encrypted = vault.crypto_service.encrypt_many([json.dumps(s) for s in random_secrets(count)])
+        now = time.time()
+        vault.db_manager.backend.upsert_many([{"uuid": f"uuid-{i}", "updated_at": now, "is_deleted": False, "ciphertext": c, "nonce": n}
+                                              for i, (c, n) in enumerate(encrypted)])
+        start = time.perf_counter()
+        vault.fuzzy_search(QUERIES[0])
+        print(f"{backend} : {count} secrets déchiffrés et indexés en {time.perf_counter() - start:.2f}s")
+        for query in QUERIES:
+            elapsed, results = timed(vault.fuzzy_search, query)
+            print(f"{query:>14} : {elapsed * 1000:7.2f} ms, {len(results)} résultat(s)")
+        # Écriture d'un autre processus (daemon) : la recherche suivante compare l'index au vault
+        other = DBManager(db_path)
+        other.upsert_record_local("from-daemon", "", "", is_deleted=True)
+        other.close()
+        elapsed, _ = timed(vault.fuzzy_search, QUERIES[0], runs=1)
+        print(f"{'après écriture externe':>14} : {elapsed * 1000:7.2f} ms")
+        vault.lock()
+
+if __name__ == "__main__":
+    # Usage : bench_fuzzy_search.py [nombre] [index|json|sqlite]
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    mode = sys.argv[2] if len(sys.argv) > 2 else "index"
+    if mode == "index":
+        bench_index(count)
+    else:
+        bench_vault(count, mode)
@@ -0,0 +1,58 @@
+import base64
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sync.gossip_logic import GossipLogic
+from sync.wire_format import WireFormat, decode_message, SUPPORTED_COMPRESSIONS
+from sync.framing import HEADER
+
+def make_records(count: int, secret_size: int = 120):
+    """Records chiffrés réalistes : uuid4, timestamp float, nonce de 16 octets, tag + ciphertext aléatoires."""
+    return [{
+        "uuid": str(uuid.uuid4()),
+        "updated_at": time.time() + i / 1000,
+        "is_deleted": False,
+        "nonce": base64.b64encode(os.urandom(16)).decode(),
+        "ciphertext": base64.b64encode(os.urandom(16 + secret_size)).decode()
+    } for i in range(count)]
+
+def best_time(function, repeat: int = 7) -> float:
+    """Meilleur temps sur `repeat` exécutions (moins sensible au bruit de la machine qu'une moyenne)."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def measure(wire: WireFormat, messages):
+    """Retourne (octets sur le fil, temps d'encodage, temps de décodage) pour une synchro complète."""
+    frames = [wire.encode(m) for m in messages]
+    size = sum(len(f) for f in frames)
+    encode_time = best_time(lambda: [wire.encode(m) for m in messages])
+    decode_time = best_time(lambda: [decode_message(f[1], f[HEADER.size:]) for f in frames])
+    return size, encode_time, decode_time
+
+if __name__ == "__main__":
+    logic = GossipLogic("Node_A")
+    formats = [("json", WireFormat()), ("binary", WireFormat(True))]
+    formats += [(f"binary+{c}", WireFormat(True, c)) for c in SUPPORTED_COMPRESSIONS]
+    print(f"{'records':>8} {'format':>14} {'octets':>11} {'ratio':>6} {'encodage':>10} {'décodage':>10}")
+    for count in (1, 1000, 20000):
+        records = make_records(count)
+        # Synchro en masse : pages de 500 records (SYNC_PAGE), ou un GOSSIP_UPDATE isolé
+        if count == 1:
+            messages = [logic.build_gossip_message(records[0])]
+        else:
+            messages = [logic.build_sync_page(records[i:i + 500], records[min(i + 500, count) - 1]["uuid"], i + 500 >= count)
+                        for i in range(0, count, 500)]
+        reference = None
+        for name, wire in formats:
+            size, encode_time, decode_time = measure(wire, messages)
+            reference = reference or size
+            print(f"{count:>8} {name:>14} {size:>11,} {size / reference:>6.0%} {encode_time * 1000:>8.1f}ms {decode_time * 1000:>8.1f}ms")
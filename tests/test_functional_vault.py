@@ -10,16 +10,21 @@ class TestVaultFunctional(unittest.TestCase):
     Conçu pour tourner dans un container Docker éphémère.
     """
     DB_PATH = "vault.json"
+    JOURNAL_PATH = "vault.json.journal"
+    LOCK_PATH = "vault.json.lock"
+    STATE_PATH = "sync_state.json"
 
     def setUp(self):
         # On s'assure d'avoir un espace de travail vierge pour chaque test
-        if os.path.exists(self.DB_PATH):
-            os.remove(self.DB_PATH)
+        for path in (self.DB_PATH, self.JOURNAL_PATH, self.LOCK_PATH, self.STATE_PATH):
+            if os.path.exists(path):
+                os.remove(path)
 
     def tearDown(self):
         # Nettoyage
-        if os.path.exists(self.DB_PATH):
-            os.remove(self.DB_PATH)
+        for path in (self.DB_PATH, self.JOURNAL_PATH, self.LOCK_PATH, self.STATE_PATH):
+            if os.path.exists(path):
+                os.remove(path)
 
     def _run_main_background(self, password: str, timeout: int = 2):
         """Lance l'app en arrière-plan et la tue après `timeout` secondes."""
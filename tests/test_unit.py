@@ -30,6 +30,31 @@ class TestP2PSafeGuard(unittest.TestCase):
         failed_plaintext = crypto.decrypt(bad_ciphertext, nonce)
         self.assertIsNone(failed_plaintext)
 
+    def test_crypto_batch(self):
+        """Test du chiffrement/déchiffrement par lots (pool de processus au-delà du seuil)"""
+        secrets = [f'{{"service": "s{i}", "password": "p{i}"}}' for i in range(50)]
+
+        crypto = CryptoService("mon_super_password", workers=2, parallel_min_items=10)
+        try:
+            encrypted = crypto.encrypt_many(secrets)
+            self.assertIsNotNone(crypto._pool)
+            self.assertEqual(len(set(nonce for _, nonce in encrypted)), 50)
+            # Même format que encrypt/decrypt unitaires, ordre conservé
+            self.assertEqual(crypto.decrypt(*encrypted[7]), secrets[7])
+            ciphertext, nonce = crypto.encrypt(secrets[0])
+            encrypted[3] = (encrypted[3][0][:-4] + "AAAA", encrypted[3][1]) # Tag corrompu
+            encrypted.append((ciphertext, nonce))
+            self.assertEqual(crypto.decrypt_many(encrypted), secrets[:3] + [None] + secrets[4:] + [secrets[0]])
+        finally:
+            crypto.close()
+        self.assertIsNone(crypto._pool)
+
+        # Petit lot (ou un seul coeur) : traité dans le processus courant
+        inline = CryptoService("mon_super_password", workers=1)
+        self.assertEqual(inline.decrypt_many(inline.encrypt_many(secrets[:5])), secrets[:5])
+        self.assertIsNone(inline._pool)
+        self.assertEqual(inline.decrypt_many([]), [])
+
     def test_gossip_logic_path_vector(self):
         logic = GossipLogic("Node_A")
         
@@ -60,6 +85,948 @@ class TestP2PSafeGuard(unittest.TestCase):
         self.assertTrue(should_process)
         self.assertEqual(payload, record)
 
+    def test_gossip_batch(self):
+        """Test du message GOSSIP_BATCH : découpage, validation et propagation du sous-ensemble accepté"""
+        from sync.network_core import NetworkCore
+        
+        logic = GossipLogic("Node_A")
+        records = [{"uuid": f"uuid-{i}", "updated_at": float(i), "ciphertext": "x" * 100, "nonce": "n"} for i in range(50)]
+        
+        chunks = logic.chunk_records(records, max_bytes=1000)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(sum(len(c) for c in chunks), 50)
+        
+        batch = logic.build_gossip_batch(records[:3], ["Node_B"])
+        self.assertEqual(batch["type"], "GOSSIP_BATCH")
+        self.assertEqual(batch["path_vector"], ["Node_B", "Node_A"])
+        self.assertFalse(logic.should_process_batch(batch)[0]) # Boucle
+        should_process, payload = GossipLogic("Node_C").should_process_batch(batch)
+        self.assertTrue(should_process)
+        self.assertEqual(payload, records[:3])
+        
+        # Le noeud ne propage que les records acceptés par son Vault (LWW)
+        sent = []
+        network = NetworkCore("Node_C", "127.0.0.1", 0, [],
+                              apply_gossip_callback=lambda r: r["updated_at"] >= 1.0,
+                              get_all_records_callback=lambda: records)
+        network._propagate_to_peers = sent.append
+        network._on_message_received(batch)
+        self.assertEqual(len(sent), 1)
+        self.assertEqual([r["uuid"] for r in sent[0]["payload"]], ["uuid-1", "uuid-2"])
+        self.assertEqual(sent[0]["path_vector"], ["Node_B", "Node_A", "Node_C"])
+        
+        # SYNC_REQUEST : le catalogue part en quelques lots au lieu d'un message par record
+        sent.clear()
+        network._on_message_received({"type": "SYNC_REQUEST", "sender_id": "Node_D"})
+        self.assertEqual(len(sent), 1)
+        self.assertEqual(len(sent[0]["payload"]), 50)
+        network.server.server_socket.close()
+
+    def test_epidemic_dissemination(self):
+        """Test de la diffusion épidémique : k pairs au hasard, TTL décrémenté, vecteur de chemin borné"""
+        from sync.network_core import NetworkCore
+
+        logic_a = GossipLogic("Node_A", fanout=2, ttl=3)
+        logic_b = GossipLogic("Node_B", fanout=2, ttl=3)
+        peers = [{"ip": "127.0.0.1", "port": port} for port in range(1, 11)]
+        targets = logic_a.select_targets(peers)
+        self.assertEqual(len(targets), 2)
+        self.assertNotEqual(targets[0], targets[1])
+        self.assertEqual(len(GossipLogic("Node_A").select_targets(peers)), 10) # Mode flood
+
+        message = logic_a.build_gossip_message({"uuid": "u1", "updated_at": 1.0})
+        self.assertEqual(message["ttl"], 3)
+        self.assertEqual(logic_b.next_ttl(message), 2)
+        forwarded = logic_b.build_gossip_message(message["payload"], message["path_vector"], 2)
+        self.assertEqual(forwarded["path_vector"], ["Node_B"])
+        self.assertIsNone(GossipLogic("Node_B").next_ttl(message))
+        self.assertNotIn("ttl", GossipLogic("Node_A").build_gossip_message({"uuid": "u1", "updated_at": 1.0}))
+
+        # Relais vers `fanout` pairs seulement, et plus de relais une fois le TTL épuisé
+        # (sans cache de déduplication : le même message est rejoué avec deux TTL)
+        network = NetworkCore("Node_C", "127.0.0.1", 0, peers, lambda r: True, lambda: [], fanout=2, gossip_ttl=3,
+                              seen_cache=None)
+        try:
+            network._on_message_received(dict(message, ttl=1))
+            self.assertEqual(len(network._outboxes), 0)
+            network._on_message_received(message)
+            self.assertEqual(len(network._outboxes), 2)
+        finally:
+            network.stop()
+
+    def test_plumtree_broadcast(self):
+        """Test du mode arbre (Plumtree) : une réception par noeud et par mise à jour, réparation par GRAFT"""
+        from sync.network_core import NetworkCore
+        from sync.plumtree import BroadcastTree
+
+        # Annonce IHAVE non suivie de la mise à jour : réclamée à l'annonceur, puis au suivant
+        tree = BroadcastTree(graft_timeout=0.01, max_graft_attempts=2)
+        tree.announce(("u1", 1.0), ("10.0.0.1", 1))
+        tree.announce(("u1", 1.0), ("10.0.0.2", 1))
+        tree.announce(("u2", 1.0), ("10.0.0.1", 1))
+        self.assertEqual(tree.expired(), {})
+        time.sleep(0.02)
+        self.assertEqual(tree.expired(), {("10.0.0.1", 1): [("u1", 1.0), ("u2", 1.0)]})
+        tree.mark_received([("u2", 1.0)])
+        time.sleep(0.02)
+        self.assertEqual(tree.expired(), {("10.0.0.2", 1): [("u1", 1.0)]})
+        time.sleep(0.02)
+        self.assertEqual(tree.expired(), {})
+        self.assertEqual(tree.mark_received([("u2", 1.0), ("u3", 1.0)]), [("u3", 1.0)])
+
+        stores = [{} for _ in range(5)]
+        received = [0] * 5
+        def make_node(i):
+            def apply(record):
+                local = stores[i].get(record["uuid"])
+                if local and local["updated_at"] >= record["updated_at"]:
+                    return False
+                stores[i][record["uuid"]] = record
+                return True
+            node = NetworkCore(f"Node_{i}", "127.0.0.1", 0, [], apply, lambda: [],
+                               get_records_by_uuid_callback=lambda uuids: [stores[i][u] for u in uuids if u in stores[i]],
+                               plumtree=True, graft_timeout=0.2)
+            on_tree_message = node._on_tree_message
+            def count(message):
+                if message.get("type") in ("GOSSIP_UPDATE", "GOSSIP_BATCH"):
+                    received[i] += 1
+                on_tree_message(message)
+            node._on_tree_message = count
+            return node
+
+        nodes = [make_node(i) for i in range(5)]
+        for node in nodes:
+            node.start()
+        ports = [node.server.server_socket.getsockname()[1] for node in nodes]
+        # Pairs configurés par nom d'hôte alors que les messages annoncent une IP (reply_to) : les liens doivent concorder
+        for i, node in enumerate(nodes):
+            node.peers = [{"ip": "localhost", "port": port} for j, port in enumerate(ports) if j != i]
+        def broadcast(i, uuid):
+            # Mise à jour locale : écrite dans le vault puis diffusée
+            stores[i][uuid] = {"uuid": uuid, "updated_at": 1.0}
+            nodes[i].trigger_local_update(stores[i][uuid])
+            for _ in range(200):
+                if all(uuid in store for store in stores):
+                    return True
+                time.sleep(0.01)
+            return False
+        try:
+            # Premières diffusions en flood : les doublons élaguent les liens superflus (PRUNE)
+            for n in range(10):
+                self.assertTrue(broadcast(n % 5, f"warmup-{n}"))
+            time.sleep(0.3)
+            before = sum(received)
+            for n in range(10):
+                self.assertTrue(broadcast(0, f"tree-{n}"))
+            time.sleep(0.3)
+            # Flood : 16 réceptions par mise à jour (4 noeuds x 4 voisins) ; arbre : ~4
+            self.assertLessEqual(sum(received) - before, 10 * 6)
+
+            # Lien eager coupé : le noeud 1 ne reçoit que des IHAVE et réclame la mise à jour (GRAFT)
+            for node in nodes:
+                node.tree.prune(("127.0.0.1", ports[1]))
+            self.assertTrue(broadcast(0, "after-prune"))
+        finally:
+            for node in nodes:
+                node.stop()
+
+    def test_seen_cache_dedup(self):
+        """Test du cache de déduplication : un doublon n'atteint jamais le vault, quelle que soit sa route"""
+        from sync.network_core import NetworkCore
+        from sync.seen_cache import SeenCache, BloomSeenFilter
+
+        cache = SeenCache(max_entries=2, ttl=0.05)
+        self.assertFalse(cache.check_and_add(("u1", 1.0)))
+        self.assertTrue(cache.check_and_add(("u1", 1.0)))
+        self.assertFalse(cache.check_and_add(("u1", 2.0))) # Nouvelle version
+        self.assertFalse(cache.check_and_add(("u2", 1.0))) # Éviction LRU de ("u1", 1.0)
+        self.assertFalse(cache.check_and_add(("u1", 1.0)))
+        time.sleep(0.06)
+        self.assertFalse(cache.check_and_add(("u2", 1.0))) # Expirée
+        self.assertEqual(cache.stats, {"hits": 1, "misses": 5, "size": 2})
+
+        bloom = BloomSeenFilter(capacity=100, error_rate=0.01)
+        false_positives = sum(bloom.check_and_add((f"u{i}", 1.0)) for i in range(250))
+        self.assertLess(false_positives, 10) # Faux positifs rares, bornés par les rotations de génération
+        self.assertTrue(bloom.check_and_add(("u249", 1.0)))
+        self.assertLessEqual(bloom.stats["size"], 100)
+
+        for kind in ("lru", "bloom"):
+            applied = []
+            store = {}
+            def apply(record):
+                if store.get(record["uuid"], {}).get("updated_at", float("-inf")) >= record["updated_at"]:
+                    return False
+                store[record["uuid"]] = record
+                applied.append(record)
+                return True
+            network = NetworkCore("Node_A", "127.0.0.1", 0, [], apply, lambda: list(store.values()), seen_cache=kind)
+            try:
+                records = [{"uuid": f"u{i}", "updated_at": 1.0} for i in range(10)]
+                # Tempête de doublons : la même mise à jour arrive par trois routes
+                for sender in ("Node_B", "Node_C", "Node_D"):
+                    logic = GossipLogic(sender)
+                    network._on_message_received(logic.build_gossip_message(records[0]))
+                    network._on_message_received(logic.build_gossip_batch(records))
+                self.assertEqual(sorted(r["uuid"] for r in applied), sorted(r["uuid"] for r in records))
+                self.assertEqual(network.gossip_logic.seen_cache.stats["misses"], 10)
+
+                # L'écho d'une mise à jour locale est écarté
+                store["local"] = {"uuid": "local", "updated_at": 2.0}
+                network.trigger_local_update(store["local"])
+                network._on_message_received(GossipLogic("Node_B").build_gossip_message({"uuid": "local", "updated_at": 2.0}))
+                self.assertNotIn("local", [r["uuid"] for r in applied])
+
+                if kind == "bloom":
+                    # Faux positif du filtre : la version n'est pas dans le vault, la mise à jour n'est pas perdue
+                    network.gossip_logic.seen_cache.check_and_add(("false-positive", 3.0))
+                    network._on_message_received(GossipLogic("Node_B").build_gossip_batch(
+                        [{"uuid": "false-positive", "updated_at": 3.0}, {"uuid": "u1", "updated_at": 1.0}]))
+                    self.assertEqual(applied[-1]["uuid"], "false-positive")
+                    self.assertEqual([r["uuid"] for r in applied].count("u1"), 1)
+            finally:
+                network.stop()
+
+    def test_merkle_anti_entropy(self):
+        """Test de l'anti-entropie par arbre de Merkle entre deux noeuds TCP locaux"""
+        from unittest.mock import patch
+        from sync.network_core import NetworkCore
+        from sync.merkle_tree import MerkleTree
+        
+        entries = [(f"uuid-{i}", float(i)) for i in range(300)]
+        self.assertEqual(MerkleTree(entries).root, MerkleTree(list(reversed(entries))).root)
+        self.assertNotEqual(MerkleTree(entries).root, MerkleTree(entries[:-1] + [("uuid-299", 1000.0)]).root)
+        
+        def make_store(records):
+            store = {r["uuid"]: r for r in records}
+            def apply(record):
+                local = store.get(record["uuid"])
+                if local and record["updated_at"] <= local["updated_at"]:
+                    return False
+                store[record["uuid"]] = record
+                return True
+            return store, apply
+        
+        base = [{"uuid": u, "updated_at": ts, "is_deleted": False, "ciphertext": "ct", "nonce": "n"} for u, ts in entries]
+        store_a, apply_a = make_store(base + [dict(base[0], uuid="only-on-a")])
+        store_b, apply_b = make_store(base[:-1] + [dict(base[10], updated_at=500.0)])
+        
+        node_a = NetworkCore("Node_A", "127.0.0.1", 0, [], apply_a, lambda: list(store_a.values()))
+        node_b = NetworkCore("Node_B", "127.0.0.1", 0, [], apply_b, lambda: list(store_b.values()))
+        node_a.start()
+        node_b.start()
+        try:
+            port_b = node_b.server.server_socket.getsockname()[1]
+            # A récupère uuid-10 (plus récent chez B) et pousse uuid-299 + only-on-a
+            self.assertEqual(node_a.anti_entropy("127.0.0.1", port_b), (1, 2))
+            self.assertEqual(store_a["uuid-10"]["updated_at"], 500.0)
+            for _ in range(50):
+                if "only-on-a" in store_b and "uuid-299" in store_b:
+                    break
+                time.sleep(0.02)
+            self.assertEqual(set(store_a), set(store_b))
+            
+            # Noeuds convergés : une seule requête, rien à échanger
+            node_a._merkle_cache = node_b._merkle_cache = None
+            self.assertEqual(node_a.anti_entropy("127.0.0.1", port_b), (0, 0))
+
+            # Beaucoup de records divergents : récupérés par lots d'uuids (une réponse unique dépasserait une trame)
+            for i in range(100, 220):
+                store_b[f"uuid-{i}"] = dict(base[i], updated_at=1000.0 + i)
+            fetches = []
+            request = node_a.client.request
+            def counting_request(ip, port, message, **kwargs):
+                if message["type"] == "SYNC_FETCH":
+                    fetches.append(len(message["uuids"]))
+                return request(ip, port, message, **kwargs)
+            node_a.client.request = counting_request
+            node_a._merkle_cache = node_b._merkle_cache = None
+            with patch("sync.network_core.FETCH_QUERY_SIZE", 50):
+                self.assertEqual(node_a.anti_entropy("127.0.0.1", port_b), (120, 0))
+            self.assertEqual(fetches, [50, 50, 20])
+            node_a.client.request = request
+            
+            # Pair injoignable
+            self.assertIsNone(node_a.anti_entropy("127.0.0.1", 1))
+        finally:
+            node_a.stop()
+            node_b.stop()
+
+    def test_snapshot_bootstrap(self):
+        """Test du bootstrap par snapshot : transfert sur une connexion, installation d'un bloc, reprise incrémentale"""
+        import base64
+        import uuid
+        from sync.network_core import NetworkCore
+        from vault.db_manager import DBManager
+
+        paths = [path for name in ("test_boot_b.json", "test_boot_a.json", "test_boot_c.json")
+                 for path in (name, name + ".journal", name + ".tmp", name + ".lock")]
+        for path in paths:
+            if os.path.exists(path): os.remove(path)
+
+        try:
+            db_b = DBManager("test_boot_b.json")
+            records = [{"uuid": str(uuid.uuid4()), "updated_at": 1000.0 + i, "is_deleted": False,
+                        "nonce": base64.b64encode(os.urandom(16)).decode(), "ciphertext": base64.b64encode(os.urandom(80)).decode()}
+                       for i in range(3000)]
+            db_b.install_snapshot(records)
+            node_b = NetworkCore("Node_B", "127.0.0.1", 0, [], db_b.process_gossip_update, db_b.get_raw_records)
+            node_b.start()
+            port_b = node_b.server.server_socket.getsockname()[1]
+
+            # Un record local plus récent que celui du snapshot est conservé (fusion LWW)
+            db_a = DBManager("test_boot_a.json")
+            db_a.process_gossip_update(dict(records[0], updated_at=5000.0))
+            db_a.flush()
+            node_a = NetworkCore("Node_A", "127.0.0.1", 0, [], db_a.process_gossip_update, db_a.get_raw_records,
+                                 install_snapshot_callback=db_a.install_snapshot)
+            try:
+                self.assertEqual(node_a.bootstrap("127.0.0.1", port_b), 2999)
+                self.assertEqual(len(db_a.get_raw_records()), 3000)
+                self.assertEqual(db_a.get_record(records[0]["uuid"])["updated_at"], 5000.0)
+                # Installé d'un bloc dans vault.json, sans passer par le journal
+                self.assertEqual(os.path.getsize("test_boot_a.json.journal"), 0)
+                self.assertEqual(len(DBManager("test_boot_a.json").get_raw_records()), 3000)
+                self.assertEqual(node_a.peer_state.get_high_water("127.0.0.1", port_b), 3999.0)
+                self.assertEqual(node_a.sync_since("127.0.0.1", port_b), 0)
+
+                # Transfert interrompu : rien n'est installé
+                def broken_pages():
+                    pages = node_b._iter_snapshot_pages()
+                    yield next(pages)
+                    raise ConnectionError("coupure")
+                node_b._iter_snapshot_pages = broken_pages
+                db_b.install_snapshot([dict(r, uuid=str(uuid.uuid4())) for r in records * 20])
+                self.assertIsNone(node_a.bootstrap("127.0.0.1", port_b))
+                self.assertEqual(len(db_a.get_raw_records()), 3000)
+                del node_b._iter_snapshot_pages
+
+                # Démarrage d'un vault vide : bootstrap automatique
+                db_c = DBManager("test_boot_c.json")
+                node_c = NetworkCore("Node_C", "127.0.0.1", 0, [{"ip": "127.0.0.1", "port": port_b}],
+                                     db_c.process_gossip_update, db_c.get_raw_records,
+                                     install_snapshot_callback=db_c.install_snapshot)
+                node_c.request_sync()
+                for _ in range(200):
+                    if len(db_c.get_raw_records()) == 63000:
+                        break
+                    time.sleep(0.05)
+                self.assertEqual(len(db_c.get_raw_records()), 63000)
+            finally:
+                node_a.server.server_socket.close()
+                node_b.stop()
+        finally:
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def test_incremental_since_sync(self):
+        """Test de la synchronisation incrémentale par high-water mark persistant"""
+        from unittest.mock import patch
+        from sync.network_core import NetworkCore
+        from sync.peer_state import PeerStateStore
+        from vault.db_manager import DBManager
+        
+        test_db = "test_since.json"
+        replica_db = "test_since_replica.json"
+        state_path = "test_sync_state.json"
+        paths = (test_db, test_db + ".journal", test_db + ".lock", replica_db, replica_db + ".journal", replica_db + ".lock", state_path)
+        for path in paths:
+            if os.path.exists(path): os.remove(path)
+            
+        try:
+            db = DBManager(test_db)
+            for i in range(100):
+                db.process_gossip_update({"uuid": f"uuid-{i}", "updated_at": float(i), "is_deleted": False,
+                                          "ciphertext": "ct", "nonce": "n"})
+            # Index trié par updated_at (y compris après modification d'un ancien record)
+            self.assertEqual([r["uuid"] for r in db.get_records_since(97.0)], ["uuid-98", "uuid-99"])
+            db.process_gossip_update({"uuid": "uuid-5", "updated_at": 150.0, "is_deleted": True, "ciphertext": "ct", "nonce": "n"})
+            self.assertEqual([r["uuid"] for r in db.get_records_since(98.0)], ["uuid-99", "uuid-5"])
+            
+            received = []
+            def apply(record):
+                received.append(record["uuid"])
+                return True
+            
+            node_b = NetworkCore("Node_B", "127.0.0.1", 0, [], lambda r: False, db.get_raw_records,
+                                 get_records_since_callback=db.get_records_since)
+            node_b.start()
+            port_b = node_b.server.server_socket.getsockname()[1]
+            
+            state = PeerStateStore(state_path)
+            state.set_high_water("127.0.0.1", port_b, 95.0)
+            node_a = NetworkCore("Node_A", "127.0.0.1", 0, [], apply, lambda: [], peer_state=state)
+            try:
+                # Seuls les records modifiés après le high-water mark sont transférés (ici en pages de 2 records)
+                with patch("sync.network_core.SYNC_PAGE_SIZE", 2):
+                    self.assertEqual(node_a.sync_since("127.0.0.1", port_b), 5)
+                self.assertEqual(received, ["uuid-96", "uuid-97", "uuid-98", "uuid-99", "uuid-5"])
+                
+                # Le nouveau high-water mark est persisté pour la prochaine reconnexion
+                self.assertEqual(PeerStateStore(state_path).get_high_water("127.0.0.1", port_b), 150.0)
+                self.assertEqual(node_a.sync_since("127.0.0.1", port_b), 0)
+
+                # Connexion coupée avant la dernière page : le high-water mark n'avance pas
+                db.process_gossip_update({"uuid": "after-cut", "updated_at": 200.0, "is_deleted": False, "ciphertext": "ct", "nonce": "n"})
+                def broken_pages(since, page_size):
+                    yield node_b.gossip_logic.build_sync_since_reply([], 200.0, done=False)
+                    raise ConnectionError("coupure")
+                node_b._iter_since_pages = broken_pages
+                self.assertIsNone(node_a.sync_since("127.0.0.1", port_b))
+                self.assertEqual(state.get_high_water("127.0.0.1", port_b), 150.0)
+                del node_b._iter_since_pages
+                self.assertEqual(node_a.sync_since("127.0.0.1", port_b), 1)
+
+                # Record arrivé chez B après le high-water mark mais daté (horloge de l'auteur) d'avant :
+                # SYNC_SINCE ne le voit pas, l'anti-entropie qui suit le rattrape
+                replica = DBManager(replica_db)
+                for record in db.get_raw_records():
+                    replica.process_gossip_update(record)
+                db.process_gossip_update({"uuid": "late", "updated_at": 10.5, "is_deleted": False, "ciphertext": "ct", "nonce": "n"})
+                node_c = NetworkCore("Node_C", "127.0.0.1", 0, [], replica.process_gossip_update, replica.get_raw_records,
+                                     get_sync_digest_callback=replica.get_sync_digest, peer_state=state)
+                self.assertEqual(node_c.sync_since("127.0.0.1", port_b), 0)
+                node_c._sync_with_peer({"ip": "127.0.0.1", "port": port_b})
+                self.assertIsNotNone(replica.get_record("late"))
+                node_c.server.server_socket.close()
+                replica.close()
+            finally:
+                node_b.stop()
+                node_a.server.server_socket.close()
+        finally:
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def test_directed_paginated_sync_request(self):
+        """Test du SYNC_REQUEST paginé : réponse dirigée vers le seul demandeur, avec curseur de reprise"""
+        from sync.network_core import NetworkCore
+        
+        records = [{"uuid": f"uuid-{i:03d}", "updated_at": 1.0, "is_deleted": False, "ciphertext": "ct", "nonce": "n"}
+                   for i in range(300)]
+        received = []
+        broadcasts = []
+        
+        node_b = NetworkCore("Node_B", "127.0.0.1", 0, [{"ip": "127.0.0.1", "port": 1}], lambda r: False, lambda: records)
+        node_b._propagate_to_peers = broadcasts.append
+        node_a = NetworkCore("Node_A", "127.0.0.1", 0, [], lambda r: received.append(r["uuid"]) is None, lambda: [])
+        node_b.start()
+        try:
+            port_b = node_b.server.server_socket.getsockname()[1]
+            self.assertEqual(node_a.full_sync("127.0.0.1", port_b, page_size=50), 300)
+            self.assertEqual(sorted(received), [r["uuid"] for r in records])
+            self.assertEqual(broadcasts, [], "La réponse ne doit pas être diffusée aux autres pairs.")
+            
+            # Pages bornées et reprise après le curseur
+            pages = list(node_b._iter_sync_pages(None, 50))
+            self.assertEqual(len(pages), 6)
+            self.assertTrue(pages[-1]["done"])
+            resumed = list(node_b._iter_sync_pages(pages[3]["cursor"], 50))
+            self.assertEqual(resumed[0]["payload"][0]["uuid"], "uuid-200")
+            self.assertEqual(sum(len(p["payload"]) for p in resumed), 100)
+            
+            # Pair injoignable
+            self.assertIsNone(node_a.full_sync("127.0.0.1", 1))
+        finally:
+            node_b.stop()
+            node_a.server.server_socket.close()
+
+    def test_socket_client_connection_pool(self):
+        """Test des connexions persistantes : plusieurs messages par connexion et reconnexion transparente"""
+        from sync.socket_server import SocketServer
+        from sync.socket_client import SocketClient
+        
+        received = []
+        def on_message(message):
+            received.append(message["n"])
+            return {"ack": message["n"]} if message.get("type") == "PING" else None
+        
+        server = SocketServer("127.0.0.1", 0, on_message, client_timeout=0.3)
+        connections = []
+        handle_client = server._handle_client
+        server._handle_client = lambda sock: connections.append(sock) or handle_client(sock)
+        server.start()
+        client = SocketClient()
+        try:
+            port = server.server_socket.getsockname()[1]
+            for n in range(20):
+                self.assertTrue(client.send_message("127.0.0.1", port, {"type": "GOSSIP_UPDATE", "n": n}))
+            self.assertEqual(client.request("127.0.0.1", port, {"type": "PING", "n": 20}), {"ack": 20})
+            self.assertEqual(received, list(range(21)))
+            self.assertEqual(len(connections), 1, "Tous les messages doivent passer par la même connexion.")
+            
+            # Le serveur ferme la connexion inactive : le client reconnecte sans erreur
+            time.sleep(0.5)
+            self.assertEqual(client.request("127.0.0.1", port, {"type": "PING", "n": 21}), {"ack": 21})
+            self.assertEqual(len(connections), 2)
+        finally:
+            client.close()
+            server.stop()
+
+    def test_length_prefixed_framing(self):
+        """Test du protocole à trames préfixées par leur longueur (gros messages, limite de taille)"""
+        import socket
+        import json
+        from sync.framing import FrameReader, FrameError, encode_frame, FRAME_END, FRAME_MESSAGE
+        from sync.socket_server import SocketServer
+        from sync.socket_client import SocketClient
+        
+        # Plusieurs trames dans un même envoi, dont une plus grande que le buffer initial
+        left, right = socket.socketpair()
+        try:
+            big = b"x" * 200000
+            left.sendall(encode_frame(b'{"a": 1}') + encode_frame(big) + encode_frame(b"", FRAME_END))
+            left.close()
+            reader = FrameReader(right, buffer_size=16)
+            self.assertEqual(reader.read_frame(), (FRAME_MESSAGE, b'{"a": 1}'))
+            self.assertEqual(reader.read_frame(), (FRAME_MESSAGE, big))
+            self.assertEqual(reader.read_frame(), (FRAME_END, b""))
+            self.assertIsNone(reader.read_frame())
+        finally:
+            right.close()
+        
+        # Trame au-delà de la taille max ou d'une version inconnue : rejetée
+        left, right = socket.socketpair()
+        try:
+            left.sendall(encode_frame(b"y" * 100))
+            with self.assertRaises(FrameError):
+                FrameReader(right, max_frame_size=50).read_frame()
+            left.sendall(b"\x07\x00\x00\x00\x00\x00")
+            with self.assertRaises(FrameError):
+                FrameReader(right).read_frame()
+        finally:
+            left.close()
+            right.close()
+        
+        # Un record de plusieurs centaines de Ko traverse le réseau sans troncature
+        server = SocketServer("127.0.0.1", 0, lambda m: {"size": len(m["payload"]["ciphertext"])})
+        server.start()
+        client = SocketClient()
+        try:
+            port = server.server_socket.getsockname()[1]
+            record = {"uuid": "big", "ciphertext": "c" * 500000}
+            self.assertEqual(client.request("127.0.0.1", port, {"type": "GOSSIP_UPDATE", "payload": record}), {"size": 500000})
+            
+            # Compatibilité : message JSON brut d'une ancienne version (sans trame)
+            with socket.create_connection(("127.0.0.1", port)) as sock:
+                sock.sendall(json.dumps({"type": "GOSSIP_UPDATE", "payload": {"ciphertext": ""}}).encode("utf-8"))
+        finally:
+            client.close()
+            server.stop()
+
+    def test_asyncio_network_engine(self):
+        """Test du moteur réseau asyncio : même protocole que le moteur à threads, sans thread par connexion"""
+        import socket
+        import json
+        import threading
+        from sync.network_core import NetworkCore
+        from sync.socket_client import SocketClient
+
+        records = {f"uuid-{i:03d}": {"uuid": f"uuid-{i:03d}", "updated_at": 1.0, "is_deleted": False, "ciphertext": "ct", "nonce": "n"}
+                   for i in range(120)}
+        store_a = {}
+        def apply_a(record):
+            store_a[record["uuid"]] = record
+            return True
+
+        node_b = NetworkCore("Node_B", "127.0.0.1", 0, [], lambda r: r["uuid"] not in records and not records.update({r["uuid"]: r}),
+                             lambda: list(records.values()), engine="asyncio")
+        node_a = NetworkCore("Node_A", "127.0.0.1", 0, [], apply_a, lambda: list(store_a.values()), engine="asyncio")
+        node_b.start()
+        threads_before = threading.active_count()
+        try:
+            port_b = node_b.server.server_socket.getsockname()[1]
+            # Synchronisation paginée et anti-entropie entre deux noeuds asyncio
+            self.assertEqual(node_a.full_sync("127.0.0.1", port_b, page_size=25), 120)
+            self.assertEqual(set(store_a), set(records))
+            self.assertEqual(node_a.anti_entropy("127.0.0.1", port_b), (0, 0))
+
+            # Diffusion vers un pair via sa file d'envoi
+            node_a.peers = [{"ip": "127.0.0.1", "port": port_b}]
+            node_a.trigger_local_update({"uuid": "from-a", "updated_at": 2.0, "is_deleted": False, "ciphertext": "ct", "nonce": "n"})
+            for _ in range(100):
+                if "from-a" in records:
+                    break
+                time.sleep(0.02)
+            self.assertIn("from-a", records)
+
+            # Interopérabilité : client à threads et ancien format JSON brut
+            client = SocketClient()
+            try:
+                reply = client.request("127.0.0.1", port_b, node_a.gossip_logic.build_fetch_request(["uuid-007"]))
+                self.assertEqual([r["uuid"] for r in reply["payload"]], ["uuid-007"])
+            finally:
+                client.close()
+            with socket.create_connection(("127.0.0.1", port_b)) as sock:
+                legacy = {"type": "GOSSIP_UPDATE", "origin_node": "Old", "path_vector": ["Old"],
+                          "payload": {"uuid": "legacy", "updated_at": 3.0, "is_deleted": False, "ciphertext": "ct", "nonce": "n"}}
+                sock.sendall(json.dumps(legacy).encode("utf-8"))
+            for _ in range(100):
+                if "legacy" in records:
+                    break
+                time.sleep(0.02)
+            self.assertIn("legacy", records)
+
+            # Beaucoup de connexions simultanées sur une seule boucle : pas de thread supplémentaire côté serveur
+            sockets = [socket.create_connection(("127.0.0.1", port_b)) for _ in range(200)]
+            try:
+                self.assertLessEqual(threading.active_count(), threads_before + 12)
+            finally:
+                for sock in sockets:
+                    sock.close()
+
+            # Pair injoignable
+            self.assertFalse(node_a.client.send_message("127.0.0.1", 1, {"type": "GOSSIP_UPDATE"}))
+            self.assertIsNone(node_a.full_sync("127.0.0.1", 1))
+
+            # Files d'envoi vidées sur la boucle : pas de thread par pair, même injoignable
+            threads_before = threading.active_count()
+            node_a.peers = [{"ip": "127.0.0.1", "port": p} for p in range(1, 31)]
+            node_a.trigger_local_update({"uuid": "to-dead", "updated_at": 4.0, "is_deleted": False, "ciphertext": "ct", "nonce": "n"})
+            for _ in range(100):
+                if all(outbox.stats["retries"] for outbox in node_a._outboxes.values()):
+                    break
+                time.sleep(0.02)
+            self.assertEqual(len(node_a._outboxes), 31)
+            self.assertLessEqual(threading.active_count(), threads_before + 8)
+        finally:
+            node_a.stop()
+            node_b.stop()
+
+        with self.assertRaises(ValueError):
+            NetworkCore("Node_X", "127.0.0.1", 0, [], lambda r: False, lambda: [], engine="fibers")
+
+    def test_binary_wire_format(self):
+        """Test du format binaire : records en colonnes, compression, négociation par connexion et repli JSON"""
+        import base64
+        import json
+        import uuid
+        from sync.network_core import NetworkCore
+        from sync.socket_client import SocketClient
+        from sync.socket_server import SocketServer
+        from sync.framing import FrameError
+        from sync.wire_format import WireFormat, encode_binary, decode_binary
+
+        records = [{"uuid": str(uuid.uuid4()), "updated_at": 1000.0 + i, "is_deleted": i % 7 == 0,
+                    "nonce": base64.b64encode(os.urandom(16)).decode(), "ciphertext": base64.b64encode(os.urandom(40 + i)).decode()}
+                   for i in range(50)]
+        # Records non standard (champ en plus, timestamp entier, base64 non canonique) : transmis tels quels
+        odd = [dict(records[0], extra="x"), dict(records[1], updated_at=5), dict(records[2], nonce="n")]
+        logic = GossipLogic("Node_A")
+        for compression in (None, "zlib"):
+            for message in (logic.build_gossip_batch(records + odd), logic.build_gossip_message(records[3]),
+                            logic.build_sync_page([], None, True), logic.build_merkle_query(["", "a"])):
+                self.assertEqual(decode_binary(encode_binary(message, compression)), message)
+        batch = logic.build_gossip_batch(records)
+        self.assertLess(len(encode_binary(batch)), 0.6 * len(json.dumps(batch)))
+        with self.assertRaises(FrameError):
+            decode_binary(encode_binary(batch)[:-10])
+
+        class LegacyServer(SocketServer):
+            """Serveur d'une ancienne version : le WIRE_HELLO est un message inconnu, transmis au callback."""
+            def _decode(self, kind, data):
+                message = super()._decode(kind, data)
+                if message.get("type") == "WIRE_HELLO":
+                    message["type"] = "UNKNOWN"
+                return message
+
+        for engine in ("threads", "asyncio"):
+            store = {}
+            node_b = NetworkCore("Node_B", "127.0.0.1", 0, [], lambda r: store.update({r["uuid"]: r}) or True,
+                                 lambda: list(store.values()), engine=engine)
+            node_a = NetworkCore("Node_A", "127.0.0.1", 0, [], lambda r: True, lambda: records, engine=engine,
+                                 wire_format="binary+zlib")
+            node_b.start()
+            try:
+                port_b = node_b.server.server_socket.getsockname()[1]
+                self.assertEqual(node_a.anti_entropy("127.0.0.1", port_b), (0, 50))
+                for _ in range(100):
+                    if len(store) == 50:
+                        break
+                    time.sleep(0.02)
+                self.assertEqual(sorted(store.values(), key=lambda r: r["updated_at"]), records)
+                reply = node_a.client.request("127.0.0.1", port_b, logic.build_fetch_request([records[5]["uuid"]]))
+                self.assertEqual(reply["payload"], [records[5]])
+                wire = node_a.client._pools[("127.0.0.1", port_b)][0][2]
+                self.assertEqual((wire.binary, wire.compression), (True, "zlib"))
+            finally:
+                node_a.stop()
+                node_b.stop()
+
+        # Pair d'une ancienne version : la connexion reste en JSON
+        received = []
+        legacy = LegacyServer("127.0.0.1", 0, lambda m: received.append(m) or None)
+        legacy.start()
+        client = SocketClient()
+        try:
+            port = legacy.server_socket.getsockname()[1]
+            self.assertTrue(client.send_message("127.0.0.1", port, batch))
+            self.assertEqual([m["type"] for m in received], ["UNKNOWN", "GOSSIP_BATCH"])
+            self.assertEqual(received[1], batch)
+            (_, _, wire, _), = client._pools[("127.0.0.1", port)]
+            self.assertFalse(wire.binary)
+        finally:
+            client.close()
+            legacy.stop()
+
+        with self.assertRaises(ValueError):
+            SocketClient(wire_format="xml")
+
+    def test_peer_outbox_coalescing_and_retry(self):
+        """Test de la file d'envoi bornée par pair : fusion par uuid, backoff après échec, file pleine"""
+        import threading
+        from sync.outbound_queue import PeerOutbox
+
+        logic = GossipLogic("Node_A")
+        sent = []
+        online = threading.Event()
+        def send(ip, port, message):
+            if not online.is_set():
+                return False
+            sent.append(message)
+            return True
+
+        outbox = PeerOutbox("127.0.0.1", 5001, send, logic, max_pending=100, base_backoff=0.05)
+        try:
+            # Pair hors ligne : 5000 mises à jour sur 10 uuids ne gardent que 10 entrées, sans nouveau thread
+            threads_before = threading.active_count()
+            for i in range(5000):
+                outbox.enqueue(logic.build_gossip_message({"uuid": f"uuid-{i % 10}", "updated_at": float(i)}))
+            self.assertLessEqual(threading.active_count(), threads_before + 1)
+            time.sleep(0.1)
+            self.assertEqual(len(outbox), 10)
+            self.assertGreaterEqual(outbox.stats["retries"], 1)
+
+            # Retour du pair : un seul lot, avec la version la plus récente de chaque uuid
+            online.set()
+            outbox.wake()
+            for _ in range(100):
+                if sent:
+                    break
+                time.sleep(0.02)
+            self.assertEqual(len(sent), 1)
+            self.assertEqual(sent[0]["type"], "GOSSIP_BATCH")
+            self.assertEqual(sorted(r["updated_at"] for r in sent[0]["payload"]), [float(4990 + i) for i in range(10)])
+            self.assertEqual(outbox.stats["sent"], 10)
+        finally:
+            outbox.close()
+
+        # File pleine : abandon des plus anciennes, ou refus des nouvelles
+        online.clear()
+        for policy, kept in (("drop_oldest", "uuid-9"), ("drop_newest", "uuid-0")):
+            outbox = PeerOutbox("127.0.0.1", 5001, send, logic, max_pending=5, overflow=policy, max_batch=1, base_backoff=10.0)
+            try:
+                for i in range(10):
+                    outbox.enqueue(logic.build_gossip_message({"uuid": f"uuid-{i}", "updated_at": 1.0}))
+                time.sleep(0.05)
+                self.assertLessEqual(len(outbox), 5)
+                self.assertGreaterEqual(outbox.stats["dropped"], 5)
+                self.assertIn(kept, [key for key in outbox._pending])
+            finally:
+                outbox.close()
+
+    def test_hinted_handoff(self):
+        """Test du hinted handoff : updates non délivrées persistées par uuid puis rejouées en bloc"""
+        import threading
+        from sync.hint_store import HintStore
+        from sync.outbound_queue import PeerOutbox
+
+        hints_path = "test_hints.json"
+        for path in (hints_path, hints_path + ".tmp"):
+            if os.path.exists(path): os.remove(path)
+
+        logic = GossipLogic("Node_A")
+        vault = {}
+        sent = []
+        online = threading.Event()
+        def send(ip, port, message):
+            if not online.is_set():
+                return False
+            sent.append(message)
+            return True
+        fetch = lambda uuids: [vault[u] for u in uuids if u in vault]
+
+        try:
+            hints = HintStore(hints_path)
+            saves = []
+            save = hints._save
+            hints._save = lambda: (saves.append(1), save())
+            outbox = PeerOutbox("127.0.0.1", 5001, send, logic, base_backoff=0.05, hints=hints, fetch_records=fetch)
+            try:
+                # Pair hors ligne : 1000 updates sur 50 uuids -> 50 hints, file mémoire vide
+                for i in range(1000):
+                    vault[f"uuid-{i % 50}"] = {"uuid": f"uuid-{i % 50}", "updated_at": float(i)}
+                    outbox.enqueue(logic.build_gossip_message(vault[f"uuid-{i % 50}"]))
+                for _ in range(100):
+                    if hints.count("127.0.0.1", 5001) == 50 and len(outbox) == 0:
+                        break
+                    time.sleep(0.02)
+                self.assertEqual(len(outbox), 0)
+            finally:
+                outbox.close()
+            # Écritures regroupées : hints.json est réécrit à la fermeture, pas à chaque ajout
+            hints.close()
+            self.assertLessEqual(len(saves), 2)
+
+            # Redémarrage : les hints sont relus depuis le disque puis rejoués en bloc au retour du pair
+            hints = HintStore(hints_path)
+            self.assertEqual(hints.count("127.0.0.1", 5001), 50)
+            self.assertEqual(hints.peers(), [("127.0.0.1", 5001)])
+            online.set()
+            outbox = PeerOutbox("127.0.0.1", 5001, send, logic, hints=hints, fetch_records=fetch)
+            try:
+                outbox.wake()
+                for _ in range(100):
+                    if hints.count("127.0.0.1", 5001) == 0:
+                        break
+                    time.sleep(0.02)
+                self.assertEqual(hints.count("127.0.0.1", 5001), 0)
+                self.assertEqual(len(sent), 1)
+                self.assertEqual(sent[0]["type"], "GOSSIP_BATCH")
+                self.assertEqual(sorted(r["updated_at"] for r in sent[0]["payload"]), [float(950 + i) for i in range(50)])
+            finally:
+                outbox.close()
+                hints.close()
+            self.assertEqual(HintStore(hints_path).peers(), [])
+
+            # Arrêt avec des records encore en file : ils passent dans les hints au lieu d'être perdus
+            sending = threading.Event()
+            release = threading.Event()
+            def slow_send(ip, port, message):
+                sending.set()
+                release.wait(2.0)
+                return True
+            hints = HintStore(hints_path)
+            outbox = PeerOutbox("127.0.0.1", 5001, slow_send, logic, hints=hints, fetch_records=fetch)
+            try:
+                outbox.enqueue(logic.build_gossip_message(vault["uuid-0"]))
+                self.assertTrue(sending.wait(2.0))
+                for i in range(1, 4):
+                    outbox.enqueue(logic.build_gossip_message(vault[f"uuid-{i}"]))
+                outbox.close()
+                self.assertEqual(sorted(hints.get("127.0.0.1", 5001)), ["uuid-1", "uuid-2", "uuid-3"])
+            finally:
+                release.set()
+                hints.close()
+        finally:
+            for path in (hints_path, hints_path + ".tmp"):
+                if os.path.exists(path): os.remove(path)
+
+    def test_swim_membership(self):
+        """Test du membership SWIM : découverte par gossip, suspicion puis mort d'un pair, réfutation"""
+        from sync.network_core import NetworkCore
+        from sync.membership import Membership, ALIVE, SUSPECT, DEAD
+
+        # Règles de précédence et réfutation d'une suspicion à notre sujet
+        members = Membership("Node_X", "127.0.0.1", 7000, [{"ip": "127.0.0.1", "port": 7001}], GossipLogic("Node_X"), lambda *a, **k: None)
+        self.assertTrue(members.apply_update({"ip": "127.0.0.1", "port": 7001, "state": SUSPECT, "incarnation": 0.0}))
+        self.assertFalse(members.apply_update({"ip": "127.0.0.1", "port": 7001, "state": ALIVE, "incarnation": 0.0}))
+        self.assertTrue(members.apply_update({"ip": "127.0.0.1", "port": 7001, "state": ALIVE, "incarnation": 1.0}))
+        self.assertTrue(members.apply_update({"ip": "127.0.0.1", "port": 7001, "state": DEAD, "incarnation": 1.0}))
+        self.assertEqual(members.peers(), [])
+        incarnation = members.incarnation
+        members.apply_update({"ip": "127.0.0.1", "port": 7000, "state": SUSPECT, "incarnation": incarnation})
+        self.assertGreater(members.incarnation, incarnation)
+
+        # Point d'entrée configuré par son nom d'hôte : le même noeud annoncé par son IP n'est pas un second membre
+        hosts = {"node-b": "10.0.0.2"}
+        members = Membership("Node_X", "10.0.0.1", 7000, [{"ip": "node-b", "port": 7001}], GossipLogic("Node_X"),
+                             lambda *a, **k: None, resolve=lambda ip, port: (hosts.get(ip, ip), port))
+        self.assertTrue(members.apply_update({"ip": "10.0.0.2", "port": 7001, "node_id": "Node_B", "state": ALIVE, "incarnation": 1.0}))
+        self.assertEqual(members.peers(), [{"ip": "10.0.0.2", "port": 7001}])
+        self.assertEqual(members.state_of("node-b", 7001), ALIVE)
+
+        def make_node(name, seeds):
+            node = NetworkCore(name, "127.0.0.1", 0, seeds, lambda r: True, lambda: [], membership=True, probe_interval=0.05)
+            node.membership.probe_timeout = 0.2
+            node.membership.suspect_timeout = 0.3
+            return node
+
+        node_b = make_node("Node_B", [])
+        node_b.start()
+        port_b = node_b.server.server_socket.getsockname()[1]
+        # A désigne B par son nom d'hôte, B s'annonce par son IP
+        node_a = make_node("Node_A", [{"ip": "localhost", "port": port_b}])
+        node_c = make_node("Node_C", [{"ip": "127.0.0.1", "port": port_b}])
+        node_a.start()
+        node_c.start()
+        port_c = node_c.server.server_socket.getsockname()[1]
+
+        # Délais dérivés des paramètres SWIM (marge x10 pour les machines chargées) plutôt qu'un nombre fixe d'essais :
+        # une ronde de sondage dure au pire probe_interval + probe_timeout (PING) + 2 * probe_timeout (PING_REQ)
+        swim = node_a.membership
+        probe_round = swim.probe_interval + 3 * swim.probe_timeout
+        def wait_for_state(port, state, rounds):
+            deadline = time.monotonic() + 10 * (rounds * probe_round + swim.suspect_timeout)
+            while time.monotonic() < deadline and swim.state_of("127.0.0.1", port) != state:
+                time.sleep(swim.probe_interval)
+            return swim.state_of("127.0.0.1", port)
+        try:
+            # A ne connaît que B : il découvre C par gossip (quelques rondes de piggyback)
+            self.assertEqual(wait_for_state(port_c, ALIVE, 3), ALIVE)
+            self.assertEqual(sorted(peer["port"] for peer in node_a.membership.peers()), sorted([port_b, port_c]))
+
+            # C s'arrête : suspect puis mort, et la diffusion ne le contacte plus (mises à jour en hints).
+            # Sondé au plus une ronde sur deux (B et C), C est suspecté puis déclaré mort après suspect_timeout
+            node_c.stop()
+            self.assertEqual(wait_for_state(port_c, DEAD, 3), DEAD)
+            self.assertEqual(node_a.membership.peers(), [{"ip": "127.0.0.1", "port": port_b}])
+            node_a.trigger_local_update({"uuid": "after-c-died", "updated_at": 1.0})
+            self.assertEqual(node_a.hint_store.get("127.0.0.1", port_c), {"after-c-died": 1.0})
+        finally:
+            node_a.stop()
+            node_b.stop()
+            node_c.stop()
+
+    def test_context_checker_cache(self):
+        """Test du cache du BSSID : TTL, invalidation, relecture en arrière-plan, pas de cache pour ttl=0"""
+        from vault.context_checker import ContextChecker
+        import hashlib
+
+        mock_bssid = os.environ.pop('P2P_MOCK_BSSID', None)
+        allowed = [hashlib.sha256(b"AA:BB:CC:DD:EE:FF").hexdigest()]
+        reads = []
+        def fake_reader(bssid):
+            def read():
+                reads.append(bssid)
+                return bssid
+            return read
+
+        try:
+            checker = ContextChecker(allowed, cache_ttl=60)
+            checker._get_bssid_linux = fake_reader("AA:BB:CC:DD:EE:FF")
+            self.assertTrue(all(checker.is_context_valid() for _ in range(5)))
+            self.assertEqual(len(reads), 1) # Un seul fork pour 5 opérations
+
+            # Changement de réseau (événement rtnetlink) : relu immédiatement
+            checker._get_bssid_linux = fake_reader("11:22:33:44:55:66")
+            checker.invalidate()
+            self.assertFalse(checker.is_context_valid())
+            self.assertEqual(len(reads), 2)
+            checker.close()
+
+            # TTL court : le thread de fond relit le BSSID avant expiration tant que le vault est utilisé
+            checker = ContextChecker(allowed, cache_ttl=0.2)
+            checker._get_bssid_linux = fake_reader("AA:BB:CC:DD:EE:FF")
+            self.assertTrue(checker.is_context_valid())
+            reads.clear()
+            time.sleep(0.5)
+            self.assertGreaterEqual(len(reads), 1)
+            checker.close()
+
+            # ttl=0 : relecture à chaque vérification, sans thread
+            checker = ContextChecker(allowed, cache_ttl=0)
+            checker._get_bssid_linux = fake_reader("AA:BB:CC:DD:EE:FF")
+            reads.clear()
+            checker.is_context_valid()
+            checker.is_context_valid()
+            self.assertEqual(len(reads), 2)
+            self.assertIsNone(checker._watcher_stop)
+        finally:
+            if mock_bssid is not None:
+                os.environ['P2P_MOCK_BSSID'] = mock_bssid
+
     def test_vault_core_crud(self):
         """Test de la logique métier Ajout / Liste / Suppression logicielle du Vault"""
         from vault.vault_core import VaultCore
@@ -97,18 +1064,247 @@ class TestP2PSafeGuard(unittest.TestCase):
             secrets_after = vault.get_all_secrets_decrypted()
             self.assertEqual(len(secrets_after), 1, "Le secret supprimé ne doit plus être listé.")
             self.assertEqual(secrets_after[0]["service"], "Github")
-            
+
         finally:
             # Nettoyage
-            if os.path.exists(test_db):
-                os.remove(test_db)
+            for path in (test_db, test_db + ".journal", test_db + ".lock"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def test_vault_decrypted_cache(self):
+        """Test du cache des secrets déchiffrés : invalidation par updated_at, borne de taille, effacement au verrouillage"""
+        from vault.vault_core import VaultCore
+        import hashlib
+        import time
+
+        os.environ['P2P_MOCK_BSSID'] = "TEST_BSSID"
+        mock_hash = hashlib.sha256(b"TEST_BSSID").hexdigest()
+        test_db = "test_cache_vault.json"
+        for path in (test_db, test_db + ".journal", test_db + ".lock"):
+            if os.path.exists(path): os.remove(path)
+
+        try:
+            vault = VaultCore("test_pwd", allowed_bssids_hashes=[mock_hash], db_path=test_db, decrypted_cache_size=3)
+            for i in range(3):
+                vault.add_or_update_secret(f"Service{i}", "milo", f"pwd{i}", "")
+
+            decrypted = []
+            original_decrypt_many = vault.crypto_service.decrypt_many
+            def counting_decrypt_many(items):
+                decrypted.extend(items)
+                return original_decrypt_many(items)
+            vault.crypto_service.decrypt_many = counting_decrypt_many
+
+            # Les secrets ajoutés localement sont déjà en cache : aucun déchiffrement
+            secrets = vault.get_all_secrets_decrypted()
+            self.assertEqual(sorted(s["password"] for s in secrets), ["pwd0", "pwd1", "pwd2"])
+            self.assertEqual(len(decrypted), 0)
+            # Modifier le résultat ne corrompt pas le cache
+            secrets[0]["password"] = "modifié"
+            self.assertNotIn("modifié", [s["password"] for s in vault.get_all_secrets_decrypted()])
+
+            # Mise à jour reçue par Gossip (nouvel updated_at) : seul ce record est déchiffré à nouveau
+            target = next(s for s in secrets if s["service"] == "Service1")["_uuid"]
+            ciphertext, nonce = vault.crypto_service.encrypt('{"service": "Service1", "username": "milo", "password": "remote", "notes": ""}')
+            self.assertTrue(vault.apply_remote_gossip({"uuid": target, "updated_at": time.time() + 10, "is_deleted": False,
+                                                       "ciphertext": ciphertext, "nonce": nonce}))
+            vault.flush()
+            secrets = vault.get_all_secrets_decrypted()
+            self.assertIn("remote", [s["password"] for s in secrets])
+            self.assertEqual(len(decrypted), 1)
+
+            # Taille bornée : un 4e secret évince le moins récemment utilisé
+            vault.add_or_update_secret("Service3", "milo", "pwd3", "")
+            self.assertEqual(vault.secret_cache.stats["size"], 3)
+            self.assertEqual(len(vault.get_all_secrets_decrypted()), 4)
+            self.assertEqual(len(decrypted), 2)
+            # Listing plus grand que le cache : les entrées restantes ne sont pas évincées une à une
+            vault.get_all_secrets_decrypted()
+            self.assertEqual(len(decrypted), 3)
+
+            # Suppression : l'entrée est retirée du cache
+            vault.delete_secret(target)
+            self.assertEqual(len(vault.get_all_secrets_decrypted()), 3)
+
+            # Verrouillage ou contexte invalide : le cache est vidé
+            vault.lock()
+            self.assertEqual(vault.secret_cache.stats["size"], 0)
+            vault.get_all_secrets_decrypted()
+            self.assertEqual(vault.secret_cache.stats["size"], 3)
+            os.environ['P2P_MOCK_BSSID'] = "OTHER_BSSID"
+            self.assertEqual(vault.get_all_secrets_decrypted(), [])
+            self.assertEqual(vault.secret_cache.stats["size"], 0)
+        finally:
+            os.environ['P2P_MOCK_BSSID'] = "TEST_BSSID"
+            for path in (test_db, test_db + ".journal", test_db + ".lock"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def test_blind_index_search(self):
+        """Test de l'index aveugle : recherche sans déchiffrer tout le vault, réplication, backends JSON et SQLite"""
+        from vault.vault_core import VaultCore
+        import hashlib
+
+        os.environ['P2P_MOCK_BSSID'] = "TEST_BSSID"
+        mock_hash = hashlib.sha256(b"TEST_BSSID").hexdigest()
+        json_db = "test_blind.json"
+        sqlite_db = "test_blind.db"
+        paths = (json_db, json_db + ".journal", json_db + ".lock", sqlite_db, sqlite_db + "-wal", sqlite_db + "-shm")
+        for path in paths:
+            if os.path.exists(path): os.remove(path)
+
+        try:
+            # Secrets créés avant l'activation de l'index : indexés au démarrage suivant
+            legacy = VaultCore("test_pwd", allowed_bssids_hashes=[mock_hash], db_path=json_db)
+            legacy.add_or_update_secret("Twitter", "milo", "abc", "")
+            legacy.db_manager.close()
+
+            vault = VaultCore("test_pwd", allowed_bssids_hashes=[mock_hash], db_path=json_db, blind_index=True)
+            self.assertEqual(vault.rebuild_blind_index(), 1)
+            self.assertEqual(vault.rebuild_blind_index(), 0)
+            vault.add_or_update_secret("GitHub", "milo", "123", "")
+            vault.add_or_update_secret("GitLab", "Alice Martin", "456", "")
+            vault.add_or_update_secret("Old", "bob", "789", "")
+            vault.delete_secret(next(s["_uuid"] for s in vault.search_secrets("old")))
+
+            # Les jetons sont opaques : rien du texte clair n'est stocké
+            records = vault.db_manager.get_all_records()
+            self.assertTrue(all(r["blind_index"] for r in records))
+            self.assertFalse(any("git" in token for r in records for token in r["blind_index"]))
+
+            decrypted = []
+            original_decrypt_many = vault.crypto_service.decrypt_many
+            def counting_decrypt_many(items):
+                decrypted.extend(items)
+                return original_decrypt_many(items)
+            vault.crypto_service.decrypt_many = counting_decrypt_many
+            vault.lock()
+
+            # Seuls les records correspondants sont déchiffrés
+            self.assertEqual(sorted(s["service"] for s in vault.search_secrets("GIT")), ["GitHub", "GitLab"])
+            self.assertEqual(len(decrypted), 2)
+            self.assertEqual([s["service"] for s in vault.search_secrets("alice  mar")], ["GitLab"])
+            self.assertEqual(sorted(s["service"] for s in vault.search_secrets("mi")), ["GitHub", "Twitter"]) # Préfixe
+            self.assertEqual(vault.search_secrets("lab milo"), [])
+            self.assertEqual(vault.search_secrets("bob"), []) # Supprimé
+            vault.lock()
+            decrypted.clear()
+            self.assertEqual(vault.search_secrets("xyz"), [])
+            self.assertEqual(len(decrypted), 0)
+
+            # Répliqué avec le record : un pair (backend SQLite) retrouve les secrets avec son propre index inversé
+            peer = VaultCore("test_pwd", allowed_bssids_hashes=[mock_hash], db_path=sqlite_db, blind_index=True)
+            for record in vault.db_manager.get_raw_records():
+                peer.apply_remote_gossip(record)
+            peer.flush()
+            self.assertEqual(sorted(s["service"] for s in peer.search_secrets("hub")), ["GitHub"])
+            self.assertEqual(peer.search_secrets("bob"), [])
+            # Une mise à jour retire les anciens jetons
+            gitlab = next(s for s in peer.search_secrets("gitlab"))
+            peer.add_or_update_secret("Gitea", "alice", "456", "", record_uuid=gitlab["_uuid"])
+            self.assertEqual(peer.search_secrets("gitlab"), [])
+            self.assertEqual([s["service"] for s in peer.search_secrets("gitea")], ["Gitea"])
+            peer.db_manager.close()
+        finally:
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def test_fuzzy_search(self):
+        """Test de la recherche approximative : fautes de frappe, classement, mise à jour incrémentale de l'index"""
+        from vault.vault_core import VaultCore
+        from vault.db_manager import DBManager
+        import hashlib
+        import time
+
+        os.environ['P2P_MOCK_BSSID'] = "TEST_BSSID"
+        mock_hash = hashlib.sha256(b"TEST_BSSID").hexdigest()
+        test_db = "test_fuzzy_vault.json"
+        for path in (test_db, test_db + ".journal", test_db + ".lock"):
+            if os.path.exists(path): os.remove(path)
+
+        try:
+            vault = VaultCore("test_pwd", allowed_bssids_hashes=[mock_hash], db_path=test_db)
+            vault.add_or_update_secret("Netflix", "milo@example.com", "abc", "")
+            vault.add_or_update_secret("Banque", "milo", "def", "voir aussi netflix")
+            vault.add_or_update_secret("GitHub", "alice", "ghi", "")
+            vault.lock()
+
+            decrypted = []
+            original_decrypt_many = vault.crypto_service.decrypt_many
+            def counting_decrypt_many(items):
+                decrypted.extend(items)
+                return original_decrypt_many(items)
+            vault.crypto_service.decrypt_many = counting_decrypt_many
+
+            # Faute de frappe tolérée ; le service est mieux classé que les notes
+            found = vault.fuzzy_search("netflx")
+            self.assertEqual([s["service"] for s in found], ["Netflix", "Banque"])
+            self.assertGreater(found[0]["_score"], found[1]["_score"])
+            self.assertEqual([s["service"] for s in vault.fuzzy_search("gihtub")], ["GitHub"])
+            self.assertEqual(vault.fuzzy_search("zzzz"), [])
+            self.assertEqual(len(decrypted), 3) # Index construit une seule fois
+
+            # Ajout, modification et suppression locales : index à jour sans déchiffrement
+            vault.add_or_update_secret("Gitea", "alice", "jkl", "")
+            github = vault.fuzzy_search("github")[0]
+            vault.add_or_update_secret("GitHub Entreprise", "alice", "ghi", "", record_uuid=github["_uuid"])
+            self.assertEqual(vault.fuzzy_search("entreprise")[0]["_uuid"], github["_uuid"])
+            vault.delete_secret(github["_uuid"])
+            self.assertNotIn(github["_uuid"], [s["_uuid"] for s in vault.fuzzy_search("github")])
+            self.assertEqual(len(decrypted), 3)
+
+            # Gossip appliqué : seul le record reçu est déchiffré avant la recherche suivante
+            banque = vault.fuzzy_search("banque")[0]
+            ciphertext, nonce = vault.crypto_service.encrypt('{"service": "Banque Postale", "username": "milo", "password": "x", "notes": ""}')
+            self.assertTrue(vault.apply_remote_gossip({"uuid": banque["_uuid"], "updated_at": time.time() + 10, "is_deleted": False,
+                                                       "ciphertext": ciphertext, "nonce": nonce}))
+            vault.flush()
+            self.assertEqual(vault.fuzzy_search("postale")[0]["_uuid"], banque["_uuid"])
+            self.assertEqual(len(decrypted), 4)
+
+            # Sans écriture d'un autre processus, une recherche ne parcourt pas le vault
+            digests = []
+            get_sync_digest = vault.db_manager.get_sync_digest
+            vault.db_manager.get_sync_digest = lambda: digests.append(1) or get_sync_digest()
+            vault.add_or_update_secret("Gitea", "alice", "jkl", "")
+            for _ in range(3):
+                vault.fuzzy_search("gitea")
+            self.assertEqual(digests, [])
+
+            # Écritures d'un autre processus (le daemon pendant une session --cli) : rattrapées avant la recherche
+            other = DBManager(test_db)
+            ciphertext, nonce = vault.crypto_service.encrypt('{"service": "Daemon Mail", "username": "bob", "password": "y", "notes": ""}')
+            other.process_gossip_update({"uuid": "from-daemon", "updated_at": time.time() + 20, "is_deleted": False,
+                                         "ciphertext": ciphertext, "nonce": nonce})
+            netflix = vault.fuzzy_search("netflix")[0]
+            other.upsert_record_local(netflix["_uuid"], "", "", is_deleted=True)
+            other.flush()
+            self.assertEqual([s["_uuid"] for s in vault.fuzzy_search("daemon mail")], ["from-daemon"])
+            self.assertNotIn(netflix["_uuid"], [s["_uuid"] for s in vault.fuzzy_search("netflix")])
+            self.assertEqual(len(decrypted), 5) # Seul le record ajouté est déchiffré, ni le tombstone ni les autres
+            self.assertEqual(len(digests), 1)
+            other.close()
+
+            # Verrouillage ou contexte invalide : l'index est effacé
+            vault.lock()
+            self.assertEqual(len(vault.fuzzy_index), 0)
+            os.environ['P2P_MOCK_BSSID'] = "OTHER_BSSID"
+            self.assertEqual(vault.fuzzy_search("netflix"), [])
+            self.assertFalse(vault.fuzzy_index.built)
+        finally:
+            os.environ['P2P_MOCK_BSSID'] = "TEST_BSSID"
+            for path in (test_db, test_db + ".journal", test_db + ".lock"):
+                if os.path.exists(path):
+                    os.remove(path)
 
     def test_db_manager_lww(self):
         """Test de la résolution de conflits par Timestamp (Last Write Wins)"""
         from vault.db_manager import DBManager
         
         test_db = "test_lww.json"
-        if os.path.exists(test_db): os.remove(test_db)
+        for path in (test_db, test_db + ".journal", test_db + ".lock"):
+            if os.path.exists(path): os.remove(path)
             
         try:
             db = DBManager(test_db)
@@ -151,9 +1347,308 @@ class TestP2PSafeGuard(unittest.TestCase):
             updated = db.get_record(record_id)
             self.assertEqual(updated["ciphertext"], "ciphertext_v2")
             
+            # Écriture des records distants en attente (write-behind) avant le nettoyage
+            db.close()
+            
+        finally:
+            for path in (test_db, test_db + ".journal", test_db + ".lock"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def test_db_manager_index_and_reload(self):
+        """Test de l'index en mémoire et du rechargement uniquement si le fichier a changé"""
+        from vault.db_manager import DBManager
+        import json
+        
+        test_db = "test_index.json"
+        if os.path.exists(test_db): os.remove(test_db)
+            
+        try:
+            db = DBManager(test_db)
+            db.upsert_record_local("uuid-1", "ct1", "n1")
+            db.upsert_record_local("uuid-2", "ct2", "n2")
+            
+            # Aucun re-parse si le fichier n'a pas été modifié par un autre processus
+            loaded_data = db.backend.data
+            self.assertEqual(db.get_record("uuid-2")["ciphertext"], "ct2")
+            self.assertIs(db.backend.data, loaded_data)
+            
+            # Écriture par un "autre processus" (CLI vs Daemon) -> rechargement
+            other = DBManager(test_db)
+            time.sleep(0.01)
+            other.upsert_record_local("uuid-3", "ct3", "n3")
+            self.assertEqual(db.get_record("uuid-3")["ciphertext"], "ct3")
+            self.assertEqual(len(db.get_raw_records()), 3)
+            
+            # Un nouveau processus retrouve les 3 records (snapshot + journal rejoué)
+            self.assertEqual(len(DBManager(test_db).get_raw_records()), 3)
+        finally:
+            for path in (test_db, test_db + ".journal", test_db + ".lock"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def test_db_manager_journal_compaction(self):
+        """Test du journal append-only, de sa compaction dans le snapshot et du verrou inter-processus"""
+        from vault.db_manager import DBManager
+        from vault.json_backend import JsonJournalBackend
+        from vault import json_backend
+        import threading
+        import json
+        
+        test_db = "test_journal.json"
+        journal = test_db + ".journal"
+        for path in (test_db, journal, test_db + ".lock"):
+            if os.path.exists(path): os.remove(path)
+            
+        try:
+            db = DBManager(test_db, backend=JsonJournalBackend(test_db, compaction_threshold=10**6))
+            snapshot_size = os.path.getsize(test_db)
+            
+            # Chaque upsert ajoute une ligne au journal sans réécrire le snapshot
+            db.upsert_record_local("uuid-1", "ct1", "n1")
+            db.upsert_record_local("uuid-1", "ct1-bis", "n1")
+            db.upsert_record_local("uuid-2", "ct2", "n2", is_deleted=True)
+            self.assertEqual(os.path.getsize(test_db), snapshot_size)
+            with open(journal, "rb") as f:
+                self.assertEqual(len(f.read().splitlines()), 3)
+            
+            # Une ligne tronquée (crash pendant l'écriture) est ignorée au rejeu
+            with open(journal, "ab") as f:
+                f.write(b'{"uuid": "uuid-3", "upd')
+            replayed = DBManager(test_db)
+            self.assertEqual(replayed.get_record("uuid-1")["ciphertext"], "ct1-bis")
+            self.assertTrue(replayed.get_record("uuid-2")["is_deleted"])
+            self.assertIsNone(replayed.get_record("uuid-3"))
+            
+            # La compaction intègre le journal au snapshot et le vide
+            db.compact()
+            with open(test_db, "r") as f:
+                data = json.load(f)
+            self.assertEqual(len(data["records"]), 2)
+            self.assertIn("vault_id", data)
+            self.assertEqual(os.path.getsize(journal), 0)
+            self.assertEqual(DBManager(test_db).get_record("uuid-1")["ciphertext"], "ct1-bis")
+            
+            # LWW conservé après compaction
+            self.assertFalse(db.process_gossip_update({"uuid": "uuid-1", "updated_at": 1.0, "is_deleted": False, "ciphertext": "old", "nonce": "old"}))
+
+            # Verrou inter-processus : une écriture attend la fin d'une compaction tenue par un autre processus
+            if json_backend.fcntl is not None:
+                written = threading.Event()
+                with open(test_db + ".lock", "a") as other_process:
+                    json_backend.fcntl.flock(other_process.fileno(), json_backend.fcntl.LOCK_EX)
+                    writer = threading.Thread(target=lambda: (db.upsert_record_local("uuid-4", "ct4", "n4"), written.set()))
+                    writer.start()
+                    self.assertFalse(written.wait(0.2))
+                    json_backend.fcntl.flock(other_process.fileno(), json_backend.fcntl.LOCK_UN)
+                self.assertTrue(written.wait(2.0))
+                writer.join()
+                self.assertEqual(DBManager(test_db).get_record("uuid-4")["ciphertext"], "ct4")
+        finally:
+            for path in (test_db, journal, test_db + ".lock"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def test_tombstone_gc(self):
+        """Test des tombstones allégés, du GC acquitté par tous les pairs et de la compaction du vault"""
+        from vault.db_manager import DBManager
+        from sync.network_core import NetworkCore
+        from sync.peer_state import PeerStateStore
+        import time
+        import json
+
+        db_a_path = "test_gc_a.json"
+        db_b_path = "test_gc_b.db"
+        paths = (db_a_path, db_a_path + ".journal", db_a_path + ".lock", db_b_path, db_b_path + "-wal", db_b_path + "-shm")
+        for path in paths:
+            if os.path.exists(path): os.remove(path)
+
+        node_b = None
+        try:
+            db_a = DBManager(db_a_path, tombstone_ttl=100)
+            db_b = DBManager(db_b_path, tombstone_ttl=100)
+            old = time.time() - 1000
+
+            # Une suppression locale ne conserve pas le secret chiffré
+            tombstone = db_a.upsert_record_local("uuid-fresh", "ct", "n", is_deleted=True)
+            self.assertEqual((tombstone["ciphertext"], tombstone["nonce"]), ("", ""))
+
+            def record(record_uuid, updated_at, is_deleted=True):
+                return {"uuid": record_uuid, "updated_at": updated_at, "is_deleted": is_deleted,
+                        "ciphertext": "" if is_deleted else "ct", "nonce": "" if is_deleted else "n"}
+            # uuid-acked : tombstone expiré vu par B ; uuid-lagging : B a encore la version active
+            # uuid-gone : B n'a plus rien (déjà purgé) ; uuid-live : secret actif
+            db_a.backend.upsert_many([record("uuid-acked", old), record("uuid-lagging", old), record("uuid-gone", old),
+                                      record("uuid-live", old, is_deleted=False)])
+            db_b.backend.upsert_many([record("uuid-acked", old), record("uuid-lagging", old - 10, is_deleted=False),
+                                      record("uuid-live", old, is_deleted=False)])
+            self.assertEqual(sorted(u for u, _ in db_a.get_expired_tombstones()), ["uuid-acked", "uuid-gone", "uuid-lagging"])
+
+            node_b = NetworkCore("Node_B", "127.0.0.1", 0, [], db_b.process_gossip_update, db_b.get_raw_records,
+                                 get_records_by_uuid_callback=db_b.get_records_by_uuid)
+            node_b.start()
+            port_b = node_b.server.server_socket.getsockname()[1]
+
+            # Un pair injoignable bloque le GC : rien n'est purgé
+            unreachable = NetworkCore("Node_A", "127.0.0.1", 0, [{"ip": "127.0.0.1", "port": port_b}, {"ip": "127.0.0.1", "port": 1}],
+                                      db_a.process_gossip_update, db_a.get_raw_records,
+                                      get_expired_tombstones_callback=db_a.get_expired_tombstones,
+                                      purge_tombstones_callback=db_a.purge_tombstones)
+            self.assertIsNone(unreachable.collect_tombstones())
+            unreachable.client.close()
+            self.assertEqual(len(db_a.get_raw_records()), 5)
+
+            # Un pair connu hors configuration (membre découvert, mort depuis) bloque aussi le GC
+            state = PeerStateStore(None)
+            state.add_known("127.0.0.1", 1)
+            forgotten = NetworkCore("Node_A", "127.0.0.1", 0, [{"ip": "127.0.0.1", "port": port_b}],
+                                    db_a.process_gossip_update, db_a.get_raw_records, peer_state=state,
+                                    get_expired_tombstones_callback=db_a.get_expired_tombstones,
+                                    purge_tombstones_callback=db_a.purge_tombstones)
+            self.assertIsNone(forgotten.collect_tombstones())
+            forgotten.client.close()
+            self.assertEqual(len(db_a.get_raw_records()), 5)
+
+            node_a = NetworkCore("Node_A", "127.0.0.1", 0, [{"ip": "127.0.0.1", "port": port_b}],
+                                 db_a.process_gossip_update, db_a.get_raw_records,
+                                 get_expired_tombstones_callback=db_a.get_expired_tombstones,
+                                 purge_tombstones_callback=db_a.purge_tombstones)
+            try:
+                self.assertEqual(node_a.collect_tombstones(), 2)
+            finally:
+                node_a.client.close()
+            self.assertEqual(sorted(r["uuid"] for r in db_a.get_raw_records()), ["uuid-fresh", "uuid-lagging", "uuid-live"])
+            # Purge réécrite sur disque (snapshot) et visible au rechargement
+            with open(db_a_path, "r") as f:
+                self.assertEqual(len(json.load(f)["records"]), 3)
+            self.assertIsNone(DBManager(db_a_path).get_record("uuid-acked"))
+
+            # Un tombstone expiré renvoyé par un pair qui ne l'a pas encore purgé n'est pas réinséré
+            self.assertFalse(db_a.process_gossip_update(record("uuid-acked", old)))
+            self.assertIsNone(db_a.get_record("uuid-acked"))
+            # ... mais il supprime toujours un secret encore présent
+            self.assertTrue(db_b.process_gossip_update(record("uuid-lagging", old)))
+
+            # Backend SQLite : purge ciblée (uuid, updated_at), un record modifié depuis est conservé
+            self.assertEqual(db_b.purge_tombstones([("uuid-acked", old), ("uuid-lagging", old - 10), ("uuid-live", old)]), 1)
+            self.assertEqual(sorted(r["uuid"] for r in db_b.get_raw_records()), ["uuid-lagging", "uuid-live"])
+
+            # Compaction : un tombstone d'une ancienne version (reçu avec son secret chiffré) est allégé
+            db_a.backend.upsert(dict(record("uuid-legacy", time.time()), ciphertext="old-ct", nonce="old-n"))
+            db_a.compact()
+            self.assertEqual(db_a.get_record("uuid-legacy")["ciphertext"], "")
+            self.assertEqual(os.path.getsize(db_a_path + ".journal"), 0)
+            db_b.compact()
+            self.assertFalse(os.path.exists(db_b_path + "-wal") and os.path.getsize(db_b_path + "-wal") > 0)
+            db_b.close()
+        finally:
+            if node_b is not None:
+                node_b.stop()
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def test_sqlite_backend_and_migration(self):
+        """Test du backend SQLite (LWW conditionnel) et de la migration depuis vault.json"""
+        from vault.db_manager import DBManager
+        from vault.sqlite_backend import migrate_json_to_sqlite
+        
+        json_db = "test_migrate.json"
+        sqlite_db = "test_migrate.db"
+        paths = (json_db, json_db + ".journal", json_db + ".lock", sqlite_db, sqlite_db + "-wal", sqlite_db + "-shm")
+        for path in paths:
+            if os.path.exists(path): os.remove(path)
+            
+        try:
+            source = DBManager(json_db)
+            source.set_password_check("check_ct", "check_nonce")
+            source.upsert_record_local("uuid-1", "ct1", "n1")
+            source.upsert_record_local("uuid-2", "ct2", "n2", is_deleted=True)
+            vault_id = source.backend.get_header("vault_id")
+            
+            self.assertEqual(migrate_json_to_sqlite(json_db, sqlite_db), 2)
+            
+            db = DBManager(sqlite_db)
+            self.assertEqual(db.backend.get_header("vault_id"), vault_id)
+            self.assertEqual(db.get_password_check()["ciphertext"], "check_ct")
+            self.assertEqual(len(db.get_raw_records()), 2)
+            self.assertEqual([r["uuid"] for r in db.get_all_records()], ["uuid-1"])
+            self.assertTrue(db.get_record("uuid-2")["is_deleted"])
+            
+            # LWW : UPSERT conditionnel sur updated_at
+            current = db.get_record("uuid-1")
+            older = dict(current, updated_at=current["updated_at"] - 10, ciphertext="old")
+            newer = dict(current, updated_at=current["updated_at"] + 10, ciphertext="new")
+            self.assertFalse(db.process_gossip_update(older))
+            self.assertTrue(db.process_gossip_update(newer))
+            self.assertFalse(db.process_gossip_update(newer))
+            self.assertTrue(db.process_gossip_update(dict(newer, uuid="uuid-3")))
+            
+            # Un second processus (ex: --cli) voit les écritures sans rechargement complet
+            db.flush()
+            other = DBManager(sqlite_db)
+            self.assertEqual(other.get_record("uuid-1")["ciphertext"], "new")
+            # data_version ne bouge qu'avec les écritures de l'autre connexion
+            version = db.data_version()
+            db.upsert_record_local("uuid-4", "ct", "n")
+            self.assertEqual(db.data_version(), version)
+            other.upsert_record_local("uuid-5", "ct", "n")
+            self.assertNotEqual(db.data_version(), version)
+            other.close()
+            db.close()
+        finally:
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def test_write_behind_group_commit(self):
+        """Test du group commit des records reçus par Gossip (write-behind)"""
+        from vault.db_manager import DBManager
+        
+        test_db = "test_write_behind.json"
+        journal = test_db + ".journal"
+        for path in (test_db, journal, test_db + ".lock"):
+            if os.path.exists(path): os.remove(path)
+            
+        def journal_lines():
+            if not os.path.exists(journal):
+                return 0
+            with open(journal, "rb") as f:
+                return len(f.read().splitlines())
+            
+        try:
+            db = DBManager(test_db, write_batch_size=100, write_batch_window=60)
+            records = [{"uuid": f"uuid-{i}", "updated_at": 100.0, "is_deleted": False,
+                        "ciphertext": f"ct{i}", "nonce": "n"} for i in range(250)]
+            
+            for record in records:
+                self.assertTrue(db.process_gossip_update(record))
+            # 2 lots de 100 écrits, 50 records encore en attente mais visibles (LWW inclus)
+            self.assertEqual(journal_lines(), 200)
+            self.assertEqual(db.get_record("uuid-249")["ciphertext"], "ct249")
+            self.assertFalse(db.process_gossip_update(dict(records[249], updated_at=50.0)))
+            
+            db.flush()
+            self.assertEqual(journal_lines(), 250)
+            self.assertEqual(len(DBManager(test_db).get_raw_records()), 250)
+            
+            # La fenêtre de temps déclenche aussi l'écriture
+            timed = DBManager(test_db, write_batch_size=100, write_batch_window=0.01)
+            timed.process_gossip_update(dict(records[0], updated_at=200.0))
+            time.sleep(0.2)
+            self.assertEqual(journal_lines(), 251)
+            
+            # Mode strict : écriture immédiate
+            strict = DBManager(test_db, durability="strict")
+            strict.process_gossip_update(dict(records[1], updated_at=200.0))
+            self.assertEqual(journal_lines(), 252)
+            
+            with self.assertRaises(ValueError):
+                DBManager(test_db, durability="unknown")
         finally:
-            if os.path.exists(test_db):
-                os.remove(test_db)
+            for path in (test_db, journal, test_db + ".lock"):
+                if os.path.exists(path):
+                    os.remove(path)
 
 if __name__ == "__main__":
     unittest.main()
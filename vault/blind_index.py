@@ -0,0 +1,54 @@
+import hashlib
+import hmac
+import unicodedata
+from typing import List
+
+# Longueur (caractères hexadécimaux) d'un jeton : 48 bits suffisent, une collision n'ajoute qu'un faux positif
+# écarté après déchiffrement
+TOKEN_HEX = 12
+# Taille des n-grammes indexés : une requête d'au moins NGRAM caractères est recherchée par sous-chaîne
+NGRAM = 3
+
+class BlindIndex:
+    """
+    Index aveugle des champs service et username : chaque record porte des jetons HMAC-SHA256
+    (clé dérivée du master password) de ses trigrammes et de ses préfixes de 1 et 2 caractères, normalisés.
+    Une recherche calcule les jetons de la requête et ne déchiffre que les records qui les portent tous.
+    Sans la clé, un jeton ne révèle rien du texte ; un pair voit seulement quels records partagent un n-gramme.
+    """
+
+    def __init__(self, key: bytes):
+        self.key = key
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Forme canonique d'un champ ou d'une requête : NFKC, casse ignorée, espaces réduits."""
+        return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+    def _token(self, kind: str, gram: str) -> str:
+        return hmac.new(self.key, f"{kind}:{gram}".encode("utf-8"), hashlib.sha256).hexdigest()[:TOKEN_HEX]
+
+    def record_tokens(self, *values: str) -> List[str]:
+        """Jetons à stocker avec le record (triés : l'ordre ne trahit pas la position des n-grammes)."""
+        grams = set()
+        for value in map(self.normalize, values):
+            grams.update(("p", value[:n]) for n in range(1, NGRAM) if len(value) >= n)
+            grams.update(("g", value[i:i + NGRAM]) for i in range(len(value) - NGRAM + 1))
+        return sorted({self._token(kind, gram) for kind, gram in grams})
+
+    def query_tokens(self, query: str) -> List[str]:
+        """
+        Jetons qu'un record doit tous porter pour correspondre à `query` : ses trigrammes (recherche par sous-chaîne),
+        ou pour une requête plus courte, son préfixe. Liste vide pour une requête vide.
+        """
+        query = self.normalize(query)
+        if len(query) >= NGRAM:
+            return sorted({self._token("g", query[i:i + NGRAM]) for i in range(len(query) - NGRAM + 1)})
+        return [self._token("p", query)] if query else []
+
+    def matches(self, query: str, *values: str) -> bool:
+        """Vérification exacte après déchiffrement (écarte les faux positifs des jetons)."""
+        query = self.normalize(query)
+        if len(query) >= NGRAM:
+            return any(query in self.normalize(value) for value in values)
+        return any(self.normalize(value).startswith(query) for value in values)
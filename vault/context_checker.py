@@ -1,22 +1,59 @@
 import os
+import select
+import socket
 import subprocess
 import hashlib
+import sys
+import threading
+import time
+from typing import Optional
+
+# Durée (secondes) pendant laquelle un BSSID lu est réutilisé ; 0 relit le BSSID à chaque opération
+DEFAULT_CACHE_TTL = 2.0
+# Groupes rtnetlink surveillés : interface (dont les événements Wi-Fi : association à un autre point d'accès),
+# adresses IPv4/IPv6 et routes IPv4
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+RTMGRP_IPV6_IFADDR = 0x100
 
 class ContextChecker:
     """
     Interface modulaire pour vérifier le contexte (Proof of Location).
     Conçu pour s'adapter à différents OS via des stratégies.
+    Le BSSID lu (iwgetid / netsh : un fork+exec) est gardé `cache_ttl` secondes. Un thread de fond le relit
+    avant expiration tant que le vault est utilisé ; sous Linux, il écoute aussi les événements rtnetlink
+    (changement d'interface, d'adresse ou de route) et invalide le cache dès que le réseau change.
     """
-    def __init__(self, allowed_bssids_hashes):
+    def __init__(self, allowed_bssids_hashes, cache_ttl: float = 0.0):
         self.allowed_bssids_hashes = allowed_bssids_hashes
         self.os_type = os.environ.get('P2P_OS_TARGET', 'linux').lower()
-        
+        self.cache_ttl = cache_ttl
+        self._cache_lock = threading.Lock()
+        self._cached_bssid: Optional[str] = None
+        self._cached_at = 0.0
+        # Incrémenté à chaque invalidation : une lecture commencée avant n'est pas mise en cache
+        self._generation = 0
+        self._used = False
+        self._watcher_stop: Optional[threading.Event] = None
+
     def get_current_bssid(self):
-        """Récupère le BSSID courant selon l'OS configuré."""
+        """Récupère le BSSID courant selon l'OS configuré (depuis le cache s'il est encore valide)."""
         mock_bssid = os.environ.get('P2P_MOCK_BSSID')
         if mock_bssid:
             return mock_bssid.upper()
-            
+
+        if self.cache_ttl <= 0:
+            return self._read_bssid()
+
+        self._start_watcher()
+        with self._cache_lock:
+            self._used = True
+            if self._cached_bssid is not None and time.monotonic() - self._cached_at < self.cache_ttl:
+                return self._cached_bssid
+        return self._refresh()
+
+    def _read_bssid(self):
         if self.os_type == 'linux':
             return self._get_bssid_linux()
         elif self.os_type == 'windows':
@@ -24,6 +61,76 @@ class ContextChecker:
         else:
             raise NotImplementedError(f"OS non supporté pour la récupération du BSSID : {self.os_type}")
 
+    def _refresh(self):
+        """Relit le BSSID et le met en cache, sauf si le réseau a changé pendant la lecture."""
+        with self._cache_lock:
+            generation = self._generation
+        bssid = self._read_bssid()
+        with self._cache_lock:
+            if bssid is not None and generation == self._generation:
+                self._cached_bssid, self._cached_at = bssid, time.monotonic()
+        return bssid
+
+    def invalidate(self):
+        """Oublie le BSSID en cache : la prochaine vérification le relit."""
+        with self._cache_lock:
+            self._cached_bssid = None
+            self._generation += 1
+
+    def _start_watcher(self):
+        with self._cache_lock:
+            if self._watcher_stop is not None:
+                return
+            self._watcher_stop = threading.Event()
+        threading.Thread(target=self._watch, args=(self._watcher_stop,), daemon=True).start()
+
+    @staticmethod
+    def _open_netlink() -> Optional[socket.socket]:
+        """Socket rtnetlink abonné aux changements réseau, ou None (autre OS, noyau sans netlink)."""
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+            sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE | RTMGRP_IPV6_IFADDR))
+            return sock
+        except (AttributeError, OSError):
+            return None
+
+    def _watch(self, stop: threading.Event):
+        """Thread de fond : invalidation sur événement réseau, relecture avant expiration si le vault sert."""
+        sock = self._open_netlink()
+        interval = self.cache_ttl / 2
+        try:
+            while not stop.is_set():
+                if sock is not None:
+                    ready = select.select([sock], [], [], interval)[0]
+                else:
+                    stop.wait(interval)
+                    ready = []
+                if stop.is_set():
+                    break
+                if ready:
+                    # Rafale d'événements (ex: roaming) : on vide la file avant de relire une seule fois
+                    while select.select([sock], [], [], 0)[0]:
+                        sock.recv(65536)
+                    self.invalidate()
+                with self._cache_lock:
+                    used, self._used = self._used, False
+                # Vault inutilisé depuis la dernière relecture : pas de fork, le cache expire simplement
+                if ready or used:
+                    self._refresh()
+        finally:
+            if sock is not None:
+                sock.close()
+
+    def close(self):
+        """Oublie le BSSID en cache et arrête le thread de surveillance (relancé à la prochaine vérification)."""
+        with self._cache_lock:
+            stop, self._watcher_stop = self._watcher_stop, None
+        if stop is not None:
+            stop.set()
+        self.invalidate()
+
     def _get_bssid_linux(self):
         """Stratégie pour Linux (utilise iwgetid pour plus de rapidité)."""
         try:
@@ -1,21 +1,71 @@
 import os
 import base64
-from typing import Tuple, Optional
+import hashlib
+import hmac
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
 from Crypto.Cipher import AES
 from Crypto.Protocol.KDF import PBKDF2
 from Crypto.Hash import SHA256
 
+# En dessous de ce nombre d'éléments, decrypt_many/encrypt_many restent dans le processus courant
+PARALLEL_MIN_ITEMS = 2000
+
+# Clé du vault dans un processus du pool (transmise une seule fois, à son démarrage)
+_worker_key: Optional[bytes] = None
+
+def _init_worker(key: bytes):
+    global _worker_key
+    _worker_key = key
+
+def _decrypt_chunk(items: Sequence[Tuple[str, str]], key: Optional[bytes] = None) -> List[Optional[str]]:
+    """Déchiffre un lot de (ciphertext_b64, nonce_b64) ; None pour chaque élément invalide (tag, base64, UTF-8)."""
+    key = key or _worker_key
+    b64decode, new, mode = base64.b64decode, AES.new, AES.MODE_GCM
+    results: List[Optional[str]] = []
+    for ciphertext_b64, nonce_b64 in items:
+        try:
+            encrypted_data = b64decode(ciphertext_b64)
+            cipher = new(key, mode, nonce=b64decode(nonce_b64))
+            results.append(cipher.decrypt_and_verify(encrypted_data[16:], encrypted_data[:16]).decode('utf-8'))
+        except (ValueError, KeyError):
+            results.append(None)
+    return results
+
+def _encrypt_chunk(plaintexts: Sequence[str], key: Optional[bytes] = None) -> List[Tuple[str, str]]:
+    """Chiffre un lot de chaînes : un nonce aléatoire par élément, même format que CryptoService.encrypt."""
+    key = key or _worker_key
+    b64encode, new, mode = base64.b64encode, AES.new, AES.MODE_GCM
+    results: List[Tuple[str, str]] = []
+    for plaintext in plaintexts:
+        cipher = new(key, mode)
+        ciphertext, tag = cipher.encrypt_and_digest(plaintext.encode('utf-8'))
+        results.append((b64encode(tag + ciphertext).decode('utf-8'), b64encode(cipher.nonce).decode('utf-8')))
+    return results
+
 class CryptoService:
     """Service gérant la cryptographie AES-GCM et la dérivation de clé."""
     
-    def __init__(self, master_password: str, salt: bytes = b'p2p-safeguard-salt'):
+    def __init__(self, master_password: str, salt: bytes = b'p2p-safeguard-salt', workers: Optional[int] = None,
+                 parallel_min_items: int = PARALLEL_MIN_ITEMS):
         # On utilise un sel fixe (ou on pourrait le stocker dans config)
         self.salt = salt
         self.key = self._derive_key(master_password)
+        # Traitement par lots : pool de processus (un par coeur par défaut), créé au premier gros lot
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.parallel_min_items = parallel_min_items
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
         
     def _derive_key(self, password: str) -> bytes:
         """Dérive une clé de 32 octets (256 bits) avec PBKDF2-HMAC-SHA256 (100k itérations)."""
         return PBKDF2(password, self.salt, dkLen=32, count=100000, hmac_hash_module=SHA256)
+
+    def derive_subkey(self, label: bytes) -> bytes:
+        """Clé dédiée à un autre usage que le chiffrement (ex: index aveugle), dérivée de la clé du vault par HMAC-SHA256."""
+        return hmac.new(self.key, b"p2p-safeguard/" + label, hashlib.sha256).digest()
         
     def encrypt(self, plaintext: str) -> Tuple[str, str]:
         """
@@ -59,3 +109,47 @@ class CryptoService:
             # Échec du déchiffrement (mauvaise clé, données corrompues, tag invalide)
             print(f"Erreur de déchiffrement (potentiellement contexte invalide ou corruption) : {e}")
             return None
+
+    def decrypt_many(self, items: Sequence[Tuple[str, str]]) -> List[Optional[str]]:
+        """
+        Déchiffre un lot de (ciphertext_b64, nonce_b64), dans l'ordre ; None pour chaque élément en échec.
+        Le coût d'un déchiffrement PyCryptodome est surtout du Python (mise en place du mode GCM) qui garde le GIL :
+        un pool de threads n'irait pas plus vite, les gros lots sont donc répartis sur un pool de processus.
+        """
+        results = self._run_batch(_decrypt_chunk, items)
+        failures = results.count(None)
+        if failures:
+            print(f"Erreur de déchiffrement pour {failures} record(s) (potentiellement contexte invalide ou corruption).")
+        return results
+
+    def encrypt_many(self, plaintexts: Sequence[str]) -> List[Tuple[str, str]]:
+        """Chiffre un lot de chaînes, dans l'ordre. Retourne une liste de (ciphertext_b64, nonce_b64)."""
+        return self._run_batch(_encrypt_chunk, plaintexts)
+
+    def _run_batch(self, function, items: Sequence) -> list:
+        """Exécute `function` sur les éléments : dans le processus courant pour un petit lot, sinon par morceaux sur le pool."""
+        items = list(items)
+        if self.workers <= 1 or len(items) < self.parallel_min_items:
+            return function(items, self.key)
+        # Quelques morceaux par processus : équilibre la charge sans multiplier les allers-retours
+        size = -(-len(items) // (self.workers * 4))
+        chunks = [items[i:i + size] for i in range(0, len(items), size)]
+        results = []
+        for chunk_results in self._get_pool().map(function, chunks):
+            results.extend(chunk_results)
+        return results
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # "spawn" : pas de fork d'un processus multi-threadé (serveur TCP, write-behind)
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=_init_worker, initargs=(self.key,))
+            return self._pool
+
+    def close(self):
+        """Arrête le pool de processus (et la copie de la clé qu'il détient). Il sera recréé au prochain gros lot."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
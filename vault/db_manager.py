@@ -1,106 +1,110 @@
-import json
-import os
-import uuid
 import time
-from typing import Dict, List, Optional
+from typing import List, Optional, Tuple
+
+from .storage_backend import StorageBackend
+from .json_backend import JsonJournalBackend
+from .sqlite_backend import SQLiteBackend
+from .write_behind import WriteBehindBuffer
+
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+# Durée de vie par défaut d'un tombstone avant qu'il soit éligible au GC (30 jours)
+DEFAULT_TOMBSTONE_TTL = 30 * 24 * 3600.0
 
 class DBManager:
-    """Gestionnaire de la base de données locale (vault.json)."""
+    """
+    Gestionnaire de la base de données locale.
+    Délègue le stockage à un backend interchangeable : JSON journalisé (vault.json, par défaut)
+    ou SQLite (vault.db). Le backend est déduit de l'extension si aucun n'est fourni.
+    Les records reçus par Gossip passent par une couche write-behind (group commit).
+    Un tombstone ne garde que (uuid, updated_at, is_deleted) : le secret chiffré est effacé.
+    Passé `tombstone_ttl` secondes (None : jamais), il peut être purgé (purge_tombstones).
+    """
 
-    def __init__(self, db_path: str = "vault.json"):
+    def __init__(self, db_path: str = "vault.json", backend: Optional[StorageBackend] = None,
+                 durability: str = "batched", write_batch_size: int = 500, write_batch_window: float = 0.05,
+                 tombstone_ttl: Optional[float] = DEFAULT_TOMBSTONE_TTL):
         self.db_path = db_path
-        self.data = self._load_or_create_db()
-
-    def _load_or_create_db(self) -> dict:
-        """Charge le fichier JSON ou le crée s'il n'existe pas avec un ID de vault unique."""
-        if not os.path.exists(self.db_path):
-            initial_data = {
-                "vault_id": str(uuid.uuid4()),
-                "records": []
-            }
-            self._save_db(initial_data)
-            return initial_data
-
-        try:
-            with open(self.db_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            # En cas de corruption, on pourrait lever une erreur, mais ici on recrée (ou backup)
-            print(f"Erreur: {self.db_path} est corrompu. Création d'une nouvelle base de données.")
-            return {"vault_id": str(uuid.uuid4()), "records": []}
-
-    def _save_db(self, data: Optional[dict] = None):
-        """Sauvegarde les données dans le fichier JSON."""
-        if data is None:
-            data = self.data
-        with open(self.db_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
-
-    def _reload(self):
-        """Recharge les données depuis le disque pour éviter le désaccord entre processus (Daemon vs CLI)."""
-        self.data = self._load_or_create_db()
+        self.tombstone_ttl = tombstone_ttl
+        self.backend = backend if backend is not None else self._default_backend(db_path)
+        self.write_buffer = WriteBehindBuffer(self.backend, durability, write_batch_size, write_batch_window)
+
+    @staticmethod
+    def _default_backend(db_path: str) -> StorageBackend:
+        if db_path.lower().endswith(SQLITE_EXTENSIONS):
+            return SQLiteBackend(db_path)
+        return JsonJournalBackend(db_path)
 
     def get_password_check(self) -> Optional[dict]:
         """Retourne le bloc de vérification du mot de passe (ciphertext, nonce) s'il existe."""
-        self._reload()
-        return self.data.get("password_check")
+        return self.backend.get_header("password_check")
 
     def set_password_check(self, ciphertext: str, nonce: str):
         """Enregistre le bloc de vérification du mot de passe maître."""
-        self._reload()
-        self.data["password_check"] = {
+        self.backend.set_header("password_check", {
             "ciphertext": ciphertext,
             "nonce": nonce
-        }
-        self._save_db()
+        })
 
     def get_all_records(self) -> List[dict]:
         """Retourne tous les records non supprimés (soft delete exclu)."""
-        self._reload()
-        return [r for r in self.data.get("records", []) if not r.get("is_deleted", False)]
-        
+        self.write_buffer.flush()
+        return self.backend.get_records(include_deleted=False)
+
     def get_raw_records(self) -> List[dict]:
          """Retourne TOUS les records (inclus deleted) pour la synchronisation."""
-         self._reload()
-         return self.data.get("records", [])
+         self.write_buffer.flush()
+         return self.backend.get_records(include_deleted=True)
 
     def get_record(self, record_uuid: str) -> Optional[dict]:
         """Récupère un record spécifique par son UUID (qu'il soit deleted ou non)."""
-        self._reload()
-        for record in self.data.get("records", []):
-            if record["uuid"] == record_uuid:
-                return record
-        return None
+        return self.write_buffer.get(record_uuid) or self.backend.get_record(record_uuid)
 
-    def upsert_record_local(self, record_uuid: str, ciphertext: str, nonce: str, is_deleted: bool = False) -> dict:
+    def get_records_by_uuid(self, record_uuids: List[str]) -> List[dict]:
+        """Récupère les records existants parmi `record_uuids` (pour l'anti-entropie)."""
+        records = (self.get_record(record_uuid) for record_uuid in record_uuids)
+        return [record for record in records if record is not None]
+
+    def get_records_since(self, since: float) -> List[dict]:
+        """Retourne les records (tombstones inclus) modifiés après `since`, par updated_at croissant."""
+        self.write_buffer.flush()
+        return self.backend.get_records_since(since)
+
+    def data_version(self) -> Optional[int]:
+        """
+        Compteur qui change quand un autre processus a modifié le vault (None : inconnu).
+        Les écritures de ce processus, tampon compris, n'en font pas partie : VaultCore les suit lui-même.
+        """
+        return self.backend.data_version()
+
+    def get_sync_digest(self) -> List[Tuple[str, float]]:
+        """Retourne les couples (uuid, updated_at) de tous les records pour l'arbre de Merkle."""
+        self.write_buffer.flush()
+        return self.backend.get_digest()
+
+    def upsert_record_local(self, record_uuid: str, ciphertext: str, nonce: str, is_deleted: bool = False,
+                            blind_index: Optional[List[str]] = None) -> dict:
         """
         Action LOCALE : L'utilisateur ajoute ou modifie un enregistrement depuis ce device.
         On met à jour le temps actuel et on sauvegarde.
+        `blind_index` : jetons de recherche stockés et répliqués avec le record (jamais sur un tombstone).
         Retourne le record complet pour diffusion Gossip.
         """
-        self._reload()
         new_record = {
             "uuid": record_uuid,
             "updated_at": time.time(),
             "is_deleted": is_deleted,
-            "nonce": nonce,
-            "ciphertext": ciphertext
+            "nonce": "" if is_deleted else nonce,
+            "ciphertext": "" if is_deleted else ciphertext
         }
-        
+        if blind_index is not None and not is_deleted:
+            new_record["blind_index"] = list(blind_index)
+
         self._upsert(new_record)
         return new_record
-        
+
     def _upsert(self, new_record: dict):
-        """Remplace ou ajoute le record en mémoire et sauvegarde (Interne)."""
-        records = self.data.setdefault("records", [])
-        for i, record in enumerate(records):
-            if record["uuid"] == new_record["uuid"]:
-                records[i] = new_record
-                self._save_db()
-                return
-                
-        records.append(new_record)
-        self._save_db()
+        """Remplace ou ajoute le record et sauvegarde immédiatement (Interne)."""
+        self.write_buffer.write_now([new_record])
 
     def process_gossip_update(self, gossip_record: dict) -> bool:
         """
@@ -108,13 +112,86 @@ class DBManager:
         Vérifie si le record distant est plus récent que le record local.
         Retourne True si appliqué (donc à propager), False si ignoré (trop vieux).
         """
-        local_record = self.get_record(gossip_record["uuid"])
-        
-        if local_record:
-            # LWW Check: Si le timestamp reçu n'est pas strictement supérieur, on ignore.
-            if gossip_record["updated_at"] <= local_record["updated_at"]:
+        if gossip_record.get("is_deleted", False):
+            if self._is_expired_tombstone(gossip_record, self._tombstone_horizon()):
                 return False
-                
-        # Le record n'existe pas ou est plus récent, on l'applique
-        self._upsert(gossip_record)
-        return True
+            if gossip_record.get("ciphertext") or gossip_record.get("nonce") or "blind_index" in gossip_record:
+                # Tombstone d'un pair d'une ancienne version : on n'en stocke ni le secret chiffré ni les jetons
+                gossip_record = {k: v for k, v in gossip_record.items() if k != "blind_index"}
+                gossip_record.update(ciphertext="", nonce="")
+        # LWW Check : appliqué seulement si strictement plus récent (ou absent), écriture groupée
+        return self.write_buffer.apply_if_newer(gossip_record)
+
+    def _tombstone_horizon(self) -> Optional[float]:
+        """Les tombstones dont updated_at est antérieur à cet instant sont expirés (None : TTL infini)."""
+        return None if self.tombstone_ttl is None else time.time() - self.tombstone_ttl
+
+    def _is_expired_tombstone(self, record: dict, horizon: Optional[float]) -> bool:
+        """
+        Tombstone expiré pour un uuid absent localement : il ne supprime rien, et c'est le plus souvent
+        un tombstone déjà purgé ici qu'un pair n'a pas encore purgé. Le réinsérer le ferait revivre.
+        """
+        return (horizon is not None and record.get("is_deleted", False) and record["updated_at"] < horizon
+                and self.get_record(record["uuid"]) is None)
+
+    def install_snapshot(self, records: List[dict]) -> int:
+        """
+        Bootstrap d'un nouveau noeud : installe atomiquement le snapshot complet reçu d'un pair
+        (fusion LWW avec les records locaux). Retourne le nombre de records appliqués.
+        """
+        self.write_buffer.flush()
+        horizon = self._tombstone_horizon()
+        return self.backend.install_snapshot([r for r in records if not self._is_expired_tombstone(r, horizon)])
+
+    def find_by_blind_index(self, tokens: List[str]) -> List[dict]:
+        """Records non supprimés portant tous les jetons `tokens` (lookup dans l'index inversé du backend)."""
+        self.write_buffer.flush()
+        return self.backend.find_by_tokens(tokens)
+
+    def attach_blind_index(self, records: List[dict]) -> int:
+        """
+        Enregistre les records complétés de leur index aveugle, sans changer leur updated_at (pas de re-diffusion :
+        chaque noeud indexe lui-même ses records). Un record modifié entre-temps est laissé tel quel.
+        """
+        self.write_buffer.flush()
+        return self.backend.replace_if_unchanged(records)
+
+    def get_expired_tombstones(self) -> List[Tuple[str, float]]:
+        """Couples (uuid, updated_at) des tombstones plus vieux que le TTL : candidats au GC."""
+        horizon = self._tombstone_horizon()
+        if horizon is None:
+            return []
+        self.write_buffer.flush()
+        return self.backend.get_tombstones(horizon)
+
+    def purge_tombstones(self, entries: List[Tuple[str, float]]) -> int:
+        """
+        Supprime définitivement des tombstones expirés (acquittés par tous les pairs, voir NetworkCore.collect_tombstones).
+        Retourne le nombre de records supprimés.
+        """
+        self.write_buffer.flush()
+        horizon = self._tombstone_horizon()
+        if horizon is None:
+            return 0
+        return self.backend.purge_tombstones([(u, ts) for u, ts in entries if ts < horizon])
+
+    def flush(self):
+        """Force l'écriture sur disque des records distants en attente."""
+        self.write_buffer.flush()
+
+    def compact(self):
+        """
+        Compacte le stockage sur disque (journal -> snapshot, ou checkpoint du WAL SQLite + VACUUM).
+        Les tombstones écrits avant qu'ils ne soient allégés perdent au passage leur secret chiffré.
+        """
+        self.write_buffer.flush()
+        legacy = [dict(r, ciphertext="", nonce="") for r in self.backend.get_records(include_deleted=True)
+                  if r.get("is_deleted", False) and (r.get("ciphertext") or r.get("nonce"))]
+        if legacy:
+            self.backend.upsert_many(legacy)
+        self.backend.compact()
+
+    def close(self):
+        """Écrit les records en attente puis ferme proprement le backend de stockage."""
+        self.write_buffer.flush()
+        self.backend.close()
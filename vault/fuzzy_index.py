@@ -0,0 +1,220 @@
+import heapq
+import math
+import re
+import threading
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+
+from .blind_index import BlindIndex
+
+# Champs indexés et poids dans le score : une correspondance sur le service compte plus que dans les notes
+FIELDS = (("service", 1.0), ("username", 0.8), ("notes", 0.6))
+# Part minimale des trigrammes de la requête qu'une entrée doit contenir pour être retenue
+DEFAULT_THRESHOLD = 0.3
+DEFAULT_LIMIT = 20
+
+_EMPTY: FrozenSet[str] = frozenset()
+_WORD = re.compile(r"[^\W_]+")
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """
+    Trigrammes d'un texte normalisé, mot par mot (suites de lettres et chiffres), avec deux espaces avant
+    et un après chaque mot (comme pg_trgm) : le début et la fin d'un mot comptent, une faute de frappe
+    n'invalide que les trigrammes qui la contiennent.
+    """
+    grams = set()
+    for word in _WORD.findall(BlindIndex.normalize(text)):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+class FuzzyIndex:
+    """
+    Index inversé en mémoire des secrets déchiffrés, pour une recherche approximative classée par score.
+    On indexe les valeurs distinctes de chaque champ (un même username ou une même note revient dans des milliers
+    de secrets) : trigramme -> valeurs, valeur -> uuids. Le score se calcule une fois par valeur.
+    Alimenté au fil de l'eau par les secrets que VaultCore déchiffre ; effacé au verrouillage du vault.
+    Tant que l'index n'est pas construit (build), add() est sans effet : un listing ne paie pas son coût.
+    """
+
+    def __init__(self):
+        # Une valeur est identifiée par (rang du champ dans FIELDS, texte normalisé)
+        self._postings: Dict[str, Set[Tuple[int, str]]] = {}
+        self._values: Dict[Tuple[int, str], Tuple[FrozenSet[str], Set[str]]] = {}
+        # uuid -> (updated_at, secret en clair, valeurs indexées)
+        self._entries: Dict[str, Tuple[float, dict, Tuple[Tuple[int, str], ...]]] = {}
+        # Records modifiés par Gossip : à déchiffrer de nouveau avant la prochaine recherche
+        self._stale: Set[str] = set()
+        # uuid -> updated_at des versions connues mais non indexées (tombstones, échecs de déchiffrement)
+        self._skipped: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.built = False
+
+    def build(self):
+        """Marque l'index comme construit : les secrets déchiffrés ensuite y sont ajoutés."""
+        with self._lock:
+            self.built = True
+
+    def add(self, record_uuid: str, updated_at: float, data: dict):
+        """Indexe (une copie de) la version `updated_at` du secret ; sans effet si elle est déjà indexée."""
+        with self._lock:
+            if not self.built:
+                return
+            entry = self._entries.get(record_uuid)
+            if entry is not None and entry[0] == updated_at:
+                return
+            # Un uuid marqué à ré-indexer le reste : la version ajoutée ici peut être antérieure au Gossip appliqué
+            self._remove(record_uuid)
+            self._skipped.pop(record_uuid, None)
+            keys = []
+            for rank, (name, _) in enumerate(FIELDS):
+                key = (rank, BlindIndex.normalize(data.get(name) or ""))
+                value = self._values.get(key)
+                if value is None:
+                    grams = trigrams(key[1])
+                    if not grams:
+                        continue
+                    value = self._values[key] = (grams, set())
+                    for gram in grams:
+                        self._postings.setdefault(gram, set()).add(key)
+                value[1].add(record_uuid)
+                keys.append(key)
+            self._entries[record_uuid] = (updated_at, dict(data), tuple(keys))
+
+    def _remove(self, record_uuid: str):
+        entry = self._entries.pop(record_uuid, None)
+        if entry is None:
+            return
+        entry[1].clear()
+        for key in entry[2]:
+            grams, uuids = self._values[key]
+            uuids.discard(record_uuid)
+            if uuids:
+                continue
+            del self._values[key]
+            for gram in grams:
+                posting = self._postings[gram]
+                posting.discard(key)
+                if not posting:
+                    del self._postings[gram]
+
+    def remove(self, record_uuid: str):
+        with self._lock:
+            self._remove(record_uuid)
+            self._stale.discard(record_uuid)
+
+    def invalidate(self, record_uuid: str):
+        """Retire la version indexée d'un record modifié sans le déchiffrer ; il sera ré-indexé avant la prochaine recherche."""
+        with self._lock:
+            self._remove(record_uuid)
+            if self.built:
+                self._stale.add(record_uuid)
+
+    def take_stale(self) -> List[str]:
+        """Retourne (et oublie) les uuids marqués à déchiffrer de nouveau par Gossip."""
+        with self._lock:
+            stale, self._stale = list(self._stale), set()
+        return stale
+
+    def skip(self, record_uuid: str, updated_at: float):
+        """Mémorise une version qui n'est pas indexée (tombstone, déchiffrement impossible) : elle ne sera pas relue."""
+        with self._lock:
+            if not self.built:
+                return
+            self._remove(record_uuid)
+            self._skipped[record_uuid] = updated_at
+
+    def reconcile(self, digest: Iterable[Tuple[str, float]]) -> List[str]:
+        """
+        Compare l'index aux couples (uuid, updated_at) du vault : les uuids disparus sont retirés, et la fonction
+        retourne (et oublie) ceux à déchiffrer de nouveau : marqués par Gossip, ou dont la version connue diffère.
+        Rattrape ainsi les écritures d'un autre processus (le daemon applique le Gossip quand la CLI tourne en --cli).
+        """
+        versions = dict(digest)
+        with self._lock:
+            for record_uuid in [u for u in self._entries if u not in versions]:
+                self._remove(record_uuid)
+            for record_uuid in [u for u in self._skipped if u not in versions]:
+                del self._skipped[record_uuid]
+            outdated, self._stale = self._stale, set()
+            for record_uuid, updated_at in versions.items():
+                entry = self._entries.get(record_uuid)
+                known = entry[0] if entry is not None else self._skipped.get(record_uuid)
+                if known != updated_at:
+                    outdated.add(record_uuid)
+        return list(outdated)
+
+    def retain(self, record_uuids: Iterable[str]):
+        """Ne garde que les entrées de `record_uuids` (secrets supprimés ou purgés entre-temps)."""
+        keep = set(record_uuids)
+        with self._lock:
+            for record_uuid in [u for u in self._entries if u not in keep]:
+                self._remove(record_uuid)
+
+    def clear(self):
+        """Efface les secrets en clair et l'index ; il devra être reconstruit."""
+        with self._lock:
+            for entry in self._entries.values():
+                entry[1].clear()
+            self._entries.clear()
+            self._values.clear()
+            self._postings.clear()
+            self._stale.clear()
+            self._skipped.clear()
+            self.built = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT, threshold: float = DEFAULT_THRESHOLD) -> List[dict]:
+        """
+        Retourne au plus `limit` secrets (copies, avec leur score dans "_score") classés par score décroissant.
+        Score d'un secret : meilleure proportion, pondérée par champ, des trigrammes de la requête présents dans
+        un de ses champs ; un champ en contenant moins de `threshold` ne compte pas.
+        Les listes de l'index sont parcourues de la plus courte à la plus longue : une valeur absente des i premières
+        ne peut dépasser le score (n - i) / n, on s'arrête dès que `limit` secrets font au moins aussi bien.
+        Les trigrammes très fréquents ("com", "mai"...) ne servent donc qu'à départager les candidats.
+        """
+        query_grams = trigrams(query)
+        if not query_grams or limit <= 0:
+            return []
+        size = len(query_grams)
+        required = max(1, math.ceil(threshold * size))
+        with self._lock:
+            postings = sorted((self._postings.get(gram, _EMPTY) for gram in query_grams), key=len)
+            scores: Dict[Tuple[int, str], float] = {}
+            seen: Set[Tuple[int, str]] = set()
+            top = 0.0
+            for i, posting in enumerate(postings):
+                remaining = size - i
+                if remaining < required:
+                    break
+                # Classement complet seulement quand le meilleur score atteint déjà la borne des valeurs non vues
+                if top * size >= remaining * FIELDS[0][1]:
+                    ranked = self._rank(scores, limit)
+                    if len(ranked) >= limit and ranked[-1][0] * size >= remaining * FIELDS[0][1]:
+                        break
+                for key in posting - seen:
+                    seen.add(key)
+                    shared = len(query_grams & self._values[key][0])
+                    if shared >= required:
+                        scores[key] = score = FIELDS[key[0]][1] * shared / size
+                        top = max(top, score)
+            ranked = self._rank(scores, limit)
+            ranked.sort(key=lambda item: (-item[0], self._entries[item[1]][1].get("service", ""), item[1]))
+            return [dict(self._entries[record_uuid][1], _score=round(score, 3)) for score, record_uuid in ranked]
+
+    def _rank(self, scores: Dict[Tuple[int, str], float], limit: int) -> List[Tuple[float, str]]:
+        """Les `limit` meilleurs secrets (score, uuid) : un secret prend le score de son meilleur champ."""
+        ranked, seen = [], set()
+        # Un secret apparaît dans au plus len(FIELDS) valeurs : les limit * len(FIELDS) meilleures suffisent
+        best = heapq.nlargest(limit * len(FIELDS), ((score, key) for key, score in scores.items()))
+        for score, key in best:
+            # Ex aequo au sein d'une valeur partagée par des milliers de secrets : on s'arrête dès `limit` atteint
+            for record_uuid in self._values[key][1]:
+                if record_uuid in seen:
+                    continue
+                seen.add(record_uuid)
+                ranked.append((score, record_uuid))
+                if len(ranked) >= limit:
+                    return ranked
+        return ranked
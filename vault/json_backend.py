@@ -0,0 +1,434 @@
+import bisect
+import contextlib
+import json
+import os
+import uuid
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .storage_backend import StorageBackend
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None # Windows : pas de verrou inter-processus
+
+class JsonJournalBackend(StorageBackend):
+    """
+    Backend de stockage historique basé sur des fichiers JSON (vault.json).
+    Stockage en deux parties :
+      - un snapshot (vault.json) : en-tête (vault_id, password_check) + records,
+      - un journal append-only (vault.json.journal) : une ligne JSON par upsert ou tombstone.
+    Le journal est rejoué au chargement puis compacté périodiquement dans le snapshot.
+    Plusieurs processus (daemon, --cli, --compact) peuvent écrire le même vault : les ajouts au journal,
+    sa réécriture et le remplacement du snapshot se font sous un verrou exclusif flock (vault.json.lock).
+    """
+
+    def __init__(self, db_path: str = "vault.json", compaction_threshold: int = 1000):
+        self.db_path = db_path
+        self.journal_path = f"{db_path}.journal"
+        self.lock_path = f"{db_path}.lock"
+        # Verrou inter-processus réentrant : fichier verrouillé et profondeur d'imbrication (sous self._lock)
+        self._lock_file = None
+        self._lock_depth = 0
+        # Nombre d'entrées de journal au-delà duquel on compacte en arrière-plan
+        self.compaction_threshold = compaction_threshold
+        self._lock = threading.RLock()
+        # Signature (mtime, taille, inode) du snapshot lors du dernier chargement/écriture
+        self._file_signature: Optional[Tuple[int, int, int]] = None
+        # Position de lecture dans le journal (octets déjà rejoués) et inode du journal
+        self._journal_offset = 0
+        self._journal_inode: Optional[int] = None
+        self._journal_entries = 0
+        # Incrémenté à chaque réécriture du snapshot (invalide une compaction concurrente)
+        self._snapshot_generation = 0
+        self._compacting = False
+        # Incrémenté quand _reload relit des écritures d'un autre processus (voir data_version)
+        self._external_version = 0
+        # Index en mémoire : uuid -> position dans data["records"] (lookup O(1))
+        self._index: Dict[str, int] = {}
+        # Index trié par updated_at (clés, uuids), construit à la demande pour get_records_since
+        self._time_index: Optional[Tuple[List[float], List[str]]] = None
+        # Index inversé de l'index aveugle : jeton -> uuids, construit à la première recherche puis tenu à jour
+        self._token_index: Optional[Dict[str, Set[str]]] = None
+        self.data = self._load_or_create_db()
+
+    def _load_or_create_db(self) -> dict:
+        """Charge le snapshot JSON (puis rejoue le journal) ou le crée s'il n'existe pas avec un ID de vault unique."""
+        if not os.path.exists(self.db_path):
+            initial_data = {
+                "vault_id": str(uuid.uuid4()),
+                "records": []
+            }
+            # Un journal orphelin appartient à un ancien vault : _save_db le tronque
+            self._save_db(initial_data)
+            self.data = initial_data
+            self._rebuild_index()
+            return initial_data
+
+        try:
+            with open(self.db_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except json.JSONDecodeError:
+            # En cas de corruption, on pourrait lever une erreur, mais ici on recrée (ou backup)
+            print(f"Erreur: {self.db_path} est corrompu. Création d'une nouvelle base de données.")
+            data = {"vault_id": str(uuid.uuid4()), "records": []}
+        self._file_signature = self._current_signature()
+
+        self.data = data
+        self._rebuild_index()
+        self._journal_offset = 0
+        self._journal_entries = 0
+        stat = self._journal_stat()
+        self._journal_inode = stat.st_ino if stat else None
+        self._replay_journal()
+        return data
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """
+        Verrou exclusif inter-processus (flock) autour d'une lecture-modification-écriture du journal ou du snapshot,
+        pour qu'une compaction d'un autre processus ne tronque pas des lignes ajoutées entre sa lecture et sa réécriture.
+        Réentrant ; à prendre en tenant self._lock (toujours dans cet ordre).
+        """
+        if fcntl is None:
+            yield
+            return
+        if self._lock_depth == 0:
+            self._lock_file = open(self.lock_path, "a")
+            try:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                self._lock_file.close()
+                self._lock_file = None
+                raise
+        self._lock_depth += 1
+        try:
+            yield
+        finally:
+            self._lock_depth -= 1
+            if self._lock_depth == 0:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+                self._lock_file.close()
+                self._lock_file = None
+
+    def _save_db(self, data: Optional[dict] = None):
+        """
+        Réécrit le snapshot complet (écriture atomique) et vide le journal.
+        Réservé à la création, aux changements d'en-tête et à la compaction : O(taille du vault).
+        """
+        if data is None:
+            data = self.data
+        with self._file_lock():
+            self._write_snapshot(json.dumps(data, separators=(",", ":")))
+            self._rewrite_journal(b"")
+
+    def _write_snapshot(self, payload: str):
+        """Écrit le snapshot dans un fichier temporaire puis le remplace atomiquement."""
+        tmp_path = f"{self.db_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.db_path)
+        self._snapshot_generation += 1
+        # Notre propre écriture ne doit pas déclencher de rechargement
+        self._file_signature = self._current_signature()
+
+    def _rewrite_journal(self, content: bytes):
+        """Remplace le contenu du journal (vide après compaction, ou la fin non compactée)."""
+        if content or os.path.exists(self.journal_path):
+            with open(self.journal_path, "wb") as f:
+                f.write(content)
+        stat = self._journal_stat()
+        self._journal_inode = stat.st_ino if stat else None
+        self._journal_offset = len(content)
+        self._journal_entries = content.count(b"\n")
+
+    def _current_signature(self) -> Optional[Tuple[int, int, int]]:
+        """Retourne (mtime_ns, taille, inode) du snapshot, ou None s'il n'existe pas."""
+        try:
+            st = os.stat(self.db_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _journal_stat(self) -> Optional[os.stat_result]:
+        try:
+            return os.stat(self.journal_path)
+        except FileNotFoundError:
+            return None
+
+    def _rebuild_index(self):
+        """Reconstruit l'index uuid -> position à partir de la liste des records."""
+        self._index = {r["uuid"]: i for i, r in enumerate(self.data.get("records", []))}
+        self._time_index = None
+        self._token_index = None
+
+    def _read_journal_bytes(self, offset: int) -> bytes:
+        """Lit le journal à partir de `offset` (octets), ou b"" s'il n'existe pas."""
+        try:
+            with open(self.journal_path, "rb") as f:
+                f.seek(offset)
+                return f.read()
+        except FileNotFoundError:
+            return b""
+
+    def _replay_journal(self):
+        """
+        Rejoue les lignes du journal écrites depuis la dernière lecture.
+        Une dernière ligne incomplète (écriture interrompue) est ignorée jusqu'à ce qu'elle soit terminée.
+        """
+        chunk = self._read_journal_bytes(self._journal_offset)
+        complete = chunk[:chunk.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Erreur: entrée de journal corrompue ignorée dans {self.journal_path}.")
+                continue
+            self._apply_in_memory(record)
+            self._journal_entries += 1
+        self._journal_offset += len(complete)
+
+    def _reload(self):
+        """
+        Recharge les données depuis le disque pour éviter le désaccord entre processus (Daemon vs CLI).
+        Si le snapshot n'a pas changé, seule la fin du journal écrite par un autre processus est rejouée.
+        """
+        with self._lock:
+            signature = self._current_signature()
+            if signature is None or signature != self._file_signature:
+                self.data = self._load_or_create_db()
+                self._external_version += 1
+                return
+
+            stat = self._journal_stat()
+            if stat is None:
+                if self._journal_offset:
+                    self.data = self._load_or_create_db()
+                    self._external_version += 1
+                return
+            if stat.st_ino != self._journal_inode or stat.st_size < self._journal_offset:
+                # Journal tronqué/recréé par une compaction d'un autre processus
+                self.data = self._load_or_create_db()
+                self._external_version += 1
+            elif stat.st_size > self._journal_offset:
+                self._replay_journal()
+                self._external_version += 1
+
+    def data_version(self) -> Optional[int]:
+        """Deux stat() : le snapshot et le journal ne sont relus que si un autre processus les a modifiés."""
+        with self._lock:
+            self._reload()
+            return self._external_version
+
+    def get_header(self, key: str) -> Optional[Any]:
+        with self._lock:
+            self._reload()
+            return self.data.get(key)
+
+    def set_header(self, key: str, value: Any):
+        """Les changements d'en-tête (rares) réécrivent le snapshot."""
+        with self._lock, self._file_lock():
+            self._reload()
+            self.data[key] = value
+            self._save_db()
+
+    def get_records(self, include_deleted: bool = True) -> List[dict]:
+        """Retourne une copie de la liste : la compaction ou un rechargement peut remplacer la liste interne."""
+        with self._lock:
+            self._reload()
+            records = self.data.get("records", [])
+            if include_deleted:
+                return list(records)
+            return [r for r in records if not r.get("is_deleted", False)]
+
+    def get_record(self, record_uuid: str) -> Optional[dict]:
+        with self._lock:
+            self._reload()
+            position = self._index.get(record_uuid)
+            if position is None:
+                return None
+            return self.data["records"][position]
+
+    def get_records_since(self, since: float) -> List[dict]:
+        with self._lock:
+            self._reload()
+            records = self.data.get("records", [])
+            if self._time_index is None:
+                ordered = sorted(records, key=lambda r: r["updated_at"])
+                self._time_index = ([r["updated_at"] for r in ordered], [r["uuid"] for r in ordered])
+            keys, uuids = self._time_index
+            start = bisect.bisect_right(keys, since)
+            return [records[self._index[record_uuid]] for record_uuid in uuids[start:]]
+
+    def _apply_in_memory(self, new_record: dict):
+        """Remplace ou ajoute le record dans la liste en mémoire et l'index."""
+        records = self.data.setdefault("records", [])
+        position = self._index.get(new_record["uuid"])
+        if self._token_index is not None:
+            self._index_tokens(records[position] if position is not None else None, new_record)
+        if position is not None:
+            records[position] = new_record
+            self._time_index = None
+        else:
+            self._index[new_record["uuid"]] = len(records)
+            records.append(new_record)
+            # Cas courant (record le plus récent) : l'index temporel reste trié, on l'étend
+            if self._time_index is not None:
+                keys, uuids = self._time_index
+                if not keys or new_record["updated_at"] >= keys[-1]:
+                    keys.append(new_record["updated_at"])
+                    uuids.append(new_record["uuid"])
+                else:
+                    self._time_index = None
+
+    def _index_tokens(self, old_record: Optional[dict], new_record: dict):
+        """Met à jour l'index inversé quand `old_record` est remplacé par `new_record` (tombstone : plus de jetons)."""
+        if old_record is not None:
+            for token in old_record.get("blind_index", ()):
+                uuids = self._token_index.get(token)
+                if uuids is not None:
+                    uuids.discard(old_record["uuid"])
+                    if not uuids:
+                        del self._token_index[token]
+        if not new_record.get("is_deleted", False):
+            for token in new_record.get("blind_index", ()):
+                self._token_index.setdefault(token, set()).add(new_record["uuid"])
+
+    def find_by_tokens(self, tokens: List[str]) -> List[dict]:
+        """Intersection des ensembles d'uuids de chaque jeton, du plus petit au plus grand : coût indépendant de la taille du vault."""
+        with self._lock:
+            self._reload()
+            records = self.data.get("records", [])
+            if self._token_index is None:
+                self._token_index = {}
+                for record in records:
+                    self._index_tokens(None, record)
+            sets = sorted((self._token_index.get(token, set()) for token in set(tokens)), key=len)
+            if not sets:
+                return []
+            matching = set(sets[0]).intersection(*sets[1:])
+            return [records[self._index[record_uuid]] for record_uuid in matching]
+
+    def replace_if_unchanged(self, records: List[dict]) -> int:
+        with self._lock, self._file_lock():
+            self._reload()
+            unchanged = []
+            for record in records:
+                position = self._index.get(record["uuid"])
+                if position is not None and self.data["records"][position]["updated_at"] == record["updated_at"]:
+                    unchanged.append(record)
+            return self.upsert_many(unchanged)
+
+    def upsert(self, new_record: dict):
+        """Remplace ou ajoute le record en mémoire et l'ajoute au journal."""
+        self.upsert_many([new_record])
+
+    def upsert_many(self, records: List[dict], only_if_newer: bool = False, fsync: bool = False) -> int:
+        """Applique les records en mémoire puis les ajoute au journal en une seule écriture."""
+        with self._lock, self._file_lock():
+            self._reload()
+            applied = []
+            for record in records:
+                if only_if_newer:
+                    position = self._index.get(record["uuid"])
+                    if position is not None and record["updated_at"] <= self.data["records"][position]["updated_at"]:
+                        continue
+                self._apply_in_memory(record)
+                applied.append(record)
+            if applied:
+                self._append_journal(applied, fsync)
+            return len(applied)
+
+    def install_snapshot(self, records: List[dict]) -> int:
+        """
+        Fusionne le snapshot en mémoire puis réécrit vault.json d'un bloc (fichier temporaire + os.replace) :
+        un crash pendant l'installation laisse l'ancien vault intact, jamais un vault à moitié installé.
+        Une seule sérialisation au lieu d'une ligne de journal par record.
+        """
+        with self._lock, self._file_lock():
+            self._reload()
+            applied = 0
+            for record in records:
+                position = self._index.get(record["uuid"])
+                if position is not None and record["updated_at"] <= self.data["records"][position]["updated_at"]:
+                    continue
+                self._apply_in_memory(record)
+                applied += 1
+            if applied:
+                self._save_db()
+            return applied
+
+    def purge_tombstones(self, entries: List[Tuple[str, float]]) -> int:
+        """Retire les tombstones de la liste en mémoire puis réécrit vault.json d'un bloc (journal vidé)."""
+        purgeable = set(entries)
+        with self._lock, self._file_lock():
+            self._reload()
+            records = self.data.get("records", [])
+            kept = [r for r in records if not (r.get("is_deleted", False) and (r["uuid"], r["updated_at"]) in purgeable)]
+            purged = len(records) - len(kept)
+            if purged:
+                self.data["records"] = kept
+                self._rebuild_index()
+                self._save_db()
+            return purged
+
+    def _append_journal(self, records: List[dict], fsync: bool = False):
+        """Ajoute une ligne par record au journal : coût O(taille des records), pas O(taille du vault)."""
+        chunk = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records).encode("utf-8")
+        with open(self.journal_path, "ab") as f:
+            f.write(chunk)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+            end = f.tell()
+        if self._journal_inode is None:
+            stat = self._journal_stat()
+            self._journal_inode = stat.st_ino if stat else None
+        # Si un autre processus a écrit entre-temps, on laisse l'offset en place :
+        # le prochain _reload rejouera ses lignes (et les nôtres, de façon idempotente).
+        if end - len(chunk) == self._journal_offset:
+            self._journal_offset = end
+        self._journal_entries += len(records)
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        """Lance une compaction en arrière-plan si le journal dépasse le seuil."""
+        if self._journal_entries < self.compaction_threshold or self._compacting:
+            return
+        self._compacting = True
+        threading.Thread(target=self.compact, daemon=True).start()
+
+    def compact(self):
+        """
+        Compacte le journal dans le snapshot.
+        La sérialisation (coûteuse) se fait hors verrou ; les entrées ajoutées pendant ce temps
+        sont conservées en fin de journal.
+        """
+        try:
+            with self._lock:
+                self._reload()
+                data = dict(self.data)
+                data["records"] = list(self.data.get("records", []))
+                offset = self._journal_offset
+                generation = self._snapshot_generation
+                signature = self._file_signature
+
+            payload = json.dumps(data, separators=(",", ":"))
+
+            with self._lock, self._file_lock():
+                self._reload()
+                if (generation != self._snapshot_generation or signature != self._file_signature
+                        or self._journal_offset < offset):
+                    return # Le snapshot a été réécrit entre-temps (en-tête ou autre processus)
+                tail = self._read_journal_bytes(offset)
+                tail = tail[:tail.rfind(b"\n") + 1]
+                self._write_snapshot(payload)
+                self._rewrite_journal(tail)
+        finally:
+            self._compacting = False
+
+    def upsert_if_newer(self, record: dict) -> bool:
+        return self.upsert_many([record], only_if_newer=True) > 0
@@ -0,0 +1,75 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+class DecryptedCache:
+    """
+    Cache LRU borné des secrets déchiffrés, indexé par uuid et validé par updated_at :
+    un record modifié (localement ou par Gossip) a un nouveau updated_at et est déchiffré à nouveau.
+    clear() vide le cache dès que le vault est verrouillé ou que le contexte n'est plus valide.
+    Python ne permet pas d'écraser une chaîne en mémoire : on efface chaque entrée pour que le ramasse-miettes
+    libère les secrets en clair au plus tôt.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, record_uuid: str, updated_at: float) -> Optional[dict]:
+        """Retourne une copie du secret en clair si la version en cache est celle de `updated_at`."""
+        with self._lock:
+            entry = self._entries.get(record_uuid)
+            if entry is None or entry[0] != updated_at:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(record_uuid)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, record_uuid: str, updated_at: float, data: dict):
+        """Mémorise le secret en clair de la version `updated_at` (une copie) ; évince le moins récemment utilisé."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[record_uuid] = (updated_at, dict(data))
+            self._entries.move_to_end(record_uuid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)[1][1].clear()
+
+    def offer(self, record_uuid: str, updated_at: float, data: dict):
+        """
+        Comme put, mais sans évincer d'autre entrée quand le cache est plein.
+        Pour les parcours complets : en LRU, un listing plus grand que le cache évincerait chaque entrée
+        juste avant d'en avoir besoin au listing suivant ; ainsi au moins `max_entries` secrets restent en cache.
+        """
+        with self._lock:
+            if record_uuid not in self._entries and len(self._entries) >= self.max_entries:
+                return
+        self.put(record_uuid, updated_at, data)
+
+    def discard(self, record_uuid: str):
+        with self._lock:
+            entry = self._entries.pop(record_uuid, None)
+        if entry is not None:
+            entry[1].clear()
+
+    def retain(self, record_uuids: Iterable[str]):
+        """Ne garde que les entrées de `record_uuids` (secrets supprimés ou purgés entre-temps)."""
+        keep = set(record_uuids)
+        with self._lock:
+            for record_uuid in [u for u in self._entries if u not in keep]:
+                self._entries.pop(record_uuid)[1].clear()
+
+    def clear(self):
+        with self._lock:
+            for _, data in self._entries.values():
+                data.clear()
+            self._entries.clear()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
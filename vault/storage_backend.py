@@ -0,0 +1,109 @@
+from typing import Any, List, Optional, Tuple
+
+class StorageBackend:
+    """
+    Interface d'un moteur de stockage pour DBManager.
+    Un backend stocke l'en-tête du vault (vault_id, password_check) et les records indexés par uuid.
+    """
+
+    def get_header(self, key: str) -> Optional[Any]:
+        """Retourne une valeur de l'en-tête du vault (ex: "vault_id", "password_check")."""
+        raise NotImplementedError
+
+    def set_header(self, key: str, value: Any):
+        """Enregistre une valeur de l'en-tête du vault."""
+        raise NotImplementedError
+
+    def get_records(self, include_deleted: bool = True) -> List[dict]:
+        """Retourne les records (tombstones inclus ou non)."""
+        raise NotImplementedError
+
+    def get_record(self, record_uuid: str) -> Optional[dict]:
+        """Retourne un record par son uuid, ou None."""
+        raise NotImplementedError
+
+    def get_digest(self) -> List[Tuple[str, float]]:
+        """Retourne les couples (uuid, updated_at) de tous les records (tombstones inclus)."""
+        return [(r["uuid"], r["updated_at"]) for r in self.get_records(include_deleted=True)]
+
+    def data_version(self) -> Optional[int]:
+        """
+        Compteur bon marché (sans parcours des records) qui change quand un autre processus a modifié le stockage.
+        None si le backend ne sait pas le dire : l'appelant doit alors supposer un changement.
+        """
+        return None
+
+    def get_records_since(self, since: float) -> List[dict]:
+        """Retourne les records dont updated_at > since, triés par updated_at croissant."""
+        records = [r for r in self.get_records(include_deleted=True) if r["updated_at"] > since]
+        return sorted(records, key=lambda r: r["updated_at"])
+
+    def upsert(self, record: dict):
+        """Remplace ou ajoute un record sans condition."""
+        raise NotImplementedError
+
+    def upsert_if_newer(self, record: dict) -> bool:
+        """
+        Applique le record seulement s'il est absent localement ou strictement plus récent (LWW).
+        Retourne True si appliqué.
+        """
+        raise NotImplementedError
+
+    def upsert_many(self, records: List[dict], only_if_newer: bool = False, fsync: bool = False) -> int:
+        """
+        Applique plusieurs records en une seule écriture (group commit).
+        `fsync` force la persistance sur disque avant de rendre la main.
+        Retourne le nombre de records effectivement appliqués.
+        """
+        if only_if_newer:
+            return sum(1 for record in records if self.upsert_if_newer(record))
+        for record in records:
+            self.upsert(record)
+        return len(records)
+
+    def install_snapshot(self, records: List[dict]) -> int:
+        """
+        Installe d'un bloc le snapshot d'un pair (bootstrap d'un nouveau noeud) : tout ou rien.
+        Fusion LWW avec les records locaux éventuels. Par défaut, un seul upsert_many conditionnel
+        (atomique si le backend écrit un lot en une transaction).
+        Retourne le nombre de records appliqués.
+        """
+        return self.upsert_many(records, only_if_newer=True, fsync=True)
+
+    def find_by_tokens(self, tokens: List[str]) -> List[dict]:
+        """
+        Retourne les records non supprimés dont l'index aveugle ("blind_index") contient tous les `tokens`.
+        Par défaut un parcours complet ; les backends maintiennent un index inversé jeton -> uuids.
+        """
+        wanted = set(tokens)
+        return [r for r in self.get_records(include_deleted=False) if wanted.issubset(r.get("blind_index", ()))]
+
+    def replace_if_unchanged(self, records: List[dict]) -> int:
+        """
+        Remplace chaque record seulement si la version locale a le même updated_at (ajout de l'index aveugle
+        à un record existant sans écraser une mise à jour arrivée entre-temps). Retourne le nombre de remplacements.
+        """
+        current = (self.get_record(r["uuid"]) for r in records)
+        unchanged = [r for r, local in zip(records, current) if local is not None and local["updated_at"] == r["updated_at"]]
+        return self.upsert_many(unchanged)
+
+    def get_tombstones(self, before: float) -> List[Tuple[str, float]]:
+        """Retourne les couples (uuid, updated_at) des tombstones dont updated_at < before."""
+        return [(r["uuid"], r["updated_at"]) for r in self.get_records(include_deleted=True)
+                if r.get("is_deleted", False) and r["updated_at"] < before]
+
+    def purge_tombstones(self, entries: List[Tuple[str, float]]) -> int:
+        """
+        Supprime définitivement les tombstones (uuid, updated_at) donnés.
+        Un record modifié depuis (updated_at différent) ou redevenu actif est conservé.
+        Retourne le nombre de records supprimés.
+        """
+        raise NotImplementedError
+
+    def compact(self):
+        """Réorganise le stockage sur disque (optionnel)."""
+        pass
+
+    def close(self):
+        """Libère les ressources du backend (optionnel)."""
+        pass
@@ -1,21 +1,36 @@
 import json
 import uuid
-from typing import List, Dict, Optional, Callable
+from typing import List, Dict, Optional, Callable, Tuple
 
 from .crypto_service import CryptoService
-from .context_checker import ContextChecker
-from .db_manager import DBManager
+from .context_checker import ContextChecker, DEFAULT_CACHE_TTL
+from .db_manager import DBManager, DEFAULT_TOMBSTONE_TTL
+from .secret_cache import DecryptedCache
+from .blind_index import BlindIndex
+from .fuzzy_index import FuzzyIndex, DEFAULT_LIMIT
 
 class VaultCore:
     """
     Contrôleur principal du Module A (Vault).
     Vérifie le contexte avant toute opération et interagit avec le DBManager et CryptoService.
     """
-    def __init__(self, master_password: str, allowed_bssids_hashes: List[str], db_path: str = "vault.json", on_sync_trigger: Optional[Callable[[dict], None]] = None):
-        self.context_checker = ContextChecker(allowed_bssids_hashes)
+    def __init__(self, master_password: str, allowed_bssids_hashes: List[str], db_path: str = "vault.json", on_sync_trigger: Optional[Callable[[dict], None]] = None,
+                 durability: str = "batched", write_batch_size: int = 500, write_batch_window: float = 0.05,
+                 tombstone_ttl: Optional[float] = DEFAULT_TOMBSTONE_TTL, decrypted_cache_size: int = 10000,
+                 blind_index: bool = False, context_cache_ttl: float = DEFAULT_CACHE_TTL):
+        self.context_checker = ContextChecker(allowed_bssids_hashes, cache_ttl=context_cache_ttl)
         self.crypto_service = CryptoService(master_password)
-        self.db_manager = DBManager(db_path)
+        self.db_manager = DBManager(db_path, durability=durability, write_batch_size=write_batch_size,
+                                    write_batch_window=write_batch_window, tombstone_ttl=tombstone_ttl)
         self.on_sync_trigger = on_sync_trigger # Callback pour appeler Module B quand une action locale arrive
+        # Secrets déchiffrés gardés en mémoire : un listing ne déchiffre que les records modifiés depuis
+        self.secret_cache = DecryptedCache(decrypted_cache_size)
+        # Index aveugle (optionnel) : la recherche ne déchiffre que les records dont les jetons correspondent
+        self.blind_index = BlindIndex(self.crypto_service.derive_subkey(b"blind-index")) if blind_index else None
+        # Index trigrammes des secrets déchiffrés (recherche approximative), construit à la première recherche
+        self.fuzzy_index = FuzzyIndex()
+        # Version du stockage (DBManager.data_version) à laquelle l'index a été comparé au vault pour la dernière fois
+        self._fuzzy_data_version: Optional[int] = None
         
         # Vérification du Master Password (Nouveau Vault vs Vault existant)
         pwd_check = self.db_manager.get_password_check()
@@ -30,8 +45,22 @@ class VaultCore:
             self.db_manager.set_password_check(ct, nonce)
         
     def _check_access(self) -> bool:
-        """Vérifie si le contexte BSSID est valide."""
-        return self.context_checker.is_context_valid()
+        """Vérifie si le contexte BSSID est valide. Hors contexte, les secrets en clair gardés en mémoire sont effacés."""
+        if self.context_checker.is_context_valid():
+            return True
+        self.secret_cache.clear()
+        self.fuzzy_index.clear()
+        return False
+
+    def lock(self):
+        """
+        Verrouille le vault : efface les secrets déchiffrés gardés en mémoire, arrête les processus de déchiffrement
+        et la surveillance du réseau (le contexte sera revérifié à la prochaine opération).
+        """
+        self.secret_cache.clear()
+        self.fuzzy_index.clear()
+        self.crypto_service.close()
+        self.context_checker.close()
 
     def add_or_update_secret(self, service: str, username: str, password: str, notes: str, record_uuid: Optional[str] = None) -> bool:
         """
@@ -45,18 +74,24 @@ class VaultCore:
             record_uuid = str(uuid.uuid4())
             
         # Structure de données en clair du secret
-        secret_data = json.dumps({
+        secret = {
             "service": service,
             "username": username,
             "password": password,
             "notes": notes
-        })
+        }
+        secret_data = json.dumps(secret)
         
         # Chiffrement
         ciphertext, nonce = self.crypto_service.encrypt(secret_data)
         
         # Sauvegarde DB avec mise à jour du timestamp LWW
-        record = self.db_manager.upsert_record_local(record_uuid, ciphertext, nonce)
+        tokens = self.blind_index.record_tokens(service, username) if self.blind_index is not None else None
+        record = self.db_manager.upsert_record_local(record_uuid, ciphertext, nonce, blind_index=tokens)
+        # Le secret en clair est déjà connu : le prochain listing n'aura pas à le déchiffrer
+        data = dict(secret, _uuid=record_uuid, _updated_at=record["updated_at"])
+        self.secret_cache.put(record_uuid, record["updated_at"], data)
+        self.fuzzy_index.add(record_uuid, record["updated_at"], data)
         
         # Trigger Interface avec Module B
         if self.on_sync_trigger:
@@ -74,20 +109,114 @@ class VaultCore:
             return []
             
         records = self.db_manager.get_all_records()
+        decrypted_secrets = self._decrypt_records(records)
+        # Secrets supprimés entre-temps (localement ou par Gossip) : plus rien à garder en clair
+        self.secret_cache.retain(record["uuid"] for record in records)
+        self.fuzzy_index.retain(record["uuid"] for record in records)
+        return decrypted_secrets
+
+    def search_secrets(self, query: str) -> List[Dict]:
+        """
+        Action locale de l'UI : recherche `query` dans le service et le username des secrets (si BSSID ok).
+        Avec l'index aveugle, seuls les records portant les jetons de la requête sont déchiffrés
+        (sous-chaîne dès 3 caractères, préfixe en dessous) ; sinon tout le vault est déchiffré puis filtré.
+        """
+        if not self._check_access():
+            print("Access Denied: BSSID de l'environnement physique non autorisé.")
+            return []
+
+        if self.blind_index is None:
+            query = query.lower()
+            secrets = self._decrypt_records(self.db_manager.get_all_records())
+            return [s for s in secrets if query in s["service"].lower() or query in s["username"].lower()]
+
+        tokens = self.blind_index.query_tokens(query)
+        if not tokens:
+            return []
+        secrets = self._decrypt_records(self.db_manager.find_by_blind_index(tokens))
+        # Collision de jetons ou n-grammes répartis sur les deux champs : vérification exacte sur le clair
+        return [s for s in secrets if self.blind_index.matches(query, s["service"], s["username"])]
+
+    def fuzzy_search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[Dict]:
+        """
+        Action locale de l'UI : recherche approximative (fautes de frappe tolérées) dans le service, le username
+        et les notes (si BSSID ok). Résultats classés par score ("_score").
+        La première recherche déchiffre le vault (en un lot, cache compris) pour construire l'index trigrammes ;
+        les suivantes ne déchiffrent que les records reçus par Gossip entre-temps. Si un autre processus a écrit
+        dans le vault (le daemon pendant une session --cli), l'index est d'abord comparé aux couples (uuid, updated_at)
+        du vault ; sinon la vérification se limite à un compteur du stockage, sans parcours.
+        """
+        if not self._check_access():
+            print("Access Denied: BSSID de l'environnement physique non autorisé.")
+            return []
+
+        # Lu avant les records : une écriture d'un autre processus pendant la lecture sera vue à la recherche suivante
+        version = self.db_manager.data_version()
+        if not self.fuzzy_index.built:
+            # Construit avant la lecture : un record reçu par Gossip pendant le déchiffrement est marqué à ré-indexer
+            self.fuzzy_index.build()
+            records = self.db_manager.get_raw_records()
+            self._index_for_search(records)
+            self.secret_cache.retain(record["uuid"] for record in records if not record.get("is_deleted", False))
+            outdated = self.fuzzy_index.take_stale()
+        elif version is None or version != self._fuzzy_data_version:
+            outdated = self.fuzzy_index.reconcile(self.db_manager.get_sync_digest())
+        else:
+            outdated = self.fuzzy_index.take_stale()
+        self._fuzzy_data_version = version
+        if outdated:
+            self._index_for_search(self.db_manager.get_records_by_uuid(outdated))
+        return self.fuzzy_index.search(query, limit=limit)
+
+    def _index_for_search(self, records: List[dict]):
+        """Déchiffre (et indexe) les records actifs ; les tombstones et les échecs de déchiffrement sont notés comme tels."""
+        decrypted = {s["_uuid"] for s in self._decrypt_records([r for r in records if not r.get("is_deleted", False)])}
+        for record in records:
+            if record["uuid"] not in decrypted:
+                self.fuzzy_index.skip(record["uuid"], record["updated_at"])
+
+    def rebuild_blind_index(self) -> int:
+        """
+        Indexe les records qui n'ont pas encore d'index aveugle (créés avant son activation, ou par un pair qui ne l'utilise pas).
+        Retourne le nombre de records indexés.
+        """
+        if self.blind_index is None or not self._check_access():
+            return 0
+        records = {r["uuid"]: r for r in self.db_manager.get_all_records() if "blind_index" not in r}
+        indexed = [dict(records[s["_uuid"]], blind_index=self.blind_index.record_tokens(s["service"], s["username"]))
+                   for s in self._decrypt_records(list(records.values()))]
+        return self.db_manager.attach_blind_index(indexed) if indexed else 0
+
+    def _decrypt_records(self, records: List[dict]) -> List[Dict]:
+        """Secrets en clair des records, dans l'ordre ; ceux en échec de déchiffrement sont omis."""
         decrypted_secrets = []
+        # Seuls les records absents du cache ou modifiés depuis (updated_at différent) sont déchiffrés, en un seul lot
+        cached = [self.secret_cache.get(record["uuid"], record["updated_at"]) for record in records]
+        missing = [record for record, data in zip(records, cached) if data is None]
+        plaintexts = iter(self.crypto_service.decrypt_many([(r["ciphertext"], r["nonce"]) for r in missing]))
         
-        for record in records:
-            plaintext = self.crypto_service.decrypt(record["ciphertext"], record["nonce"])
-            if plaintext:
-                try:
-                    data = json.loads(plaintext)
-                    data["_uuid"] = record["uuid"] # Pour référence dans l'UI
-                    data["_updated_at"] = record["updated_at"]
-                    decrypted_secrets.append(data)
-                except json.JSONDecodeError:
-                    print(f"Erreur de parsage JSON pour le record {record['uuid']}")
-                    
+        for record, data in zip(records, cached):
+            if data is None:
+                data = self._parse_secret(record, next(plaintexts))
+                if data is None:
+                    continue
+                self.secret_cache.offer(record["uuid"], record["updated_at"], data)
+            self.fuzzy_index.add(record["uuid"], record["updated_at"], data)
+            decrypted_secrets.append(data)
         return decrypted_secrets
+
+    def _parse_secret(self, record: dict, plaintext: Optional[str]) -> Optional[Dict]:
+        """Parse le secret déchiffré d'un record, ou None en cas d'échec."""
+        if not plaintext:
+            return None
+        try:
+            data = json.loads(plaintext)
+        except json.JSONDecodeError:
+            print(f"Erreur de parsage JSON pour le record {record['uuid']}")
+            return None
+        data["_uuid"] = record["uuid"] # Pour référence dans l'UI
+        data["_updated_at"] = record["updated_at"]
+        return data
         
     def delete_secret(self, record_uuid: str) -> bool:
         """
@@ -101,14 +230,16 @@ class VaultCore:
         if not record:
             return False
             
-        # On ne change pas le ciphertext/nonce, on change juste l'état
+        # Tombstone : le secret chiffré n'est plus conservé ni propagé, seul l'état supprimé l'est
         updated_record = self.db_manager.upsert_record_local(
             record_uuid=record_uuid,
-            ciphertext=record["ciphertext"],
-            nonce=record["nonce"],
+            ciphertext="",
+            nonce="",
             is_deleted=True
         )
         
+        self.secret_cache.discard(record_uuid)
+        self.fuzzy_index.remove(record_uuid)
         if self.on_sync_trigger:
             self.on_sync_trigger(updated_record)
             
@@ -123,8 +254,50 @@ class VaultCore:
         l'attaquant ne peut tout de même pas les lire sans Master Password et BSSID).
         Retourne True si appliqué.
         """
-        return self.db_manager.process_gossip_update(gossip_record)
+        applied = self.db_manager.process_gossip_update(gossip_record)
+        if applied:
+            self.secret_cache.discard(gossip_record["uuid"])
+            if gossip_record.get("is_deleted", False):
+                self.fuzzy_index.remove(gossip_record["uuid"])
+            else:
+                self.fuzzy_index.invalidate(gossip_record["uuid"])
+        return applied
         
+    def install_snapshot(self, records: List[dict]) -> int:
+        """Installe d'un bloc le snapshot reçu d'un pair au premier démarrage (bootstrap)."""
+        applied = self.db_manager.install_snapshot(records)
+        # Index de recherche reconstruit à la prochaine recherche
+        self.fuzzy_index.clear()
+        return applied
+
     def get_records_for_sync(self) -> List[dict]:
         """Retourne tous les records locaux pour la synchronisation initiale."""
         return self.db_manager.get_raw_records()
+
+    def get_records_since(self, since: float) -> List[dict]:
+        """Retourne les records modifiés après `since` pour la synchronisation incrémentale."""
+        return self.db_manager.get_records_since(since)
+
+    def get_sync_digest(self) -> List[Tuple[str, float]]:
+        """Retourne les couples (uuid, updated_at) locaux pour l'anti-entropie (arbre de Merkle)."""
+        return self.db_manager.get_sync_digest()
+
+    def get_records_by_uuid(self, record_uuids: List[str]) -> List[dict]:
+        """Retourne les records demandés par un pair lors de l'anti-entropie."""
+        return self.db_manager.get_records_by_uuid(record_uuids)
+
+    def get_expired_tombstones(self) -> List[Tuple[str, float]]:
+        """Retourne les tombstones plus vieux que le TTL, candidats au GC."""
+        return self.db_manager.get_expired_tombstones()
+
+    def purge_tombstones(self, entries: List[Tuple[str, float]]) -> int:
+        """Purge les tombstones expirés acquittés par tous les pairs."""
+        return self.db_manager.purge_tombstones(entries)
+
+    def compact(self):
+        """Réécrit le stockage du vault (journal intégré, tombstones allégés, espace libéré)."""
+        self.db_manager.compact()
+
+    def flush(self):
+        """Persiste les records reçus par Gossip encore en attente d'écriture (write-behind)."""
+        self.db_manager.flush()
@@ -0,0 +1,89 @@
+import threading
+from typing import Dict, List, Optional
+
+from .storage_backend import StorageBackend
+
+# strict  : chaque record distant est écrit (et fsync) immédiatement
+# batched : les records distants sont regroupés puis écrits + fsync en une fois (défaut)
+# relaxed : comme batched, sans fsync (le système d'exploitation décide quand écrire)
+DURABILITY_MODES = ("strict", "batched", "relaxed")
+
+class WriteBehindBuffer:
+    """
+    Couche write-behind (group commit) pour les records reçus par Gossip.
+    Les records acceptés (LWW) sont gardés en mémoire et persistés par lots :
+    dès que `batch_size` records sont en attente, ou au plus tard `window` secondes après le premier.
+    """
+
+    def __init__(self, backend: StorageBackend, durability: str = "batched",
+                 batch_size: int = 500, window: float = 0.05):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Mode de durabilité inconnu : {durability} (attendu : {', '.join(DURABILITY_MODES)})")
+        self.backend = backend
+        self.durability = durability
+        self.batch_size = batch_size
+        self.window = window
+        self._lock = threading.RLock()
+        self._pending: Dict[str, dict] = {}
+        self._timer: Optional[threading.Timer] = None
+
+    @property
+    def _fsync(self) -> bool:
+        return self.durability != "relaxed"
+
+    def get(self, record_uuid: str) -> Optional[dict]:
+        """Retourne le record en attente d'écriture pour cet uuid, s'il existe."""
+        with self._lock:
+            return self._pending.get(record_uuid)
+
+    def has_pending(self) -> bool:
+        with self._lock:
+            return bool(self._pending)
+
+    def apply_if_newer(self, record: dict) -> bool:
+        """
+        Applique le record s'il est plus récent que la version en attente ou stockée (LWW).
+        Retourne True si accepté.
+        """
+        if self.durability == "strict":
+            with self._lock:
+                self.flush()
+                return self.backend.upsert_many([record], only_if_newer=True, fsync=True) > 0
+
+        with self._lock:
+            current = self._pending.get(record["uuid"]) or self.backend.get_record(record["uuid"])
+            if current and record["updated_at"] <= current["updated_at"]:
+                return False
+            self._pending[record["uuid"]] = record
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+            return True
+
+    def write_now(self, records: List[dict]):
+        """Écriture immédiate (actions locales) : les records en attente sont écrits avant, dans le même lot."""
+        with self._lock:
+            batch = list(self._pending.values())
+            self._pending.clear()
+            self._cancel_timer()
+            self.backend.upsert_many(batch, only_if_newer=True, fsync=False)
+            self.backend.upsert_many(records, fsync=self._fsync)
+
+    def flush(self):
+        """Persiste tous les records en attente en une seule écriture."""
+        with self._lock:
+            self._cancel_timer()
+            if not self._pending:
+                return
+            batch = list(self._pending.values())
+            self._pending.clear()
+            # Conditionnel : un autre processus a pu écrire une version plus récente entre-temps
+            self.backend.upsert_many(batch, only_if_newer=True, fsync=self._fsync)
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None